@@ -0,0 +1,14 @@
+import pytest
+from django.core.cache import cache
+
+from tpv_app import caches
+
+
+@pytest.fixture(autouse=True)
+def limpiar_caches():
+    """Las cachés sobreviven al rollback de cada test: se vacían para que no se filtren datos entre tests."""
+    cache.clear()
+    caches.limpiar()
+    yield
+    cache.clear()
+    caches.limpiar()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Usuario, Categoria, Producto, Cliente, Servicio, Venta, DetalleVenta
+from .models import Usuario, Categoria, Producto, Cliente, Servicio, Venta, DetalleVenta, InformeZ, VentaArchivada
 
 # Registro de los modelos de la aplicación
 
@@ -16,9 +16,9 @@ class CategoriaAdmin(admin.ModelAdmin):
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
-    list_display = ('id_producto', 'nombre', 'precio', 'activo', 'id_categoria')
+    list_display = ('id_producto', 'referencia', 'nombre', 'precio', 'activo', 'id_categoria')
     list_filter = ('activo', 'id_categoria')
-    search_fields = ('nombre',)
+    search_fields = ('nombre', 'referencia')
 
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
@@ -41,3 +41,15 @@ class VentaAdmin(admin.ModelAdmin):
 class DetalleVentaAdmin(admin.ModelAdmin):
     list_display = ('id_detalle', 'id_venta', 'id_producto', 'cantidad', 'precio_unitario', 'subtotal')
     search_fields = ('id_venta__id_venta', 'id_producto__nombre')
+
+@admin.register(InformeZ)
+class InformeZAdmin(admin.ModelAdmin):
+    list_display = ('id_informe', 'id_servicio', 'fecha_generacion', 'tickets', 'total', 'ticket_medio')
+    search_fields = ('id_servicio__nombre',)
+    readonly_fields = [campo.name for campo in InformeZ._meta.fields]
+
+@admin.register(VentaArchivada)
+class VentaArchivadaAdmin(admin.ModelAdmin):
+    list_display = ('id_venta', 'id_servicio', 'fecha', 'total', 'fichero')
+    search_fields = ('id_venta', 'clave_idempotencia')
+    readonly_fields = [campo.name for campo in VentaArchivada._meta.fields]
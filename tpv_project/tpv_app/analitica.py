@@ -0,0 +1,233 @@
+from dataclasses import dataclass, fields
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él los informes que lo usan se muestran vacíos
+    np = None
+
+
+# -----------------------------
+# Extracto columnar de líneas de venta
+# -----------------------------
+# Cada línea de venta se carga una sola vez en arrays de NumPy (una columna por campo) y los
+# informes se calculan con operaciones vectorizadas. El extracto de un servicio cerrado no
+# cambia, así que se guarda en la caché de Django y solo se vuelven a leer de la base de datos
+# las líneas del servicio abierto (y las ventas sin servicio). Los servicios archivados se leen
+# de su fichero (tpv_app.archivo).
+
+SIN_VALOR = -1  # Cliente o servicio nulo en las columnas de ids
+
+
+def disponible():
+    return np is not None
+
+
+@dataclass(frozen=True)
+class Extracto:
+    producto: 'np.ndarray'  # int32
+    cantidad: 'np.ndarray'  # int32
+    precio_centimos: 'np.ndarray'  # int64, precio unitario en céntimos
+    instante: 'np.ndarray'  # int64, segundos desde epoch (UTC) de la venta
+    servicio: 'np.ndarray'  # int32, SIN_VALOR si la venta no tiene servicio
+    usuario: 'np.ndarray'  # int32
+    cliente: 'np.ndarray'  # int32, SIN_VALOR si la venta no tiene cliente
+
+    TIPOS = {
+        'producto': 'int32', 'cantidad': 'int32', 'precio_centimos': 'int64', 'instante': 'int64',
+        'servicio': 'int32', 'usuario': 'int32', 'cliente': 'int32',
+    }
+
+    def __len__(self):
+        return len(self.producto)
+
+    @property
+    def importe_centimos(self):
+        return self.cantidad.astype('int64') * self.precio_centimos
+
+    def filtrar(self, mascara):
+        return Extracto(**{campo.name: getattr(self, campo.name)[mascara] for campo in fields(self)})
+
+    def entre(self, desde=None, hasta=None):
+        """Líneas con venta en [desde, hasta) (datetimes)."""
+        mascara = np.ones(len(self), dtype=bool)
+        if desde is not None:
+            mascara &= self.instante >= int(desde.timestamp())
+        if hasta is not None:
+            mascara &= self.instante < int(hasta.timestamp())
+        return self if mascara.all() else self.filtrar(mascara)
+
+    @classmethod
+    def vacio(cls):
+        return cls(**{nombre: np.empty(0, dtype=tipo) for nombre, tipo in cls.TIPOS.items()})
+
+    @classmethod
+    def concatenar(cls, partes):
+        partes = [parte for parte in partes if len(parte)]
+        if not partes:
+            return cls.vacio()
+        if len(partes) == 1:
+            return partes[0]
+        return cls(**{nombre: np.concatenate([getattr(parte, nombre) for parte in partes]) for nombre in cls.TIPOS})
+
+
+def _construir(filas):
+    """Construye un Extracto a partir de tuplas (producto, cantidad, precio, fecha, servicio, usuario, cliente)."""
+    columnas = ([], [], [], [], [], [], [])
+    producto, cantidad, precio, instante, servicio, usuario, cliente = columnas
+    for id_producto, unidades, precio_unitario, fecha, id_servicio, id_usuario, id_cliente in filas:
+        producto.append(id_producto)
+        cantidad.append(unidades)
+        precio.append(int(precio_unitario * 100))
+        instante.append(int(fecha.timestamp()))
+        servicio.append(SIN_VALOR if id_servicio is None else id_servicio)
+        usuario.append(id_usuario)
+        cliente.append(SIN_VALOR if id_cliente is None else id_cliente)
+    return Extracto(**{
+        nombre: np.array(valores, dtype=Extracto.TIPOS[nombre])
+        for nombre, valores in zip(Extracto.TIPOS, columnas)
+    })
+
+
+def _leer(queryset):
+    """Construye un Extracto con las líneas del queryset de DetalleVenta, sin instanciar modelos."""
+    filas = queryset.values_list(
+        'id_producto_id', 'cantidad', 'precio_unitario', 'id_venta__fecha',
+        'id_venta__id_servicio_id', 'id_venta__id_usuario_id', 'id_venta__id_cliente_id'
+    ).order_by()
+    return _construir(filas.iterator(chunk_size=2000))
+
+
+def _leer_archivado(id_servicio):
+    """Extracto de un servicio archivado, leído de su fichero."""
+    from tpv_app import archivo
+
+    return _construir(
+        (linea['id_producto'], linea['cantidad'], Decimal(linea['precio_unitario']), registro['fecha'],
+         registro['id_servicio'], registro['id_usuario'], registro['id_cliente'])
+        for registro in archivo.registros_archivados(id_servicio=id_servicio)
+        for linea in registro['lineas']
+    )
+
+
+def _clave_extracto(id_servicio, cantidad_tickets, total_ingresos):
+    # Los contadores forman parte de la clave: si se borra o corrige una venta de un servicio
+    # cerrado, la entrada antigua deja de usarse sin invalidarla a mano
+    return f'tpv:extracto:{id_servicio}:{cantidad_tickets}:{total_ingresos}'
+
+
+def extracto(desde=None, hasta=None):
+    """Devuelve el Extracto de las líneas vendidas en [desde, hasta) (por defecto, todo el histórico)."""
+    from tpv_app.models import DetalleVenta, Servicio, Venta, VentaArchivada
+
+    if not disponible():
+        raise RuntimeError('El módulo de analítica necesita NumPy (pip install numpy).')
+
+    # Los servicios se eligen por la fecha de sus ventas, no por su inicio y fin: un ticket de un
+    # lote diferido conserva su fecha original aunque se asigne al servicio abierto al recibirlo
+    servicios = Servicio.objects.filter(estado='cerrado')
+    if desde is not None or hasta is not None:
+        ventas, archivadas = Venta.objects.all(), VentaArchivada.objects.all()
+        if desde is not None:
+            ventas, archivadas = ventas.filter(fecha__gte=desde), archivadas.filter(fecha__gte=desde)
+        if hasta is not None:
+            ventas, archivadas = ventas.filter(fecha__lt=hasta), archivadas.filter(fecha__lt=hasta)
+        servicios = servicios.filter(
+            Q(id_servicio__in=ventas.values('id_servicio')) | Q(id_servicio__in=archivadas.values('id_servicio'))
+        )
+    claves, archivados = {}, set()
+    for id_servicio, tickets, ingresos, archivado in servicios.values_list(
+            'id_servicio', 'cantidad_tickets', 'total_ingresos', 'archivado'):
+        claves[_clave_extracto(id_servicio, tickets, ingresos)] = id_servicio
+        if archivado:
+            archivados.add(id_servicio)
+
+    # Servicios cerrados: una sola ida a la caché y, para los que falten, una sola consulta
+    encontrados = cache.get_many(claves) if claves else {}
+    partes = list(encontrados.values())
+    faltan = {id_servicio: clave for clave, id_servicio in claves.items() if clave not in encontrados}
+    if faltan:
+        leidos = _leer(DetalleVenta.objects.filter(id_venta__id_servicio_id__in=[pk for pk in faltan if pk not in archivados]))
+        nuevos = {}
+        for id_servicio, clave in faltan.items():
+            if id_servicio in archivados:
+                parte = _leer_archivado(id_servicio)
+            else:
+                parte = leidos.filtrar(leidos.servicio == id_servicio)
+            nuevos[clave] = parte
+            partes.append(parte)
+        cache.set_many(nuevos, getattr(settings, 'TPV_ANALITICA_TTL', 86400))
+
+    # Servicio abierto y ventas sin servicio: siempre desde la base de datos
+    vivas = DetalleVenta.objects.filter(
+        Q(id_venta__id_servicio__isnull=True) | ~Q(id_venta__id_servicio__estado='cerrado')
+    )
+    if desde is not None:
+        vivas = vivas.filter(id_venta__fecha__gte=desde)
+    if hasta is not None:
+        vivas = vivas.filter(id_venta__fecha__lt=hasta)
+    partes.append(_leer(vivas))
+
+    return Extracto.concatenar(partes).entre(desde, hasta)
+
+
+# -----------------------------
+# Operaciones vectorizadas
+# -----------------------------
+
+def agrupar(claves, valores=None):
+    """GROUP BY claves con SUM(valores) (o COUNT si no hay valores). Devuelve (claves únicas, sumas)."""
+    unicas, inversa = np.unique(claves, return_inverse=True)
+    if valores is None:
+        return unicas, np.bincount(inversa, minlength=len(unicas))
+    sumas = np.bincount(inversa, weights=valores, minlength=len(unicas))
+    if np.issubdtype(np.asarray(valores).dtype, np.integer):
+        sumas = np.rint(sumas).astype('int64')
+    return unicas, sumas
+
+
+def top_n(claves, valores, n):
+    """Las n claves con mayor suma de valores, de mayor a menor: lista de (clave, suma)."""
+    unicas, sumas = agrupar(claves, valores)
+    orden = np.argsort(-sumas, kind='stable')[:n]
+    return [(unicas[i].item(), sumas[i].item()) for i in orden]
+
+
+def media_movil(serie, ventana):
+    """Media de los últimos `ventana` valores de cada punto (con menos puntos al principio de la serie)."""
+    serie = np.asarray(serie, dtype='float64')
+    acumulada = np.cumsum(np.insert(serie, 0, 0.0))
+    posiciones = np.arange(1, len(serie) + 1)
+    inicio = np.maximum(posiciones - ventana, 0)
+    return (acumulada[posiciones] - acumulada[inicio]) / (posiciones - inicio)
+
+
+def _inicio_dia(dia):
+    inicio = datetime.combine(dia, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def ingresos_diarios(dias=30, ventana=7, hasta=None):
+    """Ingresos de los `dias` días que terminan en `hasta` (por defecto hoy, incluido) y su media móvil.
+
+    Devuelve (lista de fechas, ingresos por día, media móvil), con importes en euros.
+    """
+    ultimo_dia = hasta or timezone.localdate()
+    fechas = [ultimo_dia - timedelta(days=i) for i in range(dias - 1, -1, -1)]
+    # Límites de cada día local calculados uno a uno: los días de cambio de horario duran 23 o 25 horas
+    limites = np.array([int(_inicio_dia(dia).timestamp()) for dia in fechas + [ultimo_dia + timedelta(days=1)]], dtype='int64')
+    datos = extracto(desde=_inicio_dia(fechas[0]), hasta=_inicio_dia(ultimo_dia + timedelta(days=1)))
+
+    indices = np.searchsorted(limites, datos.instante, side='right') - 1
+    ingresos = np.bincount(indices, weights=datos.importe_centimos, minlength=dias)[:dias] / 100
+    return (
+        fechas,
+        ingresos.round(2).tolist(),
+        media_movil(ingresos, ventana).round(2).tolist(),
+    )
@@ -0,0 +1,228 @@
+import gzip
+import json
+import logging
+import os
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from tpv_app import resumenes
+from tpv_app.informe_z import informe_z_vigente
+
+
+# -----------------------------
+# Archivo de ventas de servicios cerrados
+# -----------------------------
+# Las ventas de cada servicio archivado se escriben, con sus líneas y los nombres de producto,
+# cliente y usuario, en un fichero JSONL comprimido (servicio_<id>.jsonl.gz) que no se vuelve a
+# modificar. VentaArchivada indexa cada venta por id. Después se borran de Venta y DetalleVenta
+# sin enviar señales: los resúmenes diarios, los contadores del servicio y su informe Z ya
+# contienen esas ventas y no deben descontarse. Las exportaciones, las series por intervalos y
+# la analítica leen también el archivo (registros_archivados), así que sus resultados no cambian
+# al archivar.
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BORRADO = 500  # Ids por sentencia DELETE
+
+
+def directorio():
+    return Path(getattr(settings, 'TPV_ARCHIVO_DIR', Path(settings.BASE_DIR) / 'archivo'))
+
+
+def nombre_fichero(id_servicio):
+    return f'servicio_{id_servicio}.jsonl.gz'
+
+
+def servicios_archivables(antes):
+    """Servicios cerrados antes de `antes` (datetime) cuyas ventas siguen en las tablas."""
+    from tpv_app.models import Servicio
+
+    return Servicio.objects.filter(estado='cerrado', archivado=False, fecha_fin__lt=antes).order_by('fecha_fin')
+
+
+def _ventas_servicio(id_servicio):
+    """Registros (diccionarios) de las ventas del servicio con sus líneas, en orden de id."""
+    from tpv_app.models import DetalleVenta, Venta
+
+    lineas = defaultdict(list)
+    for linea in (
+        DetalleVenta.objects.filter(id_venta__id_servicio_id=id_servicio).order_by('id_detalle')
+        .values('id_detalle', 'id_venta_id', 'id_producto_id', 'id_producto__nombre', 'cantidad', 'precio_unitario', 'subtotal')
+    ):
+        lineas[linea['id_venta_id']].append({
+            'id_detalle': linea['id_detalle'],
+            'id_producto': linea['id_producto_id'],
+            'producto': linea['id_producto__nombre'],
+            'cantidad': linea['cantidad'],
+            'precio_unitario': str(linea['precio_unitario']),
+            'subtotal': str(linea['subtotal']),
+        })
+
+    for venta in (
+        Venta.objects.filter(id_servicio_id=id_servicio).order_by('id_venta')
+        .values('id_venta', 'fecha', 'id_usuario_id', 'id_usuario__username', 'id_cliente_id',
+                'id_cliente__nombre_empresa', 'total', 'clave_idempotencia')
+    ):
+        yield {
+            'id_venta': venta['id_venta'],
+            'fecha': venta['fecha'].isoformat(),
+            'id_servicio': id_servicio,
+            'id_usuario': venta['id_usuario_id'],
+            'usuario': venta['id_usuario__username'],
+            'id_cliente': venta['id_cliente_id'],
+            'cliente': venta['id_cliente__nombre_empresa'],
+            'total': str(venta['total']),
+            'clave_idempotencia': venta['clave_idempotencia'],
+            'lineas': lineas.pop(venta['id_venta'], []),
+        }
+
+
+def _borrar_sin_senales(modelo, campo, ids):
+    qn = connection.ops.quote_name
+    tabla = qn(modelo._meta.db_table)
+    columna = qn(modelo._meta.get_field(campo).column)
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(ids), TAMANO_BORRADO):
+            grupo = ids[inicio:inicio + TAMANO_BORRADO]
+            cursor.execute(f'DELETE FROM {tabla} WHERE {columna} IN ({", ".join(["%s"] * len(grupo))})', grupo)
+
+
+def archivar_servicio(servicio):
+    """Mueve las ventas de un servicio cerrado al archivo. Devuelve el número de ventas archivadas."""
+    from tpv_app.models import DetalleVenta, Servicio, Venta, VentaArchivada
+
+    # Sin las ventas ya no se podría calcular: el informe Z se asegura antes de archivar
+    informe_z_vigente(servicio)
+
+    carpeta = directorio()
+    carpeta.mkdir(parents=True, exist_ok=True)
+    fichero = nombre_fichero(servicio.pk)
+    ruta = carpeta / fichero
+
+    # 1. Fichero comprimido (se escribe aparte y se renombra al confirmar: nunca queda uno a medias)
+    indice, ids_detalle = [], set()
+    temporal = ruta.with_name(ruta.name + '.parcial')
+    with gzip.open(temporal, 'wt', encoding='utf-8') as salida:
+        for linea, registro in enumerate(_ventas_servicio(servicio.pk)):
+            ids_detalle.update(linea_venta['id_detalle'] for linea_venta in registro['lineas'])
+            salida.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n')
+            indice.append(VentaArchivada(
+                id_venta=registro['id_venta'], id_servicio=servicio.pk, fecha=parse_datetime(registro['fecha']),
+                id_cliente=registro['id_cliente'], total=Decimal(registro['total']),
+                clave_idempotencia=registro['clave_idempotencia'], fichero=fichero, linea=linea
+            ))
+        salida.flush()
+        os.fsync(salida.fileno())
+
+    # 2. Índice y borrado en una sola transacción, con el servicio bloqueado y comprobando que sus
+    # ventas y líneas son exactamente las escritas en el fichero (si no, no se archiva nada)
+    ids = [venta.id_venta for venta in indice]
+    colocado = False
+    try:
+        with transaction.atomic():
+            if not Servicio.objects.select_for_update().filter(pk=servicio.pk, archivado=False).exists():
+                raise ValidationError(f'El servicio {servicio.pk} ya está archivado.')
+            if (set(Venta.objects.filter(id_servicio_id=servicio.pk).values_list('id_venta', flat=True)) != set(ids)
+                    or set(DetalleVenta.objects.filter(id_venta__id_servicio_id=servicio.pk)
+                           .values_list('id_detalle', flat=True)) != ids_detalle):
+                raise ValidationError(f'El servicio {servicio.pk} ha cambiado mientras se archivaba; vuelva a intentarlo.')
+            os.replace(temporal, ruta)  # Un intento anterior interrumpido antes del COMMIT se sobrescribe
+            colocado = True
+            VentaArchivada.objects.bulk_create(indice, batch_size=500)
+            _borrar_sin_senales(DetalleVenta, 'id_venta', ids)
+            _borrar_sin_senales(Venta, 'id_venta', ids)
+            Servicio.objects.filter(pk=servicio.pk).update(archivado=True)
+    except Exception:
+        temporal.unlink(missing_ok=True)
+        if colocado:
+            ruta.unlink(missing_ok=True)  # Sin índice el fichero no se usa: no se deja uno que no coincide
+        raise
+    return len(ids)
+
+
+def leer_fichero(fichero):
+    """Recorre los registros de un fichero del archivo."""
+    with gzip.open(directorio() / fichero, 'rt', encoding='utf-8') as entrada:
+        for linea in entrada:
+            yield json.loads(linea)
+
+
+def registros_archivados(desde=None, hasta=None, id_servicio=None):
+    """Recorre los registros archivados con fecha en [desde, hasta) (datetimes) y, si se indica, de un servicio.
+
+    El índice VentaArchivada decide qué ficheros se abren; la fecha de cada registro se devuelve como datetime.
+    """
+    from tpv_app.models import VentaArchivada
+
+    indice = VentaArchivada.objects.all()
+    if desde is not None:
+        indice = indice.filter(fecha__gte=desde)
+    if hasta is not None:
+        indice = indice.filter(fecha__lt=hasta)
+    if id_servicio is not None:
+        indice = indice.filter(id_servicio=id_servicio)
+    for fichero in indice.values_list('fichero', flat=True).distinct().order_by('fichero'):
+        for registro in leer_fichero(fichero):
+            fecha = parse_datetime(registro['fecha'])
+            if ((desde is None or fecha >= desde) and (hasta is None or fecha < hasta)
+                    and (id_servicio is None or registro['id_servicio'] == id_servicio)):
+                registro['fecha'] = fecha
+                yield registro
+
+
+def buscar_venta(id_venta):
+    """Devuelve el registro archivado de una venta (con sus líneas) o None si no está archivada."""
+    from tpv_app.models import VentaArchivada
+
+    entrada = VentaArchivada.objects.filter(pk=id_venta).values_list('fichero', 'linea').first()
+    if entrada is None:
+        return None
+    fichero, posicion = entrada
+    for linea, registro in enumerate(leer_fichero(fichero)):
+        if linea == posicion:
+            return registro
+    return None
+
+
+def sumar_a_resumenes():
+    """Vuelve a sumar las ventas archivadas a los resúmenes diarios (lo usa resumenes.reconstruir)."""
+    from tpv_app.models import Cliente, Producto, VentaArchivada
+
+    # Los productos y clientes borrados después de archivar ya no tienen resumen
+    id_productos = set(Producto.objects.values_list('id_producto', flat=True))
+    id_clientes = set(Cliente.objects.values_list('id_cliente', flat=True))
+    for fichero in VentaArchivada.objects.values_list('fichero', flat=True).distinct().order_by('fichero'):
+        productos, clientes = [], []
+        for registro in leer_fichero(fichero):
+            dia = resumenes._dia(parse_datetime(registro['fecha']))
+            if registro['id_cliente'] in id_clientes:
+                clientes.append((dia, registro['id_cliente'], 1, Decimal(registro['total'])))
+            productos.extend(
+                (dia, linea['id_producto'], linea['cantidad'], 1, Decimal(linea['subtotal']))
+                for linea in registro['lineas'] if linea['id_producto'] in id_productos
+            )
+        resumenes.acumular_productos(productos)
+        resumenes.acumular_clientes(clientes)
+
+
+def archivar(antes, simular=False):
+    """Archiva todos los servicios cerrados antes de `antes`. Devuelve [(servicio, ventas archivadas)].
+
+    Un servicio que cambia mientras se archiva se omite y queda para la próxima ejecución.
+    """
+    resultado = []
+    for servicio in servicios_archivables(antes):
+        if simular:
+            resultado.append((servicio, servicio.cantidad_tickets))
+            continue
+        try:
+            resultado.append((servicio, archivar_servicio(servicio)))
+        except ValidationError as e:
+            logger.warning('No se archiva el servicio %s: %s', servicio.pk, ' '.join(e.messages))
+    return resultado
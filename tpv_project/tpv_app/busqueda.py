@@ -0,0 +1,211 @@
+import re
+import unicodedata
+
+from django.db import DatabaseError, connection, transaction
+
+
+# -----------------------------
+# Búsqueda de clientes
+# -----------------------------
+# Cada cliente se indexa en TerminoCliente con una fila por palabra de nombre_empresa y
+# nombre_contacto, en minúsculas y sin tildes, y con todos los sufijos de su NIF/CIF (para que
+# "12345" encuentre "B12345678"). Una búsqueda exige que cada palabra escrita sea prefijo de
+# algún término del cliente. En SQLite (collation BINARY) el prefijo se consulta como rango
+# (termino >= 'gar' AND termino < 'gas') sobre el índice (termino, id_cliente); en otras bases de
+# datos la collation puede ser lingüística (los signos ordenan antes que las letras y el rango deja
+# de valer), así que se usa LIKE 'gar%', que en PostgreSQL aprovecha el mismo índice gracias a la
+# clase de operadores varchar_pattern_ops.
+# El índice se mantiene con las señales de Cliente; tras cargas masivas (bulk_create, update)
+# hay que ejecutar `manage.py reindexar_clientes`.
+
+LONGITUD_TERMINO = 64
+LONGITUD_MINIMA = 2  # Caracteres mínimos de una búsqueda
+MAX_PALABRAS = 5
+
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni signos: 'García-López, S.L.' -> 'garcia lopez s l'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return _SEPARADORES.sub(' ', texto.lower()).strip()
+
+
+def terminos_cliente(nombre_empresa, nombre_contacto, nif_cif):
+    """Conjunto de términos indexados para un cliente."""
+    terminos = set(normalizar(nombre_empresa).split()) | set(normalizar(nombre_contacto).split())
+    nif = normalizar(nif_cif).replace(' ', '')
+    terminos.update(nif[inicio:] for inicio in range(len(nif)))
+    return {termino[:LONGITUD_TERMINO] for termino in terminos}
+
+
+def indexar_cliente(cliente):
+    """Rehace los términos de un cliente (lo llama la señal post_save de Cliente)."""
+    from tpv_app.models import TerminoCliente
+
+    with transaction.atomic():
+        TerminoCliente.objects.filter(id_cliente=cliente.pk).delete()
+        TerminoCliente.objects.bulk_create([
+            TerminoCliente(termino=termino, id_cliente_id=cliente.pk)
+            for termino in terminos_cliente(cliente.nombre_empresa, cliente.nombre_contacto, cliente.nif_cif)
+        ])
+
+
+def reindexar_clientes():
+    """Vacía y vuelve a generar el índice de todos los clientes. Devuelve el número de términos."""
+    from tpv_app.models import Cliente, TerminoCliente
+
+    def filas():
+        clientes = Cliente.objects.values_list('id_cliente', 'nombre_empresa', 'nombre_contacto', 'nif_cif')
+        for id_cliente, nombre_empresa, nombre_contacto, nif_cif in clientes.iterator(chunk_size=2000):
+            for termino in terminos_cliente(nombre_empresa, nombre_contacto, nif_cif):
+                yield TerminoCliente(termino=termino, id_cliente_id=id_cliente)
+
+    with transaction.atomic():
+        TerminoCliente.objects.all().delete()
+        return len(TerminoCliente.objects.bulk_create(filas(), batch_size=1000))
+
+
+def _siguiente_prefijo(prefijo):
+    # Menor cadena mayor que todas las que empiezan por `prefijo` en orden binario (solo hay [0-9a-z])
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def _filtro_prefijo(palabra):
+    if connection.vendor == 'sqlite':
+        return {'termino__gte': palabra, 'termino__lt': _siguiente_prefijo(palabra)}
+    return {'termino__startswith': palabra}
+
+
+def buscar_clientes(texto):
+    """QuerySet de los clientes en los que cada palabra de `texto` es prefijo de algún término.
+
+    Devuelve None si la búsqueda es demasiado corta.
+    """
+    from tpv_app.models import Cliente, TerminoCliente
+
+    palabras = sorted(set(normalizar(texto).split()), key=len, reverse=True)[:MAX_PALABRAS]
+    if sum(len(palabra) for palabra in palabras) < LONGITUD_MINIMA:
+        return None
+
+    clientes = Cliente.objects.all()
+    for palabra in palabras:
+        palabra = palabra[:LONGITUD_TERMINO]
+        clientes = clientes.filter(id_cliente__in=TerminoCliente.objects.filter(
+            **_filtro_prefijo(palabra)
+        ).values('id_cliente'))
+    return clientes
+
+
+# -----------------------------
+# Búsqueda de productos
+# -----------------------------
+# En SQLite los nombres normalizados de los productos activos se guardan en una tabla FTS5 con
+# el tokenizador trigram (rowid = id_producto): `LIKE '%texto%'` usa su índice de trigramas
+# (desde 3 caracteres), así que la búsqueda de subcadenas no recorre la tabla. El índice se
+# mantiene con las señales de Producto y con los lotes de tpv_app.importacion. En otras bases de
+# datos, o si SQLite no tiene FTS5, se busca en los nombres normalizados de la instantánea del
+# catálogo de cada worker (se calculan una vez por versión del catálogo).
+# Los resultados se ordenan: primero los nombres que empiezan por la primera palabra, después
+# los que tienen una palabra que empieza por ella y, por último, los más cortos.
+
+TABLA_PRODUCTOS_FTS = 'tpv_app_producto_busqueda'
+
+
+def _fts_disponible(conexion=connection):
+    if conexion.vendor != 'sqlite':
+        return False
+    # Se consulta una vez por conexión: olvidar_fts() lo reinicia al abrir una conexión y al migrar
+    disponible = getattr(conexion, '_tpv_fts_disponible', None)
+    if disponible is None:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLA_PRODUCTOS_FTS])
+            disponible = cursor.fetchone() is not None
+        conexion._tpv_fts_disponible = disponible
+    return disponible
+
+
+def olvidar_fts(conexion):
+    """Descarta lo que se sabía de la tabla FTS5 en `conexion` (señales connection_created y post_migrate)."""
+    conexion._tpv_fts_disponible = None
+
+
+def crear_indice_productos(modelo_producto, conexion=connection):
+    """Crea y llena la tabla FTS5. Devuelve False si SQLite no tiene FTS5."""
+    if conexion.vendor != 'sqlite':
+        return False
+    olvidar_fts(conexion)
+    with conexion.cursor() as cursor:
+        try:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_PRODUCTOS_FTS} USING fts5(nombre, tokenize='trigram')")
+        except DatabaseError:
+            return False
+        cursor.execute(f"DELETE FROM {TABLA_PRODUCTOS_FTS}")
+        productos = modelo_producto.objects.filter(activo=True).values_list('id_producto', 'nombre')
+        cursor.executemany(
+            f"INSERT INTO {TABLA_PRODUCTOS_FTS} (rowid, nombre) VALUES (%s, %s)",
+            [(id_producto, normalizar(nombre)) for id_producto, nombre in productos.iterator(chunk_size=2000)]
+        )
+    return True
+
+
+def indexar_productos(ids):
+    """Actualiza en el índice los productos indicados (los inactivos o borrados se quitan)."""
+    from tpv_app.models import Producto
+
+    ids = list(ids)
+    if not ids or not _fts_disponible():
+        return
+    activos = Producto.objects.filter(pk__in=ids, activo=True).values_list('id_producto', 'nombre')
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(ids), 500):
+            grupo = ids[inicio:inicio + 500]
+            cursor.execute(f"DELETE FROM {TABLA_PRODUCTOS_FTS} WHERE rowid IN ({', '.join(['%s'] * len(grupo))})", grupo)
+        cursor.executemany(
+            f"INSERT INTO {TABLA_PRODUCTOS_FTS} (rowid, nombre) VALUES (%s, %s)",
+            [(id_producto, normalizar(nombre)) for id_producto, nombre in activos]
+        )
+
+
+def _buscar_ids_fts(palabras, limite):
+    condiciones = ' AND '.join(['nombre LIKE %s'] * len(palabras))
+    sql = (
+        f"SELECT rowid FROM {TABLA_PRODUCTOS_FTS} WHERE {condiciones} "
+        f"ORDER BY nombre LIKE %s DESC, ' ' || nombre LIKE %s DESC, length(nombre), rowid"
+    )
+    parametros = [f'%{palabra}%' for palabra in palabras] + [f'{palabras[0]}%', f'% {palabras[0]}%']
+    if limite:
+        sql += ' LIMIT %s'
+        parametros.append(limite)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def _buscar_en_catalogo(catalogo, palabras):
+    coincidencias = []
+    for nombre, producto in catalogo.productos_activos_normalizados():
+        if all(palabra in nombre for palabra in palabras):
+            clave = (not nombre.startswith(palabras[0]), f' {palabras[0]}' not in f' {nombre}', len(nombre), producto.id_producto)
+            coincidencias.append((clave, producto))
+    return [producto for _, producto in sorted(coincidencias, key=lambda coincidencia: coincidencia[0])]
+
+
+def buscar_productos(texto, limite=None):
+    """Productos activos (ProductoCatalogo) cuyo nombre contiene todas las palabras de `texto`,
+    sin distinguir mayúsculas ni tildes, ordenados por relevancia. None si la búsqueda es demasiado corta.
+    """
+    from tpv_app.catalogo import obtener_catalogo
+
+    # La primera palabra escrita marca el orden; el resto solo filtra
+    palabras = list(dict.fromkeys(normalizar(texto).split()))[:MAX_PALABRAS]
+    if sum(len(palabra) for palabra in palabras) < LONGITUD_MINIMA:
+        return None
+
+    catalogo = obtener_catalogo()
+    if not _fts_disponible():
+        return _buscar_en_catalogo(catalogo, palabras)[:limite]
+    # Los productos desactivados sin pasar por save() pueden seguir en el índice: se descartan aquí
+    productos = (catalogo.productos.get(id_producto) for id_producto in _buscar_ids_fts(palabras, limite))
+    return [producto for producto in productos if producto is not None and producto.activo]
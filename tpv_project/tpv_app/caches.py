@@ -0,0 +1,101 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# -----------------------------
+# Versiones de datos compartidas
+# -----------------------------
+# Cada conjunto de datos cacheado (servicio abierto, catálogo...) tiene un número de versión
+# guardado en la caché de Django. Con una caché compartida (Redis, Memcached) todos los
+# workers ven el mismo número; con LocMemCache cada proceso tiene el suyo y el TTL local
+# acota cuánto tiempo puede quedar desfasado un worker.
+
+def _clave_version(nombre):
+    return f'tpv:version:{nombre}'
+
+
+def version(nombre):
+    """Devuelve la versión actual de un conjunto de datos."""
+    actual = cache.get(_clave_version(nombre))
+    if actual is None:
+        # Si la clave se perdió usamos un valor nuevo que no puede coincidir con uno anterior
+        actual = time.time_ns()
+        cache.add(_clave_version(nombre), actual, None)
+        actual = cache.get(_clave_version(nombre), actual)
+    return actual
+
+
+def versiones(nombres):
+    """Como version() para muchos conjuntos de datos con una sola lectura de la caché: nombre -> versión."""
+    claves = {_clave_version(nombre): nombre for nombre in nombres}
+    actuales = cache.get_many(list(claves))
+    for clave, nombre in claves.items():
+        if clave not in actuales:
+            actuales[clave] = version(nombre)
+    return {nombre: actuales[clave] for clave, nombre in claves.items()}
+
+
+def _incrementar_version(nombre):
+    try:
+        cache.incr(_clave_version(nombre))
+    except ValueError:
+        cache.set(_clave_version(nombre), time.time_ns(), None)
+
+
+def invalidar(nombre):
+    """Incrementa la versión ahora y de nuevo al confirmar la transacción.
+
+    El segundo incremento evita que otro proceso se quede con datos leídos antes del COMMIT.
+    """
+    _incrementar_version(nombre)
+    transaction.on_commit(lambda: _incrementar_version(nombre))
+
+
+# -----------------------------
+# Caché local al proceso
+# -----------------------------
+
+_local = {}
+_lock = threading.Lock()
+
+
+def obtener(nombre, cargar):
+    """Devuelve el valor cacheado en este proceso para `nombre`, recargándolo con `cargar()`
+    cuando cambia su versión o caduca el TTL local."""
+    ttl = getattr(settings, 'TPV_CACHE_LOCAL_TTL', 30)
+    version_actual = version(nombre)
+    entrada = _local.get(nombre)
+    if entrada is not None:
+        version_guardada, caduca, valor = entrada
+        if version_guardada == version_actual and caduca > time.monotonic():
+            return valor
+
+    valor = cargar()
+    with _lock:
+        _local[nombre] = (version_actual, time.monotonic() + ttl, valor)
+    return valor
+
+
+def limpiar():
+    """Vacía la caché local del proceso (usado en tests y tras cambios masivos)."""
+    with _lock:
+        _local.clear()
+
+
+# -----------------------------
+# Servicio abierto
+# -----------------------------
+
+def servicio_abierto():
+    """Devuelve el servicio abierto actual (o None) sin consultar la base de datos en cada petición.
+
+    La instancia se comparte entre peticiones: sirve para asignar ventas, pero sus contadores
+    (cantidad_tickets, total_ingresos) pueden no estar al día.
+    """
+    from tpv_app.models import Servicio
+
+    return obtener('servicio_abierto', lambda: Servicio.objects.filter(estado='abierto').first())
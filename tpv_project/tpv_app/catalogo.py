@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from functools import cached_property
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Optional
+
+from tpv_app import caches
+from tpv_app.busqueda import normalizar
+
+
+# -----------------------------
+# Instantánea inmutable del catálogo
+# -----------------------------
+# Cada worker guarda una copia de solo lectura de productos y categorías. Las escrituras del
+# catálogo (señales de Producto y Categoria) incrementan la versión 'catalogo' y la copia se
+# recarga de forma perezosa en la siguiente lectura.
+
+@dataclass(frozen=True)
+class CategoriaCatalogo:
+    id_categoria: int
+    nombre: str
+    activo: bool
+    version: int = 0
+
+    def __str__(self):
+        return self.nombre
+
+
+@dataclass(frozen=True)
+class ProductoCatalogo:
+    id_producto: int
+    nombre: str
+    precio: Decimal
+    activo: bool
+    id_categoria: Optional[CategoriaCatalogo]  # Mismo nombre que la FK del modelo, para las plantillas
+    version: int = 0
+
+    @property
+    def id_categoria_id(self):
+        return self.id_categoria.id_categoria if self.id_categoria else None
+
+    def __str__(self):
+        return self.nombre
+
+
+@dataclass(frozen=True)
+class Catalogo:
+    version: int  # Valor de VersionCatalogo al cargar la instantánea
+    version_eliminacion: int
+    productos: MappingProxyType  # id_producto -> ProductoCatalogo
+    categorias: MappingProxyType  # id_categoria -> CategoriaCatalogo
+
+    def productos_activos(self):
+        return [producto for producto in self.productos.values() if producto.activo]
+
+    @cached_property
+    def _activos_por_categoria(self):
+        # Se calcula una vez por instantánea, es decir, por versión del catálogo
+        grupos = {}
+        for producto in self.productos.values():
+            if producto.activo:
+                grupos.setdefault(producto.id_categoria_id, []).append(producto)
+        return MappingProxyType({id_categoria: tuple(productos) for id_categoria, productos in grupos.items()})
+
+    def productos_de_categoria(self, id_categoria):
+        """Productos activos de una categoría (None: los que no tienen categoría), en orden de id."""
+        return self._activos_por_categoria.get(id_categoria, ())
+
+    @cached_property
+    def _activos_normalizados(self):
+        return tuple((normalizar(producto.nombre), producto) for producto in self.productos_activos())
+
+    def productos_activos_normalizados(self):
+        """Pares (nombre normalizado, producto) de los productos activos, para la búsqueda sin FTS5."""
+        return self._activos_normalizados
+
+    def categorias_activas(self):
+        return [categoria for categoria in self.categorias.values() if categoria.activo]
+
+    def cambios_desde(self, version):
+        """Productos y categorías modificados (incluidos los desactivados) después de `version`."""
+        return (
+            [producto for producto in self.productos.values() if producto.version > version],
+            [categoria for categoria in self.categorias.values() if categoria.version > version],
+        )
+
+
+def _cargar_catalogo():
+    from tpv_app.models import Categoria, Producto, VersionCatalogo
+
+    # El contador se lee antes que las filas: nunca se anuncia una versión cuyas filas falten
+    version, version_eliminacion = (
+        VersionCatalogo.objects.filter(pk=1).values_list('version', 'version_eliminacion').first() or (0, 0)
+    )
+    categorias = {
+        id_categoria: CategoriaCatalogo(id_categoria, nombre, activo, version_fila)
+        for id_categoria, nombre, activo, version_fila in
+        Categoria.objects.order_by('id_categoria').values_list('id_categoria', 'nombre', 'activo', 'version')
+    }
+    productos = {
+        id_producto: ProductoCatalogo(id_producto, nombre, precio, activo, categorias.get(id_categoria), version_fila)
+        for id_producto, nombre, precio, activo, id_categoria, version_fila in
+        Producto.objects.order_by('id_producto').values_list(
+            'id_producto', 'nombre', 'precio', 'activo', 'id_categoria', 'version'
+        )
+    }
+    return Catalogo(version, version_eliminacion, MappingProxyType(productos), MappingProxyType(categorias))
+
+
+def obtener_catalogo():
+    """Devuelve la instantánea del catálogo de este worker, recargándola si cambió su versión."""
+    return caches.obtener('catalogo', _cargar_catalogo)
+
+
+def invalidar_catalogo():
+    """Marca el catálogo como modificado para que todos los workers lo recarguen."""
+    caches.invalidar('catalogo')
@@ -0,0 +1,105 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+
+# -----------------------------
+# Cola de escritura en proceso
+# -----------------------------
+# SQLite admite un único escritor. En lugar de que cada petición compita por el bloqueo, las
+# vistas de venta y catálogo entregan sus escrituras a un hilo escritor que ejecuta todas las
+# pendientes en una sola transacción (cada una en su propio savepoint) y responde a cada
+# petición cuando el COMMIT termina. Se activa con TPV_COLA_ESCRITURA; si no, se ejecuta en línea.
+#
+# Quien espera lo hace como mucho TPV_COLA_ESCRITURA_ESPERA segundos: si su escritura aún no ha
+# empezado se cancela; si ya está en curso, su resultado es desconocido (las ventas llevan clave
+# de idempotencia para reintentarlas). Un error del propio hilo fuera de las escrituras (p. ej.
+# al recuperar la conexión) falla el grupo en curso y el hilo sigue atendiendo la cola.
+
+logger = logging.getLogger(__name__)
+
+class ColaEscritura:
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def ejecutar(self, funcion, *args, **kwargs):
+        """Ejecuta `funcion` en el hilo escritor y devuelve su resultado (o relanza su excepción)."""
+        if not getattr(settings, 'TPV_COLA_ESCRITURA', False) or threading.current_thread() is self._hilo:
+            return funcion(*args, **kwargs)
+
+        futuro = Future()
+        self._cola.put((futuro, funcion, args, kwargs))
+        self._arrancar()
+        try:
+            return futuro.result(timeout=getattr(settings, 'TPV_COLA_ESCRITURA_ESPERA', 30))
+        except TimeoutError:
+            if futuro.cancel():
+                raise TimeoutError('La cola de escritura está saturada: la operación no se ha realizado.')
+            raise TimeoutError('La cola de escritura no respondió a tiempo: la operación puede haberse realizado.')
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='tpv-cola-escritura', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        maximo = getattr(settings, 'TPV_COLA_ESCRITURA_GRUPO', 50)
+        while True:
+            trabajos = [self._cola.get()]
+            # Todo lo que llegó mientras se confirmaba el grupo anterior va en el mismo COMMIT
+            while len(trabajos) < maximo:
+                try:
+                    trabajos.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._ejecutar_grupo(trabajos)
+            except Exception as error:
+                logger.exception('Error en el hilo de la cola de escritura')
+                for futuro, _, _, _ in trabajos:
+                    if not futuro.done():
+                        futuro.set_exception(error)
+
+    def _ejecutar_grupo(self, trabajos):
+        # Las escrituras canceladas por tiempo de espera no se ejecutan
+        trabajos = [trabajo for trabajo in trabajos if trabajo[0].set_running_or_notify_cancel()]
+        if not trabajos:
+            return
+        close_old_connections()
+        resultados = []
+        try:
+            with transaction.atomic():
+                for futuro, funcion, args, kwargs in trabajos:
+                    try:
+                        with transaction.atomic():
+                            resultados.append((futuro, None, funcion(*args, **kwargs)))
+                    except Exception as error:
+                        resultados.append((futuro, error, None))
+        except Exception as error:
+            # Falló el COMMIT: ninguna escritura del grupo se ha guardado
+            for futuro, _, _, _ in trabajos:
+                futuro.set_exception(error)
+            return
+        finally:
+            connection.close_if_unusable_or_obsolete()
+
+        for futuro, error, valor in resultados:
+            if error is not None:
+                futuro.set_exception(error)
+            else:
+                futuro.set_result(valor)
+
+
+cola = ColaEscritura()
+
+
+def ejecutar(funcion, *args, **kwargs):
+    """Atajo para `cola.ejecutar`."""
+    return cola.ejecutar(funcion, *args, **kwargs)
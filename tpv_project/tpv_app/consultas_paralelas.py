@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+# -----------------------------
+# Consultas de informes en paralelo
+# -----------------------------
+# Las consultas independientes de un informe se reparten en un pool acotado de hilos. Cada hilo
+# usa su propia conexión (Django las guarda por hilo) y la reutiliza entre tareas según
+# CONN_MAX_AGE, así que el pool es también un pool de conexiones de lectura. La latencia pasa a
+# ser la de la consulta más lenta en lugar de la suma de todas: psycopg y SQLite liberan el GIL
+# mientras la base de datos trabaja (en SQLite no durante las funciones de fecha que Django
+# implementa en Python, como los truncados con zona horaria). Aun así, en SQLite el reparto sale
+# más caro que lo que se solapa, así que el pool solo se activa en el perfil de PostgreSQL.
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TPV_INFORMES_HILOS', 1), thread_name_prefix='tpv-informes'
+            )
+        return _pool
+
+
+def _en_hilo(funcion):
+    close_old_connections()  # Descarta conexiones caducadas o rotas antes de usarlas
+    try:
+        return funcion()
+    finally:
+        close_old_connections()
+
+
+def ejecutar(tareas):
+    """Ejecuta un diccionario nombre -> función sin argumentos y devuelve nombre -> resultado.
+
+    Dentro de una transacción se ejecuta todo en el hilo actual: otras conexiones no verían
+    los datos aún sin confirmar. Lo mismo si hay una sola tarea o TPV_INFORMES_HILOS <= 1.
+    """
+    if len(tareas) < 2 or connection.in_atomic_block or getattr(settings, 'TPV_INFORMES_HILOS', 1) <= 1:
+        return {nombre: funcion() for nombre, funcion in tareas.items()}
+
+    pool = _obtener_pool()
+    futuros = {nombre: pool.submit(_en_hilo, funcion) for nombre, funcion in tareas.items()}
+    return {nombre: futuro.result() for nombre, futuro in futuros.items()}
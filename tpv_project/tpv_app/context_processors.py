@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def fragmentos(request):
+    """Duración de los fragmentos de plantilla cacheados ({% cache fragmentos_ttl ... version_datos %})."""
+    return {'fragmentos_ttl': getattr(settings, 'TPV_FRAGMENTOS_TTL', 300)}
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from tpv_app import caches
+from tpv_app.models import DiarioVenta, MarcaDiario, incrementar_contadores_servicio
+
+
+# -----------------------------
+# Aplicador del diario de ventas
+# -----------------------------
+# Con TPV_AGREGACION_DIFERIDA la venta solo escribe sus filas y un registro en DiarioVenta.
+# Este módulo aplica los registros a los agregados en segundo plano. Cada consumidor tiene su
+# propia marca de agua (MarcaDiario) que avanza en la misma transacción que sus cambios, por lo
+# que tras una caída basta con volver a ejecutar el aplicador: nada se aplica dos veces.
+#
+# Los ids se asignan al insertar, pero las transacciones pueden confirmarse en otro orden: un
+# registro con id menor puede hacerse visible después de haber aplicado otro mayor. Por eso la
+# marca guarda, además del último id aplicado, los huecos (ids saltados por debajo de él), que
+# se vuelven a buscar en cada pasada. Un hueco solo se olvida tras TPV_DIARIO_HUECO_CADUCIDAD
+# segundos, cuando ya no puede ser una transacción en curso sino un id perdido por un rollback.
+# A la inversa, el recálculo de unos pocos servicios da por aplicados solo sus registros: los que
+# quedan por encima de la marca se guardan como adelantados y las pasadas siguientes los omiten.
+#
+# Solo los contadores de Servicio se difieren: los resúmenes diarios (tpv_app.resumenes) se
+# siguen actualizando en la transacción de la venta.
+
+_aplicadores = {}
+
+
+def registrar_aplicador(nombre):
+    """Decorador para añadir un consumidor del diario. Recibe la lista de registros pendientes."""
+    def decorador(funcion):
+        _aplicadores[nombre] = funcion
+        return funcion
+    return decorador
+
+
+@registrar_aplicador('contadores_servicio')
+def aplicar_contadores_servicio(registros):
+    """Agrupa los registros por servicio y aplica un único incremento por servicio."""
+    por_servicio = {}
+    for registro in registros:
+        tickets, ingresos = por_servicio.get(registro.id_servicio, (0, 0))
+        por_servicio[registro.id_servicio] = (tickets + registro.tickets, ingresos + registro.ingresos)
+    for id_servicio, (tickets, ingresos) in por_servicio.items():
+        if id_servicio and (tickets or ingresos):
+            incrementar_contadores_servicio(id_servicio, tickets, ingresos)
+    # El gráfico de servicios (tpv_app.graficos) lee estos contadores: los datos cacheados ya no valen
+    caches.invalidar('ventas')
+
+
+def _pendientes(marca):
+    huecos = [int(id_registro) for id_registro in marca.huecos]
+    return DiarioVenta.objects.filter((Q(id__gt=marca.ultimo_id) & ~Q(id__in=marca.adelantados)) | Q(id__in=huecos))
+
+
+def _avanzar(marca, ids_aplicados):
+    """Mueve la marca hasta el mayor id aplicado y anota como huecos los ids saltados."""
+    ahora = timezone.now()
+    aplicados = set(ids_aplicados)
+    adelantados = set(marca.adelantados)
+    huecos = {id_registro: fecha for id_registro, fecha in marca.huecos.items() if int(id_registro) not in aplicados}
+    nuevo_ultimo = max(aplicados, default=marca.ultimo_id)
+    for id_registro in range(marca.ultimo_id + 1, nuevo_ultimo):
+        if id_registro not in aplicados and id_registro not in adelantados:
+            huecos[str(id_registro)] = ahora.isoformat()
+    caducidad = ahora - timedelta(seconds=getattr(settings, 'TPV_DIARIO_HUECO_CADUCIDAD', 3600))
+    marca.huecos = {id_registro: fecha for id_registro, fecha in huecos.items() if datetime.fromisoformat(fecha) > caducidad}
+    marca.ultimo_id = max(marca.ultimo_id, nuevo_ultimo)
+    marca.adelantados = sorted(id_registro for id_registro in adelantados if id_registro > marca.ultimo_id)
+    marca.fecha_aplicacion = ahora
+    marca.save(update_fields=['ultimo_id', 'huecos', 'adelantados', 'fecha_aplicacion'])
+
+
+def aplicar_pendientes(limite=5000, nombres=None):
+    """Aplica como mucho `limite` registros pendientes a cada consumidor (o a los de `nombres`).
+
+    Devuelve cuántos aplicó.
+    """
+    aplicados = 0
+    for nombre, aplicador in _aplicadores.items():
+        if nombres is not None and nombre not in nombres:
+            continue
+        with transaction.atomic():
+            marca, _ = MarcaDiario.objects.select_for_update().get_or_create(nombre=nombre)
+            registros = list(_pendientes(marca).order_by('id')[:limite])
+            if not registros:
+                continue
+            aplicador(registros)
+            _avanzar(marca, [registro.id for registro in registros])
+            aplicados += len(registros)
+    return aplicados
+
+
+def marcar_aplicados(nombre, ids_servicio=None):
+    """Da por aplicados al consumidor `nombre` los registros visibles (tras recalcular sus agregados):
+    todos o solo los de los servicios `ids_servicio`. Los demás siguen pendientes.
+
+    Debe llamarse en la misma transacción que el recálculo.
+    """
+    marca, _ = MarcaDiario.objects.select_for_update().get_or_create(nombre=nombre)
+    pendientes = _pendientes(marca)
+    if ids_servicio is None:
+        _avanzar(marca, list(pendientes.values_list('id', flat=True)))
+        return
+    ids = set(pendientes.filter(id_servicio__in=ids_servicio).values_list('id', flat=True))
+    if not ids:
+        return
+    marca.huecos = {id_registro: fecha for id_registro, fecha in marca.huecos.items() if int(id_registro) not in ids}
+    marca.adelantados = sorted(set(marca.adelantados) | {id_registro for id_registro in ids if id_registro > marca.ultimo_id})
+    marca.save(update_fields=['huecos', 'adelantados'])
+
+
+def retraso():
+    """Métrica de retraso por consumidor: registros pendientes y antigüedad del más antiguo (segundos)."""
+    marcas = {marca.nombre: marca for marca in MarcaDiario.objects.all()}
+    ahora = timezone.now()
+    estado = {}
+    for nombre in _aplicadores:
+        pendientes = _pendientes(marcas.get(nombre) or MarcaDiario(nombre=nombre))
+        resumen = pendientes.aggregate(mas_antiguo=Min('fecha_registro'))
+        estado[nombre] = {
+            'pendientes': pendientes.count(),
+            'segundos': (ahora - resumen['mas_antiguo']).total_seconds() if resumen['mas_antiguo'] else 0.0,
+        }
+    return estado
@@ -0,0 +1,218 @@
+import csv
+import itertools
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+# -----------------------------
+# Exportación de ventas y líneas
+# -----------------------------
+# Las filas se leen en lotes por clave primaria (WHERE pk > último ORDER BY pk LIMIT n) con
+# .values(), de modo que nunca hay más de TAMANO_LOTE_EXPORTACION filas en memoria, cada consulta
+# es corta (no retiene una transacción de lectura durante toda la descarga) y funciona igual en
+# SQLite y en PostgreSQL detrás de PgBouncer, donde no hay cursores de servidor.
+#
+# Las ventas de los servicios archivados (tpv_app.archivo) se exportan primero, leídas de sus
+# ficheros con las mismas columnas; después van las de las tablas, en orden de id.
+
+TAMANO_LOTE_EXPORTACION = 2000
+FORMATOS_EXPORTACION = ('csv', 'jsonl')
+
+# (columna exportada, campo de .values())
+COLUMNAS_VENTAS = [
+    ('id_venta', 'id_venta'),
+    ('fecha', 'fecha'),
+    ('servicio', 'id_servicio__nombre'),
+    ('usuario', 'id_usuario__username'),
+    ('cliente', 'id_cliente__nombre_empresa'),
+    ('nif_cif', 'id_cliente__nif_cif'),
+    ('total', 'total'),
+]
+
+COLUMNAS_LINEAS = [
+    ('id_detalle', 'id_detalle'),
+    ('id_venta', 'id_venta_id'),
+    ('fecha', 'id_venta__fecha'),
+    ('servicio', 'id_venta__id_servicio__nombre'),
+    ('usuario', 'id_venta__id_usuario__username'),
+    ('cliente', 'id_venta__id_cliente__nombre_empresa'),
+    ('id_producto', 'id_producto_id'),
+    ('producto', 'id_producto__nombre'),
+    ('categoria', 'id_producto__id_categoria__nombre'),
+    ('cantidad', 'cantidad'),
+    ('precio_unitario', 'precio_unitario'),
+    ('subtotal', 'subtotal'),
+]
+
+
+def _inicio_dia(dia):
+    inicio = datetime.combine(dia, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def leer_filtros(desde=None, hasta=None, servicio=None):
+    """Valida los filtros (fechas AAAA-MM-DD inclusivas e id de servicio) y los devuelve normalizados."""
+    filtros = {}
+    for nombre, valor in (('desde', desde), ('hasta', hasta)):
+        if valor:
+            try:
+                dia = parse_date(str(valor))
+            except ValueError:
+                dia = None
+            if dia is None:
+                raise ValidationError(f'Fecha "{nombre}" inválida; use el formato AAAA-MM-DD.')
+            filtros[nombre] = dia
+    if 'desde' in filtros and 'hasta' in filtros and filtros['desde'] > filtros['hasta']:
+        raise ValidationError('La fecha "desde" no puede ser posterior a "hasta".')
+    if servicio:
+        try:
+            filtros['servicio'] = int(servicio)
+        except (TypeError, ValueError):
+            raise ValidationError('El servicio debe ser un identificador numérico.')
+    return filtros
+
+
+def _filtrar(queryset, prefijo, filtros):
+    if 'desde' in filtros:
+        queryset = queryset.filter(**{f'{prefijo}fecha__gte': _inicio_dia(filtros['desde'])})
+    if 'hasta' in filtros:
+        queryset = queryset.filter(**{f'{prefijo}fecha__lt': _inicio_dia(filtros['hasta'] + timedelta(days=1))})
+    if 'servicio' in filtros:
+        queryset = queryset.filter(**{f'{prefijo}id_servicio_id': filtros['servicio']})
+    return queryset
+
+
+def _recorrer(queryset, campo_pk, columnas):
+    """Genera diccionarios columna -> valor recorriendo el queryset en lotes por clave primaria."""
+    campos = [campo for _, campo in columnas]
+    ultimo = None
+    while True:
+        lote = queryset if ultimo is None else queryset.filter(**{f'{campo_pk}__gt': ultimo})
+        filas = list(lote.order_by(campo_pk).values(*campos)[:TAMANO_LOTE_EXPORTACION])
+        for fila in filas:
+            yield {columna: fila[campo] for columna, campo in columnas}
+        if len(filas) < TAMANO_LOTE_EXPORTACION:
+            return
+        ultimo = filas[-1][campo_pk]
+
+
+def _lotes(iterable):
+    while True:
+        lote = list(itertools.islice(iterable, TAMANO_LOTE_EXPORTACION))
+        if not lote:
+            return
+        yield lote
+
+
+def _registros_archivados(filtros):
+    from tpv_app import archivo
+
+    return archivo.registros_archivados(
+        _inicio_dia(filtros['desde']) if 'desde' in filtros else None,
+        _inicio_dia(filtros['hasta'] + timedelta(days=1)) if 'hasta' in filtros else None,
+        filtros.get('servicio'),
+    )
+
+
+def _ventas_archivadas(filtros):
+    from tpv_app.models import Cliente, Servicio
+
+    for lote in _lotes(_registros_archivados(filtros)):
+        # Nombre del servicio y NIF del cliente actuales, como en las ventas de las tablas
+        servicios = dict(Servicio.objects.filter(pk__in={r['id_servicio'] for r in lote}).values_list('id_servicio', 'nombre'))
+        nifs = dict(Cliente.objects.filter(pk__in={r['id_cliente'] for r in lote if r['id_cliente']}).values_list('id_cliente', 'nif_cif'))
+        for registro in lote:
+            valores = {
+                'id_venta': registro['id_venta'], 'fecha': registro['fecha'], 'servicio': servicios.get(registro['id_servicio']),
+                'usuario': registro['usuario'], 'cliente': registro['cliente'], 'nif_cif': nifs.get(registro['id_cliente']),
+                'total': Decimal(registro['total']),
+            }
+            yield {columna: valores[columna] for columna, _ in COLUMNAS_VENTAS}
+
+
+def _lineas_archivadas(filtros):
+    from tpv_app.models import Producto, Servicio
+
+    for lote in _lotes(_registros_archivados(filtros)):
+        servicios = dict(Servicio.objects.filter(pk__in={r['id_servicio'] for r in lote}).values_list('id_servicio', 'nombre'))
+        categorias = dict(
+            Producto.objects.filter(pk__in={linea['id_producto'] for r in lote for linea in r['lineas']})
+            .values_list('id_producto', 'id_categoria__nombre')
+        )
+        for registro in lote:
+            for linea in registro['lineas']:
+                valores = {
+                    'id_detalle': linea['id_detalle'], 'id_venta': registro['id_venta'], 'fecha': registro['fecha'],
+                    'servicio': servicios.get(registro['id_servicio']), 'usuario': registro['usuario'],
+                    'cliente': registro['cliente'], 'id_producto': linea['id_producto'], 'producto': linea['producto'],
+                    'categoria': categorias.get(linea['id_producto']), 'cantidad': linea['cantidad'],
+                    'precio_unitario': Decimal(linea['precio_unitario']), 'subtotal': Decimal(linea['subtotal']),
+                }
+                yield {columna: valores[columna] for columna, _ in COLUMNAS_LINEAS}
+
+
+def filas_ventas(filtros):
+    from tpv_app.models import Venta
+
+    return itertools.chain(
+        _ventas_archivadas(filtros),
+        _recorrer(_filtrar(Venta.objects.all(), '', filtros), 'id_venta', COLUMNAS_VENTAS),
+    )
+
+
+def filas_lineas(filtros):
+    from tpv_app.models import DetalleVenta
+
+    return itertools.chain(
+        _lineas_archivadas(filtros),
+        _recorrer(_filtrar(DetalleVenta.objects.all(), 'id_venta__', filtros), 'id_detalle', COLUMNAS_LINEAS),
+    )
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat() if timezone.is_aware(valor) else valor.isoformat()
+    return str(valor)  # Los Decimal se exportan tal cual, sin pasar por float
+
+
+class _Eco:
+    """Pseudo-fichero para csv.writer: devuelve cada línea en lugar de acumularla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _csv(columnas, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([columna for columna, _ in columnas])
+    for fila in filas:
+        yield escritor.writerow([_texto(valor) for valor in fila.values()])
+
+
+def _jsonl(filas):
+    for fila in filas:
+        yield json.dumps(
+            {columna: valor if isinstance(valor, (int, type(None))) else _texto(valor) for columna, valor in fila.items()},
+            ensure_ascii=False, separators=(',', ':')
+        ) + '\n'
+
+
+def exportar(tipo, formato, filtros):
+    """Generador de fragmentos de texto con las ventas ('ventas') o sus líneas ('lineas')."""
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValidationError(f'Formato no soportado: {formato}. Use csv o jsonl.')
+    if tipo == 'ventas':
+        columnas, filas = COLUMNAS_VENTAS, filas_ventas(filtros)
+    elif tipo == 'lineas':
+        columnas, filas = COLUMNAS_LINEAS, filas_lineas(filtros)
+    else:
+        raise ValidationError(f'Tipo de exportación desconocido: {tipo}.')
+    return _csv(columnas, filas) if formato == 'csv' else _jsonl(filas)
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from tpv_app import analitica, caches, consultas_paralelas
+
+
+# -----------------------------
+# Datos de los gráficos de detalle_venta
+# -----------------------------
+# La página se muestra sin calcular nada y cada gráfico pide sus datos al abrirse (o todos a la
+# vez, para un panel, con sus consultas en paralelo). Los
+# resultados se guardan en la caché de Django con un TTL corto; la clave incluye la versión
+# 'ventas', que se incrementa al registrar o anular una venta.
+
+def _productos():
+    from tpv_app.models import ResumenProductoDia
+
+    # Productos más vendidos (desde el resumen diario por producto)
+    filas = (
+        ResumenProductoDia.objects
+        .filter(id_producto__activo=True)
+        .values('id_producto__nombre')
+        .annotate(total_vendido=Sum('unidades'))
+        .order_by('-total_vendido')
+    )[:6]  # Los 6 productos más vendidos
+    return {
+        'labels': [fila['id_producto__nombre'] for fila in filas],
+        'values': [fila['total_vendido'] for fila in filas],
+    }
+
+
+def _clientes():
+    from tpv_app.models import ResumenClienteDia
+
+    # Los 5 clientes con más ventas (desde el resumen diario por cliente)
+    filas = [
+        fila for fila in (
+            ResumenClienteDia.objects
+            .values('id_cliente__nombre_empresa')
+            .annotate(total_ventas=Sum('tickets'))  # Número de ventas por cliente
+            .order_by('-total_ventas')
+        )[:5]
+        if fila['id_cliente__nombre_empresa']
+    ]
+    return {
+        'labels': [fila['id_cliente__nombre_empresa'] for fila in filas],
+        'values': [fila['total_ventas'] for fila in filas],
+    }
+
+
+def _servicios():
+    from tpv_app.models import Servicio
+
+    # Los 5 servicios con más ventas (sus contadores ya están agregados)
+    filas = (
+        Servicio.objects
+        .filter(cantidad_tickets__gt=0)
+        .values('nombre', total_ventas=F('cantidad_tickets'))
+        .order_by('-total_ventas')
+    )[:5]
+    return {
+        'labels': [fila['nombre'] for fila in filas],
+        'values': [fila['total_ventas'] for fila in filas],
+    }
+
+
+def _dias():
+    # Ingresos de los últimos 30 días y su media móvil de 7 días (extracto columnar, requiere NumPy)
+    if not analitica.disponible():
+        return {'labels': [], 'values': [], 'media': [], 'disponible': False}
+    dias, valores, media = analitica.ingresos_diarios(dias=30, ventana=7)
+    return {'labels': [dia.strftime('%d/%m') for dia in dias], 'values': valores, 'media': media, 'disponible': True}
+
+
+GRAFICOS = {
+    'productos': _productos,
+    'clientes': _clientes,
+    'servicios': _servicios,
+    'dias': _dias,
+}
+
+
+def datos_graficos(nombres):
+    """Datos (labels, values...) de varios gráficos de detalle_venta: nombre -> datos.
+
+    Los que no están en la caché se calculan a la vez (tpv_app.consultas_paralelas).
+    """
+    version = caches.version('ventas')
+    claves = {nombre: f'tpv:grafico:{nombre}:{version}' for nombre in nombres}
+    encontrados = cache.get_many(list(claves.values()))
+    calculados = consultas_paralelas.ejecutar({
+        nombre: GRAFICOS[nombre] for nombre, clave in claves.items() if clave not in encontrados
+    })
+    if calculados:
+        cache.set_many({claves[nombre]: datos for nombre, datos in calculados.items()},
+                       getattr(settings, 'TPV_GRAFICOS_TTL', 60))
+    return {nombre: calculados[nombre] if nombre in calculados else encontrados[clave] for nombre, clave in claves.items()}
+
+
+def datos_grafico(nombre):
+    """Datos de un gráfico de detalle_venta, desde la caché si siguen vigentes."""
+    return datos_graficos([nombre])[nombre]
@@ -0,0 +1,337 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from tpv_app import busqueda, cola_escritura
+from tpv_app.catalogo import invalidar_catalogo
+
+
+# -----------------------------
+# Cambios masivos del catálogo
+# -----------------------------
+# La importación (CSV o JSONL) y las reglas de precios leen los productos por lotes y escriben
+# cada lote con bulk_create/bulk_update en una transacción que vuelve a leer bloqueadas las filas
+# que modifica (los cambios se aplican sobre sus valores actuales), toma una sola versión del
+# catálogo para todas ellas e invalida la instantánea una vez. Como bulk_* no llama a
+# save() ni envía señales, la versión, la invalidación y el índice de búsqueda se actualizan
+# aquí. Cada lote se entrega a la cola de escritura, de modo que las ventas se intercalan entre
+# lotes. Con `simular` solo se calcula el diff.
+
+TAMANO_LOTE_CATALOGO = 500
+FORMATOS_IMPORTACION = ('csv', 'jsonl')
+CAMPOS_IMPORTACION = ('referencia', 'nombre', 'precio', 'categoria', 'activo')
+
+_VERDADEROS = {'1', 'true', 'si', 'sí', 's', 'yes'}
+_FALSOS = {'0', 'false', 'no', 'n'}
+
+
+@dataclass
+class Cambio:
+    linea: int  # Fila del fichero (1 = primera fila de datos) o 0 en las reglas de precios
+    referencia: str
+    tipo: str  # 'nuevo', 'modificado' o 'error'
+    campos: dict = field(default_factory=dict)  # campo -> (antes, después)
+    error: str = ''
+
+
+@dataclass
+class ResultadoCambios:
+    creados: int = 0
+    modificados: int = 0
+    sin_cambios: int = 0
+    errores: list = field(default_factory=list)  # Cambios de tipo 'error'
+    lotes: int = 0  # Lotes escritos (una versión del catálogo por lote)
+
+
+# -----------------------------
+# Lectura de ficheros
+# -----------------------------
+
+def leer_filas(fichero, formato):
+    """Recorre un fichero de texto abierto y devuelve diccionarios campo -> texto, sin cargarlo entero."""
+    if formato not in FORMATOS_IMPORTACION:
+        raise ValidationError(f'Formato no soportado: {formato}. Use {", ".join(FORMATOS_IMPORTACION)}.')
+    if formato == 'jsonl':
+        return _leer_jsonl(fichero)
+    return _leer_csv(fichero)
+
+
+def _leer_csv(fichero):
+    cabecera = fichero.readline()
+    # Las hojas de cálculo en español exportan con ';' (la coma es el separador decimal)
+    delimitador = ';' if cabecera.count(';') > cabecera.count(',') else ','
+    campos = [campo.strip().lower() for campo in next(csv.reader([cabecera], delimiter=delimitador), [])]
+    for fila in csv.DictReader(fichero, fieldnames=campos, delimiter=delimitador):
+        yield fila
+
+
+def _leer_jsonl(fichero):
+    for numero, linea in enumerate(fichero, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError:
+            fila = {'_error': f'JSON no válido en la línea {numero}.'}
+        if not isinstance(fila, dict):
+            fila = {'_error': f'La línea {numero} no es un objeto JSON.'}
+        yield {clave: '' if valor is None else str(valor) for clave, valor in fila.items()}
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# -----------------------------
+# Importación
+# -----------------------------
+
+PRECIO_MAXIMO = Decimal('1e8')  # Exclusivo: Producto.precio es DecimalField(max_digits=10, decimal_places=2)
+
+
+def _precio(texto):
+    try:
+        precio = Decimal(texto.strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValidationError(f'Precio no válido: {texto}.')
+    if not precio.is_finite() or precio < 0 or precio >= PRECIO_MAXIMO:
+        raise ValidationError(f'Precio fuera de rango: {texto}.')
+    return precio.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _activo(texto):
+    valor = texto.strip().lower()
+    if valor in _VERDADEROS:
+        return True
+    if valor in _FALSOS:
+        return False
+    raise ValidationError(f'Valor de activo no válido: {texto}.')
+
+
+def _valores(fila, categorias):
+    """Campos informados de una fila ya convertidos: {'nombre': ..., 'precio': Decimal, ...}."""
+    valores = {}
+    nombre = (fila.get('nombre') or '').strip()
+    if nombre:
+        if len(nombre) > 100:
+            raise ValidationError('El nombre supera los 100 caracteres.')
+        valores['nombre'] = nombre
+    if (fila.get('precio') or '').strip():
+        valores['precio'] = _precio(fila['precio'])
+    categoria = (fila.get('categoria') or '').strip()
+    if categoria:
+        if categoria.lower() not in categorias:
+            raise ValidationError(f'Categoría desconocida: {categoria}.')
+        valores['id_categoria_id'] = categorias[categoria.lower()]
+    if (fila.get('activo') or '').strip():
+        valores['activo'] = _activo(fila['activo'])
+    return valores
+
+
+def _mostrar(campo):
+    return 'categoria' if campo == 'id_categoria_id' else campo
+
+
+def _escribir_lote(nuevos, valores, regla=None):
+    """Crea `nuevos` y aplica `valores` (id_producto -> {campo: valor}, solo los campos que cambian
+    en cada fila) o, con `regla`, el nuevo precio calculado sobre el precio actual de la fila.
+
+    Los productos se vuelven a leer bloqueados dentro de la transacción: entre la lectura del lote
+    y esta escritura (que espera turno en la cola) otra petición puede haberlos editado, y esos
+    cambios no se deben pisar con los valores leídos antes.
+    """
+    from tpv_app.models import Producto, VersionCatalogo
+
+    with transaction.atomic():
+        version = VersionCatalogo.siguiente()
+        modificados, campos = [], set()
+        for producto in Producto.objects.select_for_update().filter(pk__in=list(valores)).order_by('id_producto'):
+            if regla is None:
+                cambios = valores[producto.pk]
+            elif regla.incluye(producto):
+                try:
+                    cambios = {'precio': regla.aplicar(producto.precio)}
+                except ValidationError:
+                    continue
+            else:
+                continue
+            cambios = {campo: valor for campo, valor in cambios.items() if getattr(producto, campo) != valor}
+            if not cambios:
+                continue
+            for campo, valor in cambios.items():
+                setattr(producto, campo, valor)
+            producto.version = version
+            modificados.append(producto)
+            campos.update(cambios)
+        for producto in nuevos:
+            producto.version = version
+
+        Producto.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE_CATALOGO)
+        if modificados:
+            # Los campos que una fila no cambia se escriben con el valor recién leído bajo bloqueo
+            Producto.objects.bulk_update(modificados, sorted(campos | {'version'}), batch_size=TAMANO_LOTE_CATALOGO)
+        if nuevos or campos & {'nombre', 'activo'}:
+            busqueda.indexar_productos(producto.pk for producto in nuevos + modificados)
+        invalidar_catalogo()
+
+
+def importar_productos(filas, simular=False, tamano_lote=TAMANO_LOTE_CATALOGO, informar=None):
+    """Crea o actualiza productos a partir de `filas` (diccionarios), emparejados por `referencia`.
+
+    En los productos existentes solo se cambian los campos que vienen informados; los nuevos
+    necesitan nombre y precio. `informar(cambio)` recibe cada alta, modificación o error.
+    Devuelve un ResultadoCambios.
+    """
+    from tpv_app.models import Categoria, Producto
+
+    informar = informar or (lambda cambio: None)
+    categorias = {
+        nombre.lower(): id_categoria
+        for id_categoria, nombre in Categoria.objects.filter(activo=True).values_list('id_categoria', 'nombre')
+    }
+    resultado = ResultadoCambios()
+    vistas = set()
+
+    for lote in _lotes(enumerate(filas, start=1), tamano_lote):
+        referencias = {(fila.get('referencia') or '').strip() for _, fila in lote} - {''}
+        existentes = Producto.objects.in_bulk(list(referencias), field_name='referencia')
+        nuevos, valores_modificados = [], {}
+
+        for linea, fila in lote:
+            referencia = (fila.get('referencia') or '').strip()
+            try:
+                if fila.get('_error'):
+                    raise ValidationError(fila['_error'])
+                if not referencia:
+                    raise ValidationError('Falta la referencia.')
+                if len(referencia) > 50:
+                    raise ValidationError('La referencia supera los 50 caracteres.')
+                if referencia in vistas:
+                    raise ValidationError('Referencia repetida en el fichero.')
+                vistas.add(referencia)
+                valores = _valores(fila, categorias)
+
+                producto = existentes.get(referencia)
+                if producto is None:
+                    if 'nombre' not in valores or 'precio' not in valores:
+                        raise ValidationError('Un producto nuevo necesita nombre y precio.')
+                    nuevos.append(Producto(referencia=referencia, **valores))
+                    informar(Cambio(linea, referencia, 'nuevo', {_mostrar(campo): (None, valor) for campo, valor in valores.items()}))
+                    continue
+            except ValidationError as e:
+                cambio = Cambio(linea, referencia, 'error', error=' '.join(e.messages))
+                resultado.errores.append(cambio)
+                informar(cambio)
+                continue
+
+            cambios = {campo: (getattr(producto, campo), valor) for campo, valor in valores.items() if getattr(producto, campo) != valor}
+            if not cambios:
+                resultado.sin_cambios += 1
+                continue
+            valores_modificados[producto.pk] = {campo: valor for campo, (_, valor) in cambios.items()}
+            informar(Cambio(linea, referencia, 'modificado', {_mostrar(campo): cambio for campo, cambio in cambios.items()}))
+
+        resultado.creados += len(nuevos)
+        resultado.modificados += len(valores_modificados)
+        if (nuevos or valores_modificados) and not simular:
+            cola_escritura.ejecutar(_escribir_lote, nuevos, valores_modificados)
+            resultado.lotes += 1
+    return resultado
+
+
+# -----------------------------
+# Reglas de precios
+# -----------------------------
+
+@dataclass(frozen=True)
+class ReglaPrecio:
+    """Cambio porcentual de precio, p. ej. +3 % en una categoría redondeado a 0,05."""
+    porcentaje: Decimal
+    redondeo: Optional[Decimal] = None  # Múltiplo al que se redondea el nuevo precio (al más cercano)
+    categorias: tuple = ()  # Ids de categoría; vacío = todas
+    solo_activos: bool = True
+
+    def __post_init__(self):
+        # Mismos límites que los precios importados (_precio); NaN e infinito no se pueden comparar ni redondear
+        if not self.porcentaje.is_finite() or self.porcentaje >= PRECIO_MAXIMO:
+            raise ValidationError('Porcentaje fuera de rango.')
+        if self.porcentaje <= -100:
+            raise ValidationError('El porcentaje debe ser mayor que -100.')
+        if self.redondeo is not None:
+            if not self.redondeo.is_finite() or self.redondeo >= PRECIO_MAXIMO:
+                raise ValidationError('Redondeo fuera de rango.')
+            if self.redondeo < Decimal('0.01'):
+                raise ValidationError('El redondeo debe ser de al menos 0,01.')
+
+    def incluye(self, producto):
+        """Si el producto cumple los filtros de la regla."""
+        if self.solo_activos and not producto.activo:
+            return False
+        return not self.categorias or producto.id_categoria_id in self.categorias
+
+    def aplicar(self, precio):
+        """Nuevo precio; ValidationError si no cabe en Producto.precio."""
+        nuevo = precio * (1 + self.porcentaje / 100)
+        if self.redondeo:
+            nuevo = (nuevo / self.redondeo).quantize(Decimal('1'), rounding=ROUND_HALF_UP) * self.redondeo
+        nuevo = nuevo.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        if nuevo >= PRECIO_MAXIMO:
+            raise ValidationError(f'Precio fuera de rango: {nuevo}.')
+        return nuevo
+
+
+def actualizar_precios(regla, simular=False, tamano_lote=TAMANO_LOTE_CATALOGO, informar=None):
+    """Aplica una ReglaPrecio a los productos que cumplen sus filtros. Devuelve un ResultadoCambios."""
+    from tpv_app.models import Producto
+
+    informar = informar or (lambda cambio: None)
+    productos = Producto.objects.only('id_producto', 'referencia', 'nombre', 'precio')
+    if regla.categorias:
+        productos = productos.filter(id_categoria__in=regla.categorias)
+    if regla.solo_activos:
+        productos = productos.filter(activo=True)
+
+    resultado = ResultadoCambios()
+    ultimo = 0
+    while True:
+        # Recorrido por clave primaria: cada lote es una consulta acotada por índice
+        lote = list(productos.filter(id_producto__gt=ultimo).order_by('id_producto')[:tamano_lote])
+        if not lote:
+            break
+        ultimo = lote[-1].id_producto
+
+        modificados = {}
+        for producto in lote:
+            try:
+                nuevo = regla.aplicar(producto.precio)
+            except ValidationError as e:
+                # Se informa y se deja el producto como está: los lotes anteriores ya están escritos
+                cambio = Cambio(0, producto.referencia or f'#{producto.id_producto}', 'error', error=' '.join(e.messages))
+                resultado.errores.append(cambio)
+                informar(cambio)
+                continue
+            if nuevo == producto.precio:
+                resultado.sin_cambios += 1
+                continue
+            informar(Cambio(0, producto.referencia or f'#{producto.id_producto}', 'modificado',
+                            {'precio': (producto.precio, nuevo)}))
+            modificados[producto.pk] = {'precio': nuevo}
+
+        resultado.modificados += len(modificados)
+        if modificados and not simular:
+            # El precio se recalcula al escribir sobre el valor releído bajo bloqueo
+            cola_escritura.ejecutar(_escribir_lote, [], modificados, regla)
+            resultado.lotes += 1
+    return resultado
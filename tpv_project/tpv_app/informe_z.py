@@ -0,0 +1,105 @@
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+
+
+# -----------------------------
+# Informe Z
+# -----------------------------
+# Al cerrar un servicio se calcula su resumen con dos consultas agregadas (ventas agrupadas por
+# cajero y hora, líneas agrupadas por producto) y se guarda en InformeZ. Reimprimir o comparar
+# turnos pasados lee esa fila en lugar de volver a agregar las ventas.
+
+def _importe(valor):
+    return str(Decimal(str(valor or 0)).quantize(Decimal('0.01')))
+
+
+def _ordenar(filas, campo='total'):
+    return sorted(filas, key=lambda fila: Decimal(fila[campo]), reverse=True)
+
+
+def calcular_informe_z(id_servicio):
+    """Devuelve los campos de un InformeZ para el servicio indicado, sin guardarlo."""
+    from tpv_app.models import DetalleVenta, Venta
+
+    # 1. Ventas por cajero y hora local: totales, tickets, cajeros y horas salen de aquí
+    ventas = (
+        Venta.objects.filter(id_servicio_id=id_servicio)
+        .annotate(hora=ExtractHour('fecha', tzinfo=timezone.get_current_timezone()))
+        .values('id_usuario', 'id_usuario__username', 'hora')
+        .annotate(tickets=Count('id_venta'), total=Sum('total'))
+        .order_by()
+    )
+    cajeros, horas = {}, {}
+    tickets, total = 0, Decimal('0')
+    for fila in ventas:
+        tickets += fila['tickets']
+        total += fila['total'] or 0
+        cajero = cajeros.setdefault(fila['id_usuario'], {
+            'id_usuario': fila['id_usuario'], 'usuario': fila['id_usuario__username'], 'tickets': 0, 'total': Decimal('0')
+        })
+        hora = horas.setdefault(fila['hora'], {'hora': fila['hora'], 'tickets': 0, 'total': Decimal('0')})
+        for acumulado in (cajero, hora):
+            acumulado['tickets'] += fila['tickets']
+            acumulado['total'] += fila['total'] or 0
+
+    # 2. Líneas por producto: el desglose por categoría se obtiene sumando sus productos
+    lineas = (
+        DetalleVenta.objects.filter(id_venta__id_servicio_id=id_servicio)
+        .values('id_producto', 'id_producto__nombre', 'id_producto__id_categoria', 'id_producto__id_categoria__nombre')
+        .annotate(unidades=Sum('cantidad'), total=Sum('subtotal'))
+        .order_by()
+    )
+    productos, categorias = [], {}
+    unidades = 0
+    for fila in lineas:
+        unidades += fila['unidades']
+        productos.append({
+            'id_producto': fila['id_producto'], 'producto': fila['id_producto__nombre'],
+            'unidades': fila['unidades'], 'total': _importe(fila['total']),
+        })
+        categoria = categorias.setdefault(fila['id_producto__id_categoria'], {
+            'id_categoria': fila['id_producto__id_categoria'],
+            'categoria': fila['id_producto__id_categoria__nombre'] or 'Sin categoría',
+            'unidades': 0, 'total': Decimal('0'),
+        })
+        categoria['unidades'] += fila['unidades']
+        categoria['total'] += fila['total'] or 0
+
+    for acumulado in (*cajeros.values(), *horas.values(), *categorias.values()):
+        acumulado['total'] = _importe(acumulado['total'])
+
+    return {
+        'tickets': tickets,
+        'unidades': unidades,
+        'total': total,
+        'ticket_medio': (total / tickets).quantize(Decimal('0.01')) if tickets else Decimal('0'),
+        'desglose': {
+            'productos': _ordenar(productos),
+            'categorias': _ordenar(categorias.values()),
+            'cajeros': _ordenar(cajeros.values()),
+            'horas': sorted(horas.values(), key=lambda fila: fila['hora']),
+        },
+    }
+
+
+def generar_informe_z(id_servicio):
+    """Calcula y guarda el informe Z de un servicio (se llama al cerrarlo)."""
+    from tpv_app.models import InformeZ, Servicio
+
+    fecha_inicio, fecha_fin = Servicio.objects.filter(pk=id_servicio).values_list('fecha_inicio', 'fecha_fin').get()
+    return InformeZ.objects.create(
+        id_servicio_id=id_servicio, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, **calcular_informe_z(id_servicio)
+    )
+
+
+def informe_z_vigente(servicio):
+    """Último informe Z de un servicio cerrado; lo genera si el servicio se cerró antes de existir los informes."""
+    from tpv_app.models import InformeZ
+
+    informe = InformeZ.objects.filter(id_servicio=servicio).first()  # Meta.ordering: el más reciente primero
+    if informe is None and servicio.estado == 'cerrado':
+        informe = generar_informe_z(servicio.pk)
+    return informe
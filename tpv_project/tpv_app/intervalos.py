@@ -0,0 +1,202 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+
+from tpv_app import caches
+
+
+# -----------------------------
+# Ventas por intervalos de tiempo
+# -----------------------------
+# Tickets, unidades e ingresos agrupados por hora, día o semana (o por día de la semana y hora,
+# para el mapa de calor) con truncado de fechas en la base de datos sobre el índice de
+# Venta.fecha. Los días ya terminados no cambian: la parte de cada día se guarda en caché por
+# separado y cualquier rango se compone con esas entradas más el día de hoy, que siempre se
+# calcula. Los días que faltan en la caché se calculan juntos en una sola consulta. Si llega una
+# venta con fecha de un día pasado (lotes de terminales, correcciones, borrados) solo se
+# incrementa la versión de ese día ('ventas_dia:AAAA-MM-DD'). Las ventas archivadas
+# (tpv_app.archivo) se leen de sus ficheros y se suman con las mismas claves.
+
+TRUNCADOS = {
+    'hora': TruncHour,
+    'dia': TruncDay,
+    'semana': TruncWeek,
+}
+AGRUPACIONES = tuple(TRUNCADOS) + ('mapa',)  # 'mapa': día de la semana (1 = lunes) x hora
+
+# Días máximos del rango para cada agrupación (limita el número de intervalos devueltos)
+MAX_DIAS = {'hora': 92, 'dia': 3700, 'semana': 3700, 'mapa': 3700}
+
+TTL_CERRADOS = 86400
+
+
+def _inicio_dia(dia):
+    inicio = datetime.combine(dia, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def _version_dia(dia):
+    return f'ventas_dia:{dia.isoformat()}'
+
+
+def invalidar_dia(dia):
+    """Descarta las partes cacheadas de un día terminado."""
+    caches.invalidar(_version_dia(dia))
+
+
+def invalidar_si_historica(fecha):
+    """Llamado al escribir o borrar una venta: si es de un día ya terminado, invalida la caché de ese día."""
+    if fecha is not None and _inicio_dia(timezone.localdate()) > fecha:
+        invalidar_dia(timezone.localdate(fecha))
+
+
+def _calcular(agrupacion, desde, hasta, filtros, por_dia=False):
+    """Agrega las líneas vendidas entre los días desde y hasta (incluidos). Devuelve {clave: [tickets, unidades, ingresos]}.
+
+    Con `por_dia` devuelve {día: {clave: [...]}} con la parte de cada día (en la semana o el mapa,
+    lo que ese día aporta a su intervalo).
+    """
+    from tpv_app.models import DetalleVenta
+
+    zona = timezone.get_current_timezone()
+    lineas = DetalleVenta.objects.filter(
+        id_venta__fecha__gte=_inicio_dia(desde), id_venta__fecha__lt=_inicio_dia(hasta + timedelta(days=1))
+    )
+    if filtros.get('producto'):
+        lineas = lineas.filter(id_producto_id=filtros['producto'])
+    if filtros.get('categoria'):
+        lineas = lineas.filter(id_producto__id_categoria_id=filtros['categoria'])
+    if filtros.get('usuario'):
+        lineas = lineas.filter(id_venta__id_usuario_id=filtros['usuario'])
+
+    if agrupacion == 'mapa':
+        lineas = lineas.annotate(
+            dia_semana=ExtractIsoWeekDay('id_venta__fecha', tzinfo=zona), hora=ExtractHour('id_venta__fecha', tzinfo=zona)
+        )
+        campos = ('dia_semana', 'hora')
+    else:
+        lineas = lineas.annotate(inicio=TRUNCADOS[agrupacion]('id_venta__fecha', tzinfo=zona))
+        campos = ('inicio',)
+    if por_dia:
+        lineas = lineas.annotate(dia=TruncDay('id_venta__fecha', tzinfo=zona))
+
+    resultado = {}
+    filas = (
+        lineas.values(*campos, *(['dia'] if por_dia else []))
+        .annotate(tickets=Count('id_venta', distinct=True), unidades=Sum('cantidad'), ingresos=Sum('subtotal'))
+        .order_by()
+    )
+    for fila in filas:
+        clave = tuple(fila[campo] for campo in campos)
+        if agrupacion != 'mapa':
+            clave = (_iso_local(clave[0]),)
+        ingresos = Decimal(str(fila['ingresos'] or 0)).quantize(Decimal('0.01'))
+        valores = [fila['tickets'], fila['unidades'] or 0, ingresos]
+        if por_dia:
+            dia = timezone.localtime(fila['dia']).date() if timezone.is_aware(fila['dia']) else fila['dia'].date()
+            resultado.setdefault(dia, {})[clave] = valores
+        else:
+            resultado[clave] = valores
+
+    _sumar_archivadas(agrupacion, desde, hasta, filtros, por_dia, resultado)
+    return resultado
+
+
+def _clave_archivada(agrupacion, fecha):
+    local = timezone.localtime(fecha) if timezone.is_aware(fecha) else fecha
+    if agrupacion == 'mapa':
+        return (local.isoweekday(), local.hour)
+    if agrupacion == 'hora':
+        return (_iso_local(local.replace(minute=0, second=0, microsecond=0)),)
+    dia = local.date() - timedelta(days=local.weekday() if agrupacion == 'semana' else 0)
+    return (_iso_local(_inicio_dia(dia)),)
+
+
+def _sumar_archivadas(agrupacion, desde, hasta, filtros, por_dia, resultado):
+    """Suma al resultado las ventas archivadas del rango, con los mismos filtros y claves."""
+    from tpv_app import archivo
+    from tpv_app.models import Producto
+
+    en_categoria = None
+    for registro in archivo.registros_archivados(_inicio_dia(desde), _inicio_dia(hasta + timedelta(days=1))):
+        if filtros.get('usuario') and registro['id_usuario'] != filtros['usuario']:
+            continue
+        lineas = registro['lineas']
+        if filtros.get('producto'):
+            lineas = [linea for linea in lineas if linea['id_producto'] == filtros['producto']]
+        if filtros.get('categoria'):
+            if en_categoria is None:  # Categoría actual del producto, como en las ventas de las tablas
+                en_categoria = set(Producto.objects.filter(id_categoria_id=filtros['categoria']).values_list('id_producto', flat=True))
+            lineas = [linea for linea in lineas if linea['id_producto'] in en_categoria]
+        if not lineas:
+            continue
+
+        destino = resultado
+        if por_dia:
+            fecha = timezone.localtime(registro['fecha']) if timezone.is_aware(registro['fecha']) else registro['fecha']
+            destino = resultado.setdefault(fecha.date(), {})
+        acumulado = destino.setdefault(_clave_archivada(agrupacion, registro['fecha']), [0, 0, Decimal('0.00')])
+        acumulado[0] += 1
+        acumulado[1] += sum(linea['cantidad'] for linea in lineas)
+        acumulado[2] += sum(Decimal(linea['subtotal']) for linea in lineas)
+
+
+def _iso_local(instante):
+    return timezone.localtime(instante).isoformat() if timezone.is_aware(instante) else instante.isoformat()
+
+
+def _calcular_dias_cerrados(agrupacion, desde, hasta, filtros):
+    """Partes de los días terminados desde..hasta: de la caché y, las que faltan, en una sola consulta."""
+    dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    versiones = caches.versiones(_version_dia(dia) for dia in dias)
+    sufijo = '{}:{}:{}:{}'.format(
+        agrupacion, filtros.get('producto') or '', filtros.get('categoria') or '', filtros.get('usuario') or ''
+    )
+    if filtros.get('categoria'):
+        # El filtro usa la categoría actual de cada producto: si el catálogo cambia, la parte
+        # cacheada de un día terminado deja de valer
+        from tpv_app.models import VersionCatalogo
+
+        version = VersionCatalogo.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+        sufijo = f'{sufijo}:{version}'
+    claves = {dia: f'tpv:intervalos:{dia.isoformat()}:{versiones[_version_dia(dia)]}:{sufijo}' for dia in dias}
+    encontrados = cache.get_many(list(claves.values()))
+    faltan = [dia for dia, clave in claves.items() if clave not in encontrados]
+
+    partes = [encontrados[clave] for clave in claves.values() if clave in encontrados]
+    if faltan:
+        calculados = _calcular(agrupacion, faltan[0], faltan[-1], filtros, por_dia=True)
+        nuevos = {claves[dia]: calculados.get(dia, {}) for dia in faltan}  # También los días sin ventas
+        cache.set_many(nuevos, TTL_CERRADOS)
+        partes.extend(nuevos.values())
+    return partes
+
+
+def ventas_por_intervalo(agrupacion, desde, hasta, filtros=None):
+    """Filas (clave..., tickets, unidades, ingresos) ordenadas por clave para los días desde..hasta (incluidos).
+
+    La clave es el inicio del intervalo en ISO 8601 o, para 'mapa', (día de la semana, hora).
+    `filtros` admite 'producto', 'categoria' y 'usuario' (ids).
+    """
+    filtros = filtros or {}
+    hoy = timezone.localdate()
+    partes = []
+    if desde < hoy:
+        partes.extend(_calcular_dias_cerrados(agrupacion, desde, min(hasta, hoy - timedelta(days=1)), filtros))
+    if hasta >= hoy:
+        partes.append(_calcular(agrupacion, max(desde, hoy), hasta, filtros))
+
+    # Un intervalo que abarca varios días (semana, mapa) suma las partes de cada uno
+    combinado = {}
+    for parte in partes:
+        for clave, (tickets, unidades, ingresos) in parte.items():
+            acumulado = combinado.setdefault(clave, [0, 0, Decimal('0')])
+            acumulado[0] += tickets
+            acumulado[1] += unidades
+            acumulado[2] += ingresos
+    return [clave + tuple(valores) for clave, valores in sorted(combinado.items())]
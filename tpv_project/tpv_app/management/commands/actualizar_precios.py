@@ -0,0 +1,54 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from tpv_app.importacion import ReglaPrecio, actualizar_precios
+from tpv_app.models import Categoria
+
+
+class Command(BaseCommand):
+    help = ("Cambia los precios en bloque con una regla, p. ej. "
+            "`actualizar_precios --porcentaje 3 --categoria Bebidas --redondeo 0.05`.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--porcentaje', required=True, help="Porcentaje de cambio (negativo para bajar).")
+        parser.add_argument('--redondeo', help="Redondea al múltiplo más cercano (p. ej. 0.05).")
+        parser.add_argument('--categoria', action='append', default=[],
+                            help="Id o nombre de categoría (repetible); por defecto, todas.")
+        parser.add_argument('--incluir-inactivos', action='store_true')
+        parser.add_argument('--simular', action='store_true', help="Muestra el diff sin escribir nada.")
+
+    def handle(self, *args, **options):
+        try:
+            regla = ReglaPrecio(
+                porcentaje=Decimal(options['porcentaje'].replace(',', '.')),
+                redondeo=Decimal(options['redondeo'].replace(',', '.')) if options['redondeo'] else None,
+                categorias=tuple(self._categoria(valor) for valor in options['categoria']),
+                solo_activos=not options['incluir_inactivos'],
+            )
+        except InvalidOperation:
+            raise CommandError("El porcentaje y el redondeo deben ser números.")
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        resultado = actualizar_precios(regla, simular=options['simular'], informar=self._informar)
+        prefijo = "Simulación: " if options['simular'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{resultado.modificados} precios cambiados, {resultado.sin_cambios} sin cambios, "
+            f"{len(resultado.errores)} errores ({resultado.lotes} lotes escritos)."
+        ))
+
+    def _categoria(self, valor):
+        categoria = Categoria.objects.filter(pk=int(valor)) if valor.isdigit() else Categoria.objects.filter(nombre__iexact=valor)
+        id_categoria = categoria.values_list('id_categoria', flat=True).first()
+        if id_categoria is None:
+            raise CommandError(f"Categoría desconocida: {valor}")
+        return id_categoria
+
+    def _informar(self, cambio):
+        if cambio.tipo == 'error':
+            self.stderr.write(f"! {cambio.referencia}: {cambio.error}")
+            return
+        antes, despues = cambio.campos['precio']
+        self.stdout.write(f"~ {cambio.referencia}: precio: {antes} -> {despues}")
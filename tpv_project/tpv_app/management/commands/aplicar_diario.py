@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tpv_app import diario
+
+
+class Command(BaseCommand):
+    help = "Aplica a los agregados los registros pendientes del diario de ventas (modo de agregación diferida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help="Sigue ejecutándose y aplica el diario periódicamente.")
+        parser.add_argument('--intervalo', type=float, default=1.0, help="Segundos de espera entre pasadas en modo continuo.")
+        parser.add_argument('--limite', type=int, default=5000, help="Registros máximos por consumidor en cada pasada.")
+        parser.add_argument('--estado', action='store_true', help="Muestra el retraso de cada consumidor y termina.")
+
+    def handle(self, *args, **options):
+        if options['estado']:
+            for nombre, estado in diario.retraso().items():
+                self.stdout.write(f"{nombre}: {estado['pendientes']} pendientes, {estado['segundos']:.1f} s de retraso")
+            return
+
+        while True:
+            aplicados = diario.aplicar_pendientes(options['limite'])
+            if not options['continuo']:
+                self.stdout.write(self.style.SUCCESS(f"Registros aplicados: {aplicados}"))
+                return
+            if aplicados < options['limite']:
+                time.sleep(options['intervalo'])
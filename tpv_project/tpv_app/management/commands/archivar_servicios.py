@@ -0,0 +1,43 @@
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tpv_app import archivo
+
+
+class Command(BaseCommand):
+    help = "Mueve las ventas de los servicios cerrados antes de una fecha al archivo comprimido."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--antes', help="Archiva los servicios cerrados antes de este día (AAAA-MM-DD).")
+        parser.add_argument('--dias', type=int, default=90,
+                            help="Si no se indica --antes, archiva los servicios cerrados hace más de estos días (90).")
+        parser.add_argument('--simular', action='store_true', help="Solo muestra qué servicios se archivarían.")
+        parser.add_argument('--buscar', type=int, metavar='ID_VENTA', help="Muestra una venta archivada y termina.")
+
+    def handle(self, *args, **options):
+        if options['buscar'] is not None:
+            registro = archivo.buscar_venta(options['buscar'])
+            if registro is None:
+                raise CommandError(f"La venta {options['buscar']} no está archivada.")
+            self.stdout.write(json.dumps(registro, ensure_ascii=False, indent=2))
+            return
+
+        if options['antes']:
+            dia = parse_date(options['antes'])
+            if dia is None:
+                raise CommandError("Fecha --antes inválida; use el formato AAAA-MM-DD.")
+            antes = timezone.make_aware(datetime.combine(dia, time.min))
+        else:
+            antes = timezone.now() - timedelta(days=options['dias'])
+
+        resultado = archivo.archivar(antes, simular=options['simular'])
+        for servicio, ventas in resultado:
+            self.stdout.write(f"{servicio.pk} {servicio.nombre}: {ventas} ventas")
+        verbo = "Se archivarían" if options['simular'] else "Archivados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verbo} {len(resultado)} servicios ({sum(ventas for _, ventas in resultado)} ventas)."
+        ))
@@ -0,0 +1,158 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from tpv_app import consultas_paralelas, graficos, intervalos, resumenes
+from tpv_app.models import Categoria, Cliente, DetalleVenta, Producto, Servicio, Usuario, Venta
+
+
+class Command(BaseCommand):
+    help = ("Compara el tiempo de las consultas de informes en serie y en paralelo sobre una base de datos "
+            "temporal con datos sintéticos (no toca la base de datos configurada).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=50000, help="Ventas a generar (50000).")
+        parser.add_argument('--dias', type=int, default=365, help="Días de histórico (365).")
+        parser.add_argument('--repeticiones', type=int, default=5, help="Repeticiones de cada medida (5).")
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--hilos', type=int, default=4,
+                            help="Hilos del pool en la medida en paralelo (4), aunque TPV_INFORMES_HILOS lo desactive.")
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        directorio = None
+        if connection.vendor == 'sqlite':
+            # Fichero (no memoria) para que los hilos del pool vean los mismos datos
+            directorio = tempfile.mkdtemp()
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directorio, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._sembrar(options['ventas'], options['dias'], random.Random(options['semilla']))
+            with override_settings(TPV_INFORMES_HILOS=max(options['hilos'], 2)):
+                self._medir(options['dias'], options['repeticiones'])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            if directorio:
+                os.rmdir(directorio)
+
+    def _sembrar(self, total_ventas, dias, azar):
+        inicio = time.perf_counter()
+        usuarios = [
+            Usuario.objects.create_user(username=f'cajero{i}', nombre='Cajero', apellido=str(i), password='x')
+            for i in range(4)
+        ]
+        categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Categoría {i}') for i in range(8)])
+        productos = Producto.objects.bulk_create([
+            Producto(nombre=f'Producto {i}', precio=Decimal(azar.randint(80, 1500)) / 100, id_categoria=azar.choice(categorias))
+            for i in range(60)
+        ])
+        clientes = Cliente.objects.bulk_create([
+            Cliente(nombre_empresa=f'Cliente {i}', nif_cif=f'B{i:08d}') for i in range(500)
+        ])
+
+        # Dos servicios cerrados por día (mañana y tarde)
+        hoy = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        servicios = Servicio.objects.bulk_create([
+            Servicio(nombre=f'Servicio {dia}-{turno}', estado='cerrado',
+                     fecha_inicio=hoy - timedelta(days=dias - dia) + timedelta(hours=8 + 8 * turno),
+                     fecha_fin=hoy - timedelta(days=dias - dia) + timedelta(hours=16 + 8 * turno))
+            for dia in range(dias) for turno in range(2)
+        ])
+
+        for desde in range(0, total_ventas, 2000):
+            ventas, lineas_por_venta = [], []
+            for _ in range(min(2000, total_ventas - desde)):
+                servicio = azar.choice(servicios)
+                lineas = [
+                    DetalleVenta(id_producto=producto, cantidad=cantidad, precio_unitario=producto.precio,
+                                 subtotal=producto.precio * cantidad)
+                    for producto, cantidad in ((azar.choice(productos), azar.randint(1, 4)) for _ in range(azar.randint(1, 5)))
+                ]
+                ventas.append(Venta(
+                    fecha=servicio.fecha_inicio + timedelta(seconds=azar.randint(0, 8 * 3600 - 1)),
+                    id_usuario=azar.choice(usuarios), id_servicio=servicio,
+                    id_cliente=azar.choice(clientes) if azar.random() < 0.3 else None,
+                    total=sum(linea.subtotal for linea in lineas)
+                ))
+                lineas_por_venta.append(lineas)
+            Venta.objects.bulk_create(ventas)
+            for venta, lineas in zip(ventas, lineas_por_venta):
+                for linea in lineas:
+                    linea.id_venta = venta
+            DetalleVenta.objects.bulk_create([linea for lineas in lineas_por_venta for linea in lineas], batch_size=1000)
+        resumenes.reconstruir()
+
+        self.stdout.write(
+            f"Datos generados en {time.perf_counter() - inicio:.1f} s: {Venta.objects.count()} ventas, "
+            f"{DetalleVenta.objects.count()} líneas, {len(servicios)} servicios."
+        )
+
+    def _medir(self, dias, repeticiones):
+        hasta = timezone.localdate()
+        desde = hasta - timedelta(days=dias)
+        grupos = {
+            # Resúmenes y agregados sin funciones de Python en la consulta: la base de datos trabaja
+            # sin el GIL y las consultas se solapan (es el caso del panel de gráficos de detalle_venta)
+            'resúmenes': {
+                'productos': graficos.GRAFICOS['productos'],
+                'clientes': graficos.GRAFICOS['clientes'],
+                'servicios': graficos.GRAFICOS['servicios'],
+                'líneas por producto': lambda: list(
+                    DetalleVenta.objects.values('id_producto').annotate(unidades=Sum('cantidad'), ingresos=Sum('subtotal'))
+                ),
+                'ventas por cajero': lambda: list(
+                    Venta.objects.values('id_usuario').annotate(tickets=Count('id_venta'), ingresos=Sum('total'))
+                ),
+                'ventas por cliente': lambda: list(
+                    Venta.objects.exclude(id_cliente=None).values('id_cliente').annotate(tickets=Count('id_venta'))
+                ),
+            },
+            # Truncados con zona horaria: en SQLite Django los implementa en Python y retienen el GIL,
+            # así que solo se solapan en PostgreSQL
+            'truncado de fechas': {
+                'ventas por día': lambda: intervalos._calcular('dia', desde, hasta, {}),
+                'ventas por semana': lambda: intervalos._calcular('semana', desde, hasta, {}),
+                'mapa de calor': lambda: intervalos._calcular('mapa', desde, hasta, {}),
+            },
+        }
+        self.stdout.write(f"Base de datos: {connection.vendor}, {os.cpu_count()} CPU, "
+                          f"{settings.TPV_INFORMES_HILOS} hilos de informes")
+        for grupo, tareas in grupos.items():
+            self._medir_grupo(grupo, tareas, repeticiones)
+
+    def _medir_grupo(self, grupo, tareas, repeticiones):
+        consultas_paralelas.ejecutar(tareas)  # Calentamiento: conexiones del pool y caché de páginas
+
+        por_tarea = {nombre: [] for nombre in tareas}
+        en_serie, en_paralelo = [], []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for nombre, funcion in tareas.items():
+                inicio_tarea = time.perf_counter()
+                funcion()
+                por_tarea[nombre].append(time.perf_counter() - inicio_tarea)
+            en_serie.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            consultas_paralelas.ejecutar(tareas)
+            en_paralelo.append(time.perf_counter() - inicio)
+
+        self.stdout.write(f"\n{grupo.capitalize()}:")
+        for nombre, tiempos in por_tarea.items():
+            self.stdout.write(f"  {nombre:<20} {statistics.median(tiempos) * 1000:8.1f} ms")
+        serie, paralelo = statistics.median(en_serie), statistics.median(en_paralelo)
+        mas_lenta = max(statistics.median(tiempos) for tiempos in por_tarea.values())
+        self.stdout.write(f"  En serie:    {serie * 1000:8.1f} ms (mediana de {repeticiones})")
+        self.stdout.write(f"  En paralelo: {paralelo * 1000:8.1f} ms (límite: consulta más lenta, {mas_lenta * 1000:.1f} ms)")
+        self.stdout.write(self.style.SUCCESS(f"  Aceleración: x{serie / paralelo:.2f}"))
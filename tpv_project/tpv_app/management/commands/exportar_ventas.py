@@ -0,0 +1,35 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from tpv_app.exportacion import FORMATOS_EXPORTACION, exportar, leer_filtros
+
+
+class Command(BaseCommand):
+    help = "Exporta ventas o líneas de venta en CSV o JSONL sin cargarlas en memoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', action='store_true', help="Exporta las líneas de venta en lugar de las ventas.")
+        parser.add_argument('--formato', choices=FORMATOS_EXPORTACION, default='csv')
+        parser.add_argument('--desde', help="Primer día incluido (AAAA-MM-DD).")
+        parser.add_argument('--hasta', help="Último día incluido (AAAA-MM-DD).")
+        parser.add_argument('--servicio', type=int, help="Solo las ventas de este servicio.")
+        parser.add_argument('--salida', help="Fichero de destino (por defecto, la salida estándar).")
+
+    def handle(self, *args, **options):
+        try:
+            filtros = leer_filtros(options['desde'], options['hasta'], options['servicio'])
+            contenido = exportar('lineas' if options['lineas'] else 'ventas', options['formato'], filtros)
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        if not options['salida']:
+            for fragmento in contenido:
+                self.stdout.write(fragmento, ending='')
+            return
+
+        filas = -1 if options['formato'] == 'csv' else 0  # La cabecera CSV no cuenta
+        with open(options['salida'], 'w', encoding='utf-8', newline='') as salida:
+            for fragmento in contenido:
+                salida.write(fragmento)
+                filas += 1
+        self.stderr.write(self.style.SUCCESS(f"Filas exportadas: {filas}"))
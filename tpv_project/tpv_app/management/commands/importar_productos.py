@@ -0,0 +1,44 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from tpv_app.importacion import FORMATOS_IMPORTACION, TAMANO_LOTE_CATALOGO, importar_productos, leer_filas
+
+
+class Command(BaseCommand):
+    help = ("Crea o actualiza productos desde un fichero CSV o JSONL (columnas referencia, nombre, precio, "
+            "categoria, activo), emparejándolos por referencia y escribiéndolos por lotes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichero')
+        parser.add_argument('--formato', choices=FORMATOS_IMPORTACION,
+                            help="Por defecto, según la extensión del fichero (.jsonl o csv).")
+        parser.add_argument('--simular', action='store_true', help="Muestra el diff sin escribir nada.")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_CATALOGO, help="Filas por transacción.")
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or ('jsonl' if options['fichero'].endswith('.jsonl') else 'csv')
+        try:
+            with open(options['fichero'], encoding='utf-8-sig', newline='') as fichero:
+                resultado = importar_productos(
+                    leer_filas(fichero, formato), simular=options['simular'],
+                    tamano_lote=max(options['lote'], 1), informar=self._informar
+                )
+        except (OSError, ValidationError) as e:
+            raise CommandError(str(e))
+
+        prefijo = "Simulación: " if options['simular'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{resultado.creados} productos nuevos, {resultado.modificados} modificados, "
+            f"{resultado.sin_cambios} sin cambios, {len(resultado.errores)} errores ({resultado.lotes} lotes escritos)."
+        ))
+
+    def _informar(self, cambio):
+        if cambio.tipo == 'error':
+            self.stderr.write(f"! fila {cambio.linea} [{cambio.referencia}]: {cambio.error}")
+            return
+        signo = '+' if cambio.tipo == 'nuevo' else '~'
+        detalle = ', '.join(
+            f"{campo}={despues}" if antes is None else f"{campo}: {antes} -> {despues}"
+            for campo, (antes, despues) in cambio.campos.items()
+        )
+        self.stdout.write(f"{signo} {cambio.referencia}: {detalle}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from tpv_app.models import recalcular_contadores_servicio
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero cantidad_tickets y total_ingresos de los servicios a partir de sus ventas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids_servicio', nargs='*', type=int, help="Servicios a recalcular (por defecto, todos).")
+
+    def handle(self, *args, **options):
+        ids_servicio = options['ids_servicio'] or None
+        actualizados = recalcular_contadores_servicio(ids_servicio)
+        self.stdout.write(self.style.SUCCESS(f"Servicios recalculados: {actualizados}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tpv_app import resumenes
+
+
+class Command(BaseCommand):
+    help = "Vacía y vuelve a calcular las tablas de resumen de ventas y los contadores de los servicios."
+
+    def handle(self, *args, **options):
+        productos, clientes = resumenes.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos: {productos} filas por producto y día, {clientes} por cliente y día."
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from tpv_app import busqueda, caches
+
+
+class Command(BaseCommand):
+    help = "Vuelve a generar el índice de búsqueda de clientes (necesario tras cargas masivas)."
+
+    def handle(self, *args, **options):
+        terminos = busqueda.reindexar_clientes()
+        caches.invalidar('clientes')  # Tras una carga masiva, los listados cacheados tampoco valen
+        self.stdout.write(self.style.SUCCESS(f"Índice de clientes reconstruido: {terminos} términos."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tpv_app import busqueda
+from tpv_app.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Vuelve a generar el índice de búsqueda de productos (tabla FTS5 de SQLite)."
+
+    def handle(self, *args, **options):
+        if not busqueda.crear_indice_productos(Producto):
+            raise CommandError("La base de datos no es SQLite con FTS5: la búsqueda usa la instantánea del catálogo.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice de productos reconstruido: {Producto.objects.filter(activo=True).count()} productos activos."
+        ))
@@ -0,0 +1,218 @@
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+
+# -----------------------------
+# Métricas por ruta
+# -----------------------------
+# MetricasMiddleware mide cada petición por nombre de ruta (resolver_match.view_name): latencia
+# (histograma), consultas SQL y su tiempo (contadas con connection.execute_wrapper, sin guardar
+# el texto de las consultas) y tamaño de la respuesta. Los acumulados viven en memoria del
+# proceso y se publican en formato de texto de Prometheus en /metrics; con varios workers cada
+# uno publica los suyos. Las consultas de otros hilos (cola de escritura, consultas en paralelo)
+# usan otras conexiones y no se cuentan en la petición. En las respuestas en streaming el cuerpo
+# se genera (y consulta la base de datos) después de salir del middleware, al enviarlo: se
+# envuelve el iterador y la petición se registra cuando termina, con el tiempo y las consultas
+# de todo el envío.
+#
+# TPV_PRESUPUESTOS_RUTA fija límites opcionales por ruta; al superarlos se registra un aviso:
+#   {'crear_venta': {'consultas': 15, 'segundos': 0.3}, 'detalle_venta': {'sql_segundos': 0.1}}
+
+logger = logging.getLogger(__name__)
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIN_RUTA = 'sin_ruta'  # Peticiones que no resuelven a ninguna URL (404)
+
+
+class _Histograma:
+    __slots__ = ('limites', 'cubos', 'suma', 'cuenta')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cubos = [0] * len(limites)  # No acumulados; se acumulan al exportar
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor):
+        posicion = bisect.bisect_left(self.limites, valor)
+        if posicion < len(self.cubos):
+            self.cubos[posicion] += 1
+        self.suma += valor
+        self.cuenta += 1
+
+
+class _MetricasRuta:
+    __slots__ = ('latencia', 'consultas', 'sql_segundos', 'bytes', 'codigos')
+
+    def __init__(self):
+        self.latencia = _Histograma(LIMITES_SEGUNDOS)
+        self.consultas = _Histograma(LIMITES_CONSULTAS)
+        self.sql_segundos = 0.0
+        self.bytes = 0
+        self.codigos = {}  # '2xx' -> peticiones
+
+
+class Registro:
+    def __init__(self):
+        self._rutas = {}
+        self._lock = threading.Lock()
+
+    def observar(self, ruta, segundos, consultas, sql_segundos, tamano, codigo):
+        clase = f'{codigo // 100}xx'
+        with self._lock:
+            metricas = self._rutas.get(ruta)
+            if metricas is None:
+                metricas = self._rutas[ruta] = _MetricasRuta()
+            metricas.latencia.observar(segundos)
+            metricas.consultas.observar(consultas)
+            metricas.sql_segundos += sql_segundos
+            metricas.bytes += tamano
+            metricas.codigos[clase] = metricas.codigos.get(clase, 0) + 1
+
+    def limpiar(self):
+        with self._lock:
+            self._rutas.clear()
+
+    def exportar(self):
+        """Texto de exposición de Prometheus (versión 0.0.4) con las métricas de todas las rutas."""
+        with self._lock:
+            rutas = sorted(self._rutas.items())
+            lineas = []
+            _histogramas(lineas, 'tpv_peticion_segundos', 'Latencia de las peticiones por ruta.',
+                         [(ruta, m.latencia) for ruta, m in rutas])
+            _histogramas(lineas, 'tpv_peticion_consultas_sql', 'Consultas SQL por petición.',
+                         [(ruta, m.consultas) for ruta, m in rutas])
+            _contadores(lineas, 'tpv_sql_segundos_total', 'Tiempo total en consultas SQL por ruta.',
+                        [({'ruta': ruta}, m.sql_segundos) for ruta, m in rutas])
+            _contadores(lineas, 'tpv_respuesta_bytes_total', 'Bytes de respuesta por ruta.',
+                        [({'ruta': ruta}, m.bytes) for ruta, m in rutas])
+            _contadores(lineas, 'tpv_peticiones_total', 'Peticiones por ruta y clase de código de estado.',
+                        [({'ruta': ruta, 'codigo': clase}, total) for ruta, m in rutas for clase, total in sorted(m.codigos.items())])
+        return lineas
+
+
+registro = Registro()
+
+
+# -----------------------------
+# Formato de texto de Prometheus
+# -----------------------------
+
+def _escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _etiquetas(etiquetas):
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in etiquetas.items()) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _histogramas(lineas, nombre, ayuda, series):
+    lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} histogram']
+    for ruta, histograma in series:
+        acumulado = 0
+        for limite, cuenta in zip(histograma.limites, histograma.cubos):
+            acumulado += cuenta
+            lineas.append(f'{nombre}_bucket{_etiquetas({"ruta": ruta, "le": _numero(float(limite))})} {acumulado}')
+        lineas.append(f'{nombre}_bucket{_etiquetas({"ruta": ruta, "le": "+Inf"})} {histograma.cuenta}')
+        lineas.append(f'{nombre}_sum{_etiquetas({"ruta": ruta})} {_numero(histograma.suma)}')
+        lineas.append(f'{nombre}_count{_etiquetas({"ruta": ruta})} {histograma.cuenta}')
+
+
+def _contadores(lineas, nombre, ayuda, series, tipo='counter'):
+    lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+    lineas += [f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}' for etiquetas, valor in series]
+
+
+def metricas_diario():
+    """Retraso de los consumidores del diario de ventas (tpv_app.diario) como métricas gauge."""
+    from tpv_app import diario
+
+    estado = sorted(diario.retraso().items())
+    lineas = []
+    _contadores(lineas, 'tpv_diario_pendientes', 'Registros del diario de ventas pendientes por consumidor.',
+                [({'consumidor': nombre}, datos['pendientes']) for nombre, datos in estado], tipo='gauge')
+    _contadores(lineas, 'tpv_diario_retraso_segundos', 'Antigüedad del registro pendiente más antiguo por consumidor.',
+                [({'consumidor': nombre}, float(datos['segundos'])) for nombre, datos in estado], tipo='gauge')
+    return lineas
+
+
+# -----------------------------
+# Middleware
+# -----------------------------
+
+class _ContadorSQL:
+    __slots__ = ('consultas', 'segundos')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+class MetricasMiddleware:
+    """Registra latencia, consultas SQL, tiempo SQL y tamaño de respuesta por nombre de ruta."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'TPV_METRICAS', True):
+            return self.get_response(request)
+
+        contador = _ContadorSQL()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self._medir_envio(request, response, response.streaming_content, contador, inicio)
+        else:
+            self._registrar(request, response, contador, inicio, len(response.content))
+        return response
+
+    def _medir_envio(self, request, response, contenido, contador, inicio):
+        # Se registra también si el cliente corta la descarga (el servidor cierra el generador)
+        tamano = 0
+        try:
+            with connection.execute_wrapper(contador):
+                for fragmento in contenido:
+                    tamano += len(fragmento)
+                    yield fragmento
+        finally:
+            self._registrar(request, response, contador, inicio, tamano)
+
+    def _registrar(self, request, response, contador, inicio, tamano):
+        segundos = time.perf_counter() - inicio
+        coincidencia = getattr(request, 'resolver_match', None)
+        ruta = (coincidencia.view_name if coincidencia else None) or SIN_RUTA
+        registro.observar(ruta, segundos, contador.consultas, contador.segundos, tamano, response.status_code)
+        self._comprobar_presupuesto(request, ruta, segundos, contador)
+
+    def _comprobar_presupuesto(self, request, ruta, segundos, contador):
+        presupuesto = getattr(settings, 'TPV_PRESUPUESTOS_RUTA', {}).get(ruta)
+        if not presupuesto:
+            return
+        medidas = {'consultas': contador.consultas, 'segundos': segundos, 'sql_segundos': contador.segundos}
+        excedidos = [
+            f'{medida}={medidas[medida]:.4g} (límite {limite})'
+            for medida, limite in presupuesto.items() if medida in medidas and medidas[medida] > limite
+        ]
+        if excedidos:
+            logger.warning('Presupuesto superado en %s %s [%s]: %s', request.method, request.path, ruta, ', '.join(excedidos))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0006_venta_fecha_original'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiarioVenta',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fecha_registro', models.DateTimeField(default=django.utils.timezone.now)),
+                ('id_venta', models.IntegerField(blank=True, null=True)),
+                ('id_servicio', models.IntegerField(blank=True, null=True)),
+                ('tickets', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Registro del diario de ventas',
+                'verbose_name_plural': 'Diario de ventas',
+            },
+        ),
+        migrations.CreateModel(
+            name='MarcaDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('fecha_aplicacion', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
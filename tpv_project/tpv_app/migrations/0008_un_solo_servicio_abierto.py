@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:56
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def cerrar_servicios_abiertos_duplicados(apps, schema_editor):
+    """Deja abierto solo el servicio más reciente antes de crear la restricción."""
+    Servicio = apps.get_model('tpv_app', 'Servicio')
+    abiertos = Servicio.objects.filter(estado='abierto').order_by('-fecha_inicio', '-id_servicio')
+    ultimo = abiertos.first()
+    if ultimo is not None:
+        abiertos.exclude(pk=ultimo.pk).update(estado='cerrado', fecha_fin=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0007_diario_ventas'),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_servicios_abiertos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='servicio',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'abierto')), fields=('estado',), name='un_solo_servicio_abierto'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0008_un_solo_servicio_abierto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenClienteDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('tickets', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('id_cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tpv_app.cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por cliente',
+                'verbose_name_plural': 'Resúmenes diarios por cliente',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'id_cliente'), name='resumen_cliente_dia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenProductoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('lineas', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('id_producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tpv_app.producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por producto',
+                'verbose_name_plural': 'Resúmenes diarios por producto',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'id_producto'), name='resumen_producto_dia_unico')],
+            },
+        ),
+    ]
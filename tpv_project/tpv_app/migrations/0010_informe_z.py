@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0009_resumenes_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InformeZ',
+            fields=[
+                ('id_informe', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha_generacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_inicio', models.DateTimeField()),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('tickets', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('ticket_medio', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('desglose', models.JSONField(default=dict)),
+                ('id_servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='informes_z', to='tpv_app.servicio')),
+            ],
+            options={
+                'verbose_name': 'Informe Z',
+                'verbose_name_plural': 'Informes Z',
+                'ordering': ['-id_informe'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0011_venta_fecha_indice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id_venta', models.IntegerField(primary_key=True, serialize=False)),
+                ('id_servicio', models.IntegerField(db_index=True)),
+                ('fecha', models.DateTimeField(db_index=True)),
+                ('id_cliente', models.IntegerField(blank=True, null=True)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('clave_idempotencia', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('fichero', models.CharField(max_length=255)),
+                ('linea', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Venta archivada',
+                'verbose_name_plural': 'Ventas archivadas',
+            },
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='archivado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:25
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada de la normalización de tpv_app.busqueda en el momento de esta migración: si el
+# módulo cambia más adelante, la migración debe seguir generando el índice que se esperaba aquí
+# (para rehacerlo con la versión actual está `manage.py reindexar_clientes`)
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return _SEPARADORES.sub(' ', texto.lower()).strip()
+
+
+def _terminos(nombre_empresa, nombre_contacto, nif_cif):
+    terminos = set(_normalizar(nombre_empresa).split()) | set(_normalizar(nombre_contacto).split())
+    nif = _normalizar(nif_cif).replace(' ', '')
+    terminos.update(nif[inicio:] for inicio in range(len(nif)))
+    return {termino[:64] for termino in terminos}
+
+
+def indexar_clientes_existentes(apps, schema_editor):
+    Cliente = apps.get_model('tpv_app', 'Cliente')
+    TerminoCliente = apps.get_model('tpv_app', 'TerminoCliente')
+
+    def filas():
+        clientes = Cliente.objects.values_list('id_cliente', 'nombre_empresa', 'nombre_contacto', 'nif_cif')
+        for id_cliente, nombre_empresa, nombre_contacto, nif_cif in clientes.iterator(chunk_size=2000):
+            for termino in _terminos(nombre_empresa, nombre_contacto, nif_cif):
+                yield TerminoCliente(termino=termino, id_cliente_id=id_cliente)
+
+    TerminoCliente.objects.bulk_create(filas(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0012_archivo_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=64)),
+                ('id_cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='tpv_app.cliente')),
+            ],
+            options={
+                'verbose_name': 'Término de búsqueda de cliente',
+                'verbose_name_plural': 'Términos de búsqueda de clientes',
+                'indexes': [models.Index(fields=['termino', 'id_cliente'], name='termino_cliente_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_clientes_existentes, migrations.RunPython.noop),
+    ]
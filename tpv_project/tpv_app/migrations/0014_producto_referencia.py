@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0013_busqueda_clientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='referencia',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:32
+
+import re
+import unicodedata
+
+from django.db import DatabaseError, migrations
+
+# Copia congelada de tpv_app.busqueda en el momento de esta migración
+TABLA_PRODUCTOS_FTS = 'tpv_app_producto_busqueda'
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return _SEPARADORES.sub(' ', texto.lower()).strip()
+
+
+def crear_indice(apps, schema_editor):
+    """Tabla FTS5 de nombres de producto (solo SQLite; en otras bases, o sin FTS5, se busca en el catálogo)."""
+    conexion = schema_editor.connection
+    if conexion.vendor != 'sqlite':
+        return
+    Producto = apps.get_model('tpv_app', 'Producto')
+    with conexion.cursor() as cursor:
+        try:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_PRODUCTOS_FTS} USING fts5(nombre, tokenize='trigram')")
+        except DatabaseError:
+            return
+        cursor.execute(f"DELETE FROM {TABLA_PRODUCTOS_FTS}")
+        productos = Producto.objects.filter(activo=True).values_list('id_producto', 'nombre')
+        cursor.executemany(
+            f"INSERT INTO {TABLA_PRODUCTOS_FTS} (rowid, nombre) VALUES (%s, %s)",
+            [(id_producto, _normalizar(nombre)) for id_producto, nombre in productos.iterator(chunk_size=2000)]
+        )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_PRODUCTOS_FTS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0014_producto_referencia'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0015_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcadiario',
+            name='huecos',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
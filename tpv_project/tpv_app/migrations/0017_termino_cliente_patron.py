@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0016_marca_diario_huecos'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='terminocliente',
+            name='termino_cliente_idx',
+        ),
+        migrations.AddIndex(
+            model_name='terminocliente',
+            index=models.Index(fields=['termino', 'id_cliente'], name='termino_cliente_idx', opclasses=['varchar_pattern_ops', 'int4_ops']),
+        ),
+    ]
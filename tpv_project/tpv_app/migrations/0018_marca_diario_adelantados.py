@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tpv_app', '0017_termino_cliente_patron'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcadiario',
+            name='adelantados',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
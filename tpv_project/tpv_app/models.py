@@ -1,12 +1,21 @@
+from decimal import Decimal
+
 from django.db import models, transaction
+from django.conf import settings
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save, post_delete
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.contrib.auth.models import Group, Permission
 from django.db import models
 
+from tpv_app import busqueda, caches, intervalos, resumenes
+from tpv_app.catalogo import invalidar_catalogo
+
 
 # -----------------------------
 # Modelo de Usuario
@@ -60,7 +69,46 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
 # Modelo de Categorías
 # -----------------------------
 
-class Categoria(models.Model):
+class VersionCatalogo(models.Model):
+    """Contador global de cambios del catálogo (una única fila).
+
+    Cada escritura de Producto o Categoria toma el siguiente valor y lo guarda en la fila
+    modificada, lo que permite a las terminales pedir solo los cambios desde una versión.
+    """
+    version = models.BigIntegerField(default=0)
+    version_eliminacion = models.BigIntegerField(default=0)  # Última versión en la que se borró una fila
+
+    @classmethod
+    def siguiente(cls, eliminacion=False):
+        """Incrementa el contador y devuelve el nuevo valor.
+
+        El UPDATE bloquea la fila hasta el COMMIT, así que las versiones se confirman en orden.
+        """
+        with transaction.atomic():
+            cls.objects.get_or_create(pk=1)
+            cambios = {'version': F('version') + 1}
+            if eliminacion:
+                cambios['version_eliminacion'] = F('version') + 1
+            cls.objects.filter(pk=1).update(**cambios)
+            return cls.objects.values_list('version', flat=True).get(pk=1)
+
+
+class VersionadoCatalogoMixin(models.Model):
+    """Asigna una versión nueva del catálogo a la fila en cada guardado."""
+    version = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.version = VersionCatalogo.siguiente()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+            super().save(*args, **kwargs)
+
+
+class Categoria(VersionadoCatalogoMixin):
     id_categoria = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100)
     activo = models.BooleanField(default=True)  # Campo para borrado lógico
@@ -73,8 +121,9 @@ class Categoria(models.Model):
 # Modelo de Productos
 # -----------------------------
 
-class Producto(models.Model):
+class Producto(VersionadoCatalogoMixin):
     id_producto = models.AutoField(primary_key=True)
+    referencia = models.CharField(max_length=50, null=True, blank=True, unique=True)  # Clave externa estable (p. ej. del proveedor) para las importaciones
     nombre = models.CharField(max_length=100)
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     id_categoria = models.ForeignKey(Categoria, null=True, blank=True, on_delete=models.SET_NULL)
@@ -102,6 +151,21 @@ class Cliente(models.Model):
         return self.nombre_empresa
 
 
+class TerminoCliente(models.Model):
+    """Índice de búsqueda de clientes: una fila por palabra normalizada (ver tpv_app.busqueda)."""
+    termino = models.CharField(max_length=64)
+    id_cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='terminos')
+
+    class Meta:
+        verbose_name = "Término de búsqueda de cliente"
+        verbose_name_plural = "Términos de búsqueda de clientes"
+        # varchar_pattern_ops permite usar el índice con LIKE 'prefijo%' en PostgreSQL aunque la
+        # collation de la base de datos sea lingüística (el resto de bases de datos lo ignora)
+        indexes = [models.Index(
+            fields=['termino', 'id_cliente'], name='termino_cliente_idx', opclasses=['varchar_pattern_ops', 'int4_ops']
+        )]
+
+
 # -----------------------------
 # Modelo de Servicios
 # -----------------------------
@@ -119,17 +183,51 @@ class Servicio(models.Model):
     cantidad_tickets = models.IntegerField(default=0, editable=False)
     total_ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     estado = models.CharField(max_length=10, choices=ESTADO)
+    archivado = models.BooleanField(default=False, editable=False)  # Sus ventas están en el archivo (tpv_app.archivo)
+
+    class Meta:
+        constraints = [
+            # Garantizado por la base de datos aunque dos terminales abran servicio a la vez
+            models.UniqueConstraint(fields=['estado'], condition=models.Q(estado='abierto'), name='un_solo_servicio_abierto'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._estado_guardado = instance.__dict__.get('estado')
+        return instance
 
     def save(self, *args, **kwargs):
+        from tpv_app.informe_z import generar_informe_z
+
         with transaction.atomic():
+            cerrados = []
+            if self.estado == 'abierto' and not self._state.adding:
+                # Las ventas de un servicio archivado ya no están en Venta: reabrirlo y volver a
+                # cerrarlo reharía el informe Z sin ellas
+                if Servicio.objects.filter(pk=self.pk, archivado=True).exists():
+                    raise ValidationError("Un servicio archivado no puede volver a abrirse.")
             if self.estado == 'abierto':
-                Servicio.objects.filter(estado='abierto').update(estado='cerrado', fecha_fin=timezone.now())
+                otros = Servicio.objects.filter(estado='abierto').exclude(pk=self.pk)
+                cerrados = list(otros.values_list('pk', flat=True))
+                Servicio.objects.filter(pk__in=cerrados).update(estado='cerrado', fecha_fin=timezone.now())
             elif self.estado == 'cerrado' and not self.fecha_fin:
                 self.fecha_fin = timezone.now()
-                ventas = Venta.objects.filter(id_servicio=self.id_servicio)
-                self.cantidad_tickets = ventas.count()
-                self.total_ingresos = sum(venta.total for venta in ventas)
+            if not self._state.adding:
+                if self.estado == 'cerrado' and getattr(self, '_estado_guardado', None) != 'cerrado':
+                    cerrados.append(self.pk)
+                if kwargs.get('update_fields') is None:
+                    # Los contadores (incrementos atómicos) y la marca de archivado no se sobrescriben con valores en memoria
+                    kwargs['update_fields'] = [
+                        f.name for f in self._meta.concrete_fields
+                        if not f.primary_key and f.name not in ('cantidad_tickets', 'total_ingresos', 'archivado')
+                    ]
             super().save(*args, **kwargs)
+            self._estado_guardado = self.estado
+
+            # Cada cierre deja su informe Z
+            for id_servicio in cerrados:
+                generar_informe_z(id_servicio)
 
     def __str__(self):
         return self.nombre
@@ -141,34 +239,39 @@ class Servicio(models.Model):
 
 class Venta(models.Model):
     id_venta = models.AutoField(primary_key=True)  # Clave primaria generada automáticamente
-    fecha = models.DateTimeField(auto_now_add=True)
+    fecha = models.DateTimeField(default=timezone.now, editable=False, db_index=True)  # Los lotes conservan la fecha original del ticket
     id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     id_cliente = models.ForeignKey(Cliente, null=True, blank=True, on_delete=models.SET_NULL)
     id_servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, null=True, blank=True)
     total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Clave enviada por la terminal para que los reintentos no dupliquen la venta
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     def clean(self):
-        if not Servicio.objects.filter(estado='abierto').exists():
+        servicio = caches.servicio_abierto()
+        if servicio is None:
             raise ValidationError("No hay ningún servicio abierto para realizar una venta.")
         if not self.id_servicio:
-            servicio_abierto = Servicio.objects.filter(estado='abierto').first()
-            if servicio_abierto:
-                self.id_servicio = servicio_abierto
-            else:
-                raise ValidationError("No se puede realizar la venta sin un servicio abierto.")
+            self.id_servicio = servicio
 
     def update_total(self):
         with transaction.atomic():
             self.total = sum(detalle.subtotal for detalle in self.detalleventa_set.all())
             self.save(update_fields=['total'])
 
+    CAMPOS_AGREGADOS = ('id_servicio_id', 'id_cliente_id', 'total', 'fecha')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado en base de datos de los campos que alimentan los agregados (para calcular diferencias)
+        instance._guardado = {campo: instance.__dict__.get(campo) for campo in cls.CAMPOS_AGREGADOS}
+        return instance
+
     def save(self, *args, **kwargs):
         with transaction.atomic():
-            super().save(*args, **kwargs)
-            if self.id_servicio:
-                servicio = self.id_servicio
-                servicio.cantidad_tickets += 1
-                servicio.save()
+            super().save(*args, **kwargs)  # Las señales post_save ajustan contadores y resúmenes
+            self._guardado = {campo: getattr(self, campo) for campo in self.CAMPOS_AGREGADOS}
 
     def __str__(self):
         return f"Venta {self.id_venta} - {self.fecha}"
@@ -186,17 +289,146 @@ class DetalleVenta(models.Model):
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._guardado = (instance.__dict__.get('id_producto_id'), instance.__dict__.get('cantidad'),
+                              instance.__dict__.get('subtotal'))
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.id_producto.activo:
             raise ValidationError("El producto está inactivo y no puede usarse en la venta.")
         self.precio_unitario = self.id_producto.precio
         self.subtotal = self.cantidad * self.precio_unitario
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)  # La señal post_save actualiza el resumen por producto
+            self._guardado = (self.id_producto_id, self.cantidad, self.subtotal)
 
     def __str__(self):
         return f"{self.cantidad} x {self.id_producto.nombre}"
 
 
+# -----------------------------
+# Resúmenes de ventas (mantenidos en la misma transacción que cada venta)
+# -----------------------------
+
+class ResumenProductoDia(models.Model):
+    dia = models.DateField()
+    id_producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    unidades = models.IntegerField(default=0)
+    lineas = models.IntegerField(default=0)  # Líneas de venta: la pantalla de venta envía una por producto y ticket
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Resumen diario por producto"
+        verbose_name_plural = "Resúmenes diarios por producto"
+        constraints = [models.UniqueConstraint(fields=['dia', 'id_producto'], name='resumen_producto_dia_unico')]
+
+
+class ResumenClienteDia(models.Model):
+    dia = models.DateField()
+    id_cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    tickets = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Resumen diario por cliente"
+        verbose_name_plural = "Resúmenes diarios por cliente"
+        constraints = [models.UniqueConstraint(fields=['dia', 'id_cliente'], name='resumen_cliente_dia_unico')]
+
+
+# -----------------------------
+# Informe Z (instantánea del cierre de cada servicio)
+# -----------------------------
+
+class InformeZ(models.Model):
+    """Resumen inmutable de un servicio calculado al cerrarlo (ver tpv_app.informe_z).
+
+    Si un servicio se reabre y se vuelve a cerrar se genera un informe nuevo; el último es el vigente.
+    """
+    id_informe = models.AutoField(primary_key=True)  # Número correlativo del informe Z
+    id_servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='informes_z')
+    fecha_generacion = models.DateTimeField(default=timezone.now)
+    fecha_inicio = models.DateTimeField()
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    tickets = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    ticket_medio = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    desglose = models.JSONField(default=dict)  # productos, categorias, cajeros y horas
+
+    class Meta:
+        verbose_name = "Informe Z"
+        verbose_name_plural = "Informes Z"
+        ordering = ['-id_informe']
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Un informe Z no se puede modificar.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Informe Z {self.id_informe} - {self.id_servicio_id}"
+
+
+# -----------------------------
+# Índice de ventas archivadas
+# -----------------------------
+
+class VentaArchivada(models.Model):
+    """Una fila por venta movida al archivo comprimido: dónde está y sus datos de búsqueda."""
+    id_venta = models.IntegerField(primary_key=True)  # El mismo id que tenía en Venta
+    id_servicio = models.IntegerField(db_index=True)  # Sin FK: el índice sobrevive al borrado del servicio
+    fecha = models.DateTimeField(db_index=True)
+    id_cliente = models.IntegerField(null=True, blank=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    fichero = models.CharField(max_length=255)  # Relativo a TPV_ARCHIVO_DIR
+    linea = models.IntegerField()  # Posición de la venta dentro del fichero
+
+    class Meta:
+        verbose_name = "Venta archivada"
+        verbose_name_plural = "Ventas archivadas"
+
+    def __str__(self):
+        return f"Venta {self.id_venta} (archivada en {self.fichero})"
+
+
+# -----------------------------
+# Diario de ventas (modo de agregación diferida)
+# -----------------------------
+
+class DiarioVenta(models.Model):
+    """Registro append-only de los cambios que cada venta produce en los agregados.
+
+    Solo se escribe con TPV_AGREGACION_DIFERIDA activo; el aplicador (tpv_app.diario) lo
+    consume en orden de id y nunca modifica ni borra sus filas.
+    """
+    id = models.BigAutoField(primary_key=True)
+    fecha_registro = models.DateTimeField(default=timezone.now)
+    id_venta = models.IntegerField(null=True, blank=True)  # Sin FK: la venta puede haberse borrado
+    id_servicio = models.IntegerField(null=True, blank=True)
+    tickets = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Registro del diario de ventas"
+        verbose_name_plural = "Diario de ventas"
+
+
+class MarcaDiario(models.Model):
+    """Último registro del diario aplicado por cada consumidor (marca de agua)."""
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    huecos = models.JSONField(default=dict, blank=True)  # id saltado -> fecha en que se detectó (ver tpv_app.diario)
+    adelantados = models.JSONField(default=list, blank=True)  # Ids por encima de ultimo_id ya aplicados por un recálculo
+    fecha_aplicacion = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_id}"
+
+
 # -----------------------------
 # Señales para manejar la eliminación de categorías
 # -----------------------------
@@ -204,27 +436,219 @@ class DetalleVenta(models.Model):
 @receiver(post_delete, sender=Categoria)
 def update_producto_categoria_null(sender, instance, **kwargs):
     """Cuando se borra una categoría, ponemos a NULL los productos asociados a ella y los marcamos como inactivos"""
-    Producto.objects.filter(id_categoria=instance).update(id_categoria=None, activo=False)
+    Producto.objects.filter(id_categoria=instance).update(
+        id_categoria=None, activo=False, version=VersionCatalogo.siguiente()
+    )
     
+# Señales para invalidar la instantánea del catálogo
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_catalogo_al_modificar(sender, instance, **kwargs):
+    """Cualquier escritura de productos o categorías incrementa la versión del catálogo."""
+    invalidar_catalogo()
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Categoria)
+def registrar_eliminacion_catalogo(sender, instance, **kwargs):
+    """Un borrado físico no deja fila que sincronizar: las terminales deben recargar el catálogo completo."""
+    VersionCatalogo.siguiente(eliminacion=True)
+
+
+# Señal para mantener el índice de búsqueda de productos
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def indexar_producto_al_modificar(sender, instance, **kwargs):
+    busqueda.indexar_productos([instance.pk])
+
+
+@receiver(connection_created)
+def olvidar_fts_al_conectar(sender, connection, **kwargs):
+    busqueda.olvidar_fts(connection)
+
+
+@receiver(post_migrate)
+def olvidar_fts_al_migrar(sender, using, **kwargs):
+    # Las migraciones son las que crean y borran la tabla FTS5
+    busqueda.olvidar_fts(connections[using])
+
+
+# Señal para mantener el índice de búsqueda de clientes (los borrados caen en cascada)
+
+@receiver(post_save, sender=Cliente)
+def indexar_cliente_al_guardar(sender, instance, **kwargs):
+    busqueda.indexar_cliente(instance)
+
+
+# Señales para invalidar los fragmentos cacheados del listado de clientes
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_clientes(sender, instance, **kwargs):
+    caches.invalidar('clientes')
+
+
+# Señales para invalidar la caché del servicio abierto
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def invalidar_servicio_abierto(sender, instance, **kwargs):
+    """Cualquier alta, cambio o borrado de un servicio invalida el servicio abierto cacheado."""
+    caches.invalidar('servicio_abierto')
+
+
 # Señales para manejar la actualización de ingresos de servicio cuando se guarda o elimina una venta
 
+def ajustar_contadores_servicio(id_servicio, tickets, ingresos, id_venta=None):
+    """Aplica un incremento atómico (UPDATE ... SET x = x + n) a los contadores de un servicio.
+
+    Con TPV_AGREGACION_DIFERIDA el incremento se anota en el diario y lo aplica más tarde
+    el aplicador en segundo plano, sin tocar la fila del servicio durante la venta.
+    """
+    ingresos = Decimal(str(ingresos or 0))
+    if not id_servicio or not (tickets or ingresos):
+        return
+    if getattr(settings, 'TPV_AGREGACION_DIFERIDA', False):
+        DiarioVenta.objects.create(id_venta=id_venta, id_servicio=id_servicio, tickets=tickets, ingresos=ingresos)
+    else:
+        incrementar_contadores_servicio(id_servicio, tickets, ingresos)
+
+
+def incrementar_contadores_servicio(id_servicio, tickets, ingresos):
+    Servicio.objects.filter(pk=id_servicio).update(
+        cantidad_tickets=F('cantidad_tickets') + tickets,
+        total_ingresos=F('total_ingresos') + ingresos
+    )
+
+
+def recalcular_contadores_servicio(ids_servicio=None):
+    """Recalcula desde cero los contadores de los servicios indicados (o de todos) con agregados en base de datos."""
+    servicios = Servicio.objects.filter(archivado=False)  # Los archivados ya no tienen ventas: sus contadores son definitivos
+    if ids_servicio is not None:
+        servicios = servicios.filter(pk__in=ids_servicio)
+
+    with transaction.atomic():
+        from tpv_app import diario
+
+        # Los registros del diario ya confirmados de estos servicios quedan incluidos en el recálculo
+        diario.marcar_aplicados('contadores_servicio', ids_servicio)
+        agregados = {
+            fila['id_servicio']: fila
+            for fila in Venta.objects.filter(id_servicio__in=servicios)
+            .values('id_servicio')
+            .annotate(tickets=Count('id_venta'), ingresos=Sum('total'))
+        }
+        actualizados = 0
+        for id_servicio in servicios.values_list('id_servicio', flat=True):
+            fila = agregados.get(id_servicio, {})
+            actualizados += Servicio.objects.filter(pk=id_servicio).update(
+                cantidad_tickets=fila.get('tickets') or 0,
+                total_ingresos=fila.get('ingresos') or 0
+            )
+    return actualizados
+
+
 @receiver(post_save, sender=Venta)
-def actualizar_ingresos_al_guardar(sender, instance, **kwargs):
-    """Actualiza los ingresos totales del servicio cuando se guarda una venta."""
-    servicio = instance.id_servicio
-    if servicio:
-        ventas = Venta.objects.filter(id_servicio=servicio.id_servicio)
-        servicio.cantidad_tickets = ventas.count()
-        servicio.total_ingresos = sum(venta.total for venta in ventas)
-        servicio.save(update_fields=['cantidad_tickets', 'total_ingresos'])
+def actualizar_ingresos_al_guardar(sender, instance, created, **kwargs):
+    """Suma al servicio la venta nueva o la diferencia de total de una venta modificada."""
+    if created:
+        ajustar_contadores_servicio(instance.id_servicio_id, 1, instance.total, instance.pk)
+        return
+
+    guardado = getattr(instance, '_guardado', None)
+    if guardado is None:
+        # No conocemos el estado anterior de la venta: recalculamos solo su servicio
+        recalcular_contadores_servicio([instance.id_servicio_id])
+        return
+
+    servicio_anterior, total_anterior = guardado['id_servicio_id'], guardado['total']
+    if servicio_anterior == instance.id_servicio_id:
+        ajustar_contadores_servicio(
+            instance.id_servicio_id, 0, Decimal(str(instance.total)) - Decimal(str(total_anterior or 0)), instance.pk
+        )
+    else:
+        ajustar_contadores_servicio(servicio_anterior, -1, -Decimal(str(total_anterior or 0)), instance.pk)
+        ajustar_contadores_servicio(instance.id_servicio_id, 1, instance.total, instance.pk)
 
 
 @receiver(post_delete, sender=Venta)
 def actualizar_ingresos_al_eliminar(sender, instance, **kwargs):
-    """Actualiza los ingresos totales del servicio cuando se elimina una venta."""
-    servicio = instance.id_servicio
-    if servicio:
-        ventas = Venta.objects.filter(id_servicio=servicio.id_servicio)
-        servicio.cantidad_tickets = ventas.count()
-        servicio.total_ingresos = sum(venta.total for venta in ventas)
-        servicio.save(update_fields=['cantidad_tickets', 'total_ingresos'])
+    """Resta la venta eliminada de los contadores de su servicio."""
+    guardado = getattr(instance, '_guardado', None) or {'id_servicio_id': instance.id_servicio_id, 'total': instance.total}
+    ajustar_contadores_servicio(guardado['id_servicio_id'], -1, -Decimal(str(guardado['total'] or 0)), instance.pk)
+
+
+# Señales para mantener los resúmenes por cliente y por producto
+
+@receiver(post_save, sender=Venta)
+def actualizar_resumen_cliente(sender, instance, created, **kwargs):
+    """Suma la venta nueva al resumen de su cliente o corrige la diferencia de una venta modificada."""
+    guardado = None if created else getattr(instance, '_guardado', None)
+    filas = [(resumenes._dia(instance.fecha), instance.id_cliente_id, 1, instance.total)]
+    if guardado is not None:
+        filas.append((resumenes._dia(guardado['fecha']), guardado['id_cliente_id'], -1, -Decimal(str(guardado['total'] or 0))))
+    elif not created:
+        return  # Estado anterior desconocido: lo corrige `manage.py reconstruir_resumenes`
+    resumenes.acumular_clientes(filas)
+
+
+@receiver(post_delete, sender=Venta)
+def descontar_resumen_cliente(sender, instance, **kwargs):
+    guardado = getattr(instance, '_guardado', None) or {
+        'fecha': instance.fecha, 'id_cliente_id': instance.id_cliente_id, 'total': instance.total
+    }
+    resumenes.acumular_clientes([
+        (resumenes._dia(guardado['fecha']), guardado['id_cliente_id'], -1, -Decimal(str(guardado['total'] or 0)))
+    ])
+
+
+@receiver(post_save, sender=DetalleVenta)
+def actualizar_resumen_producto(sender, instance, created, **kwargs):
+    """Suma la línea al resumen diario de su producto (las altas en bloque usan resumenes.acumular_ventas)."""
+    dia = resumenes._dia(instance.id_venta.fecha)
+    filas = [(dia, instance.id_producto_id, instance.cantidad, 1, instance.subtotal)]
+    if not created:
+        guardado = getattr(instance, '_guardado', None)
+        if guardado is None:
+            return  # Estado anterior desconocido: lo corrige `manage.py reconstruir_resumenes`
+        id_producto, cantidad, subtotal = guardado
+        filas.append((dia, id_producto, -cantidad, -1, -subtotal))
+    resumenes.acumular_productos(filas)
+
+
+@receiver(post_delete, sender=DetalleVenta)
+def descontar_resumen_producto(sender, instance, **kwargs):
+    id_producto, cantidad, subtotal = getattr(instance, '_guardado', None) or (
+        instance.id_producto_id, instance.cantidad, instance.subtotal
+    )
+    resumenes.acumular_productos([(resumenes._dia(instance.id_venta.fecha), id_producto, -cantidad, -1, -subtotal)])
+
+
+# Señal para invalidar los datos cacheados de los gráficos de detalle_venta (tpv_app.graficos)
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+@receiver(post_save, sender=DetalleVenta)
+@receiver(post_delete, sender=DetalleVenta)
+def invalidar_graficos_venta(sender, instance, **kwargs):
+    caches.invalidar('ventas')
+
+
+# Señales para invalidar los resultados cacheados de días pasados (tpv_app.intervalos)
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def invalidar_intervalos_venta(sender, instance, **kwargs):
+    guardado = getattr(instance, '_guardado', None) or {}
+    for fecha in {instance.fecha, guardado.get('fecha')}:
+        intervalos.invalidar_si_historica(fecha)
+
+
+@receiver(post_save, sender=DetalleVenta)
+@receiver(post_delete, sender=DetalleVenta)
+def invalidar_intervalos_detalle(sender, instance, **kwargs):
+    intervalos.invalidar_si_historica(instance.id_venta.fecha)
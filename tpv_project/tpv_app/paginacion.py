@@ -0,0 +1,49 @@
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+
+
+# -----------------------------
+# Paginación por cursor (keyset)
+# -----------------------------
+# En lugar de OFFSET + COUNT(*), cada página se pide con el último (o primer) id de la anterior:
+# `WHERE id > cursor ORDER BY id LIMIT n` usa el índice de la clave primaria y cuesta lo mismo
+# en la primera página que en la última.
+
+@dataclass
+class PaginaCursor:
+    object_list: list = field(default_factory=list)
+    has_next: bool = False
+    has_previous: bool = False
+    cursor_siguiente: object = None
+    cursor_anterior: object = None
+    total_aproximado: int = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginar_por_cursor(queryset, campo, despues=None, antes=None, por_pagina=20):
+    """Devuelve la página de `queryset` (ordenado por `campo` ascendente) tras `despues` o antes de `antes`."""
+    if antes not in (None, ''):
+        filas = list(queryset.filter(**{f'{campo}__lt': antes}).order_by(f'-{campo}')[:por_pagina + 1])
+        pagina = PaginaCursor(filas[:por_pagina][::-1], has_next=True, has_previous=len(filas) > por_pagina)
+    else:
+        if despues not in (None, ''):
+            queryset = queryset.filter(**{f'{campo}__gt': despues})
+        filas = list(queryset.order_by(campo)[:por_pagina + 1])
+        pagina = PaginaCursor(filas[:por_pagina], has_next=len(filas) > por_pagina,
+                              has_previous=despues not in (None, ''))
+
+    if pagina.object_list:
+        pagina.cursor_anterior = getattr(pagina.object_list[0], campo)
+        pagina.cursor_siguiente = getattr(pagina.object_list[-1], campo)
+    return pagina
+
+
+def total_cacheado(clave, queryset, segundos=60):
+    """COUNT(*) cacheado unos segundos: basta para mostrar un total aproximado en listados grandes."""
+    return cache.get_or_set(f'tpv:total:{clave}', queryset.count, segundos)
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+# -----------------------------
+# Tablas de resumen de ventas
+# -----------------------------
+# ResumenProductoDia (día, producto) y ResumenClienteDia (día, cliente) se actualizan en la misma
+# transacción que cada venta o anulación; el resumen por servicio son los contadores del propio
+# Servicio. Los informes leen de aquí en lugar de agrupar todo el histórico de ventas.
+
+TAMANO_UPSERT = 100  # Filas por sentencia (límite de parámetros de SQLite)
+
+
+def _dia(fecha):
+    return timezone.localdate(fecha) if timezone.is_aware(fecha) else fecha.date()
+
+
+def _upsert_incremental(modelo, claves, sumas, filas):
+    """INSERT ... ON CONFLICT (claves) DO UPDATE SET campo = campo + excluded.campo.
+
+    La misma sintaxis funciona en SQLite (>= 3.24) y PostgreSQL, así que un ticket entero
+    actualiza sus resúmenes con una sola sentencia por tabla.
+    """
+    if not filas:
+        return
+    qn = connection.ops.quote_name
+    opciones = modelo._meta
+    tabla = qn(opciones.db_table)
+    columnas_clave = [qn(opciones.get_field(campo).column) for campo in claves]
+    columnas_suma = [qn(opciones.get_field(campo).column) for campo in sumas]
+    marcadores = '(' + ', '.join(['%s'] * (len(claves) + len(sumas))) + ')'
+    actualizacion = ', '.join(f'{columna} = {tabla}.{columna} + excluded.{columna}' for columna in columnas_suma)
+
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(filas), TAMANO_UPSERT):
+            grupo = filas[inicio:inicio + TAMANO_UPSERT]
+            cursor.execute(
+                f'INSERT INTO {tabla} ({", ".join(columnas_clave + columnas_suma)}) '
+                f'VALUES {", ".join([marcadores] * len(grupo))} '
+                f'ON CONFLICT ({", ".join(columnas_clave)}) DO UPDATE SET {actualizacion}',
+                [_adaptar(valor) for fila in grupo for valor in fila]
+            )
+
+
+def _adaptar(valor):
+    if isinstance(valor, Decimal):
+        return connection.ops.adapt_decimalfield_value(valor)
+    if hasattr(valor, 'isoformat') and not hasattr(valor, 'hour'):
+        return connection.ops.adapt_datefield_value(valor)
+    return valor
+
+
+def acumular_productos(filas):
+    """Suma filas (dia, id_producto, unidades, lineas, ingresos) a ResumenProductoDia."""
+    from tpv_app.models import ResumenProductoDia
+
+    agrupadas = defaultdict(lambda: [0, 0, Decimal('0')])
+    for dia, id_producto, unidades, lineas, ingresos in filas:
+        acumulado = agrupadas[(dia, id_producto)]
+        acumulado[0] += unidades
+        acumulado[1] += lineas
+        acumulado[2] += Decimal(str(ingresos))
+    _upsert_incremental(
+        ResumenProductoDia, ['dia', 'id_producto'], ['unidades', 'lineas', 'ingresos'],
+        [clave + tuple(valores) for clave, valores in agrupadas.items()]
+    )
+
+
+def acumular_clientes(filas):
+    """Suma filas (dia, id_cliente, tickets, ingresos) a ResumenClienteDia (se ignoran ventas sin cliente)."""
+    from tpv_app.models import ResumenClienteDia
+
+    agrupadas = defaultdict(lambda: [0, Decimal('0')])
+    for dia, id_cliente, tickets, ingresos in filas:
+        if id_cliente:
+            acumulado = agrupadas[(dia, id_cliente)]
+            acumulado[0] += tickets
+            acumulado[1] += Decimal(str(ingresos))
+    _upsert_incremental(
+        ResumenClienteDia, ['dia', 'id_cliente'], ['tickets', 'ingresos'],
+        [clave + tuple(valores) for clave, valores in agrupadas.items()]
+    )
+
+
+def filas_productos(venta, lineas, signo=1):
+    dia = _dia(venta.fecha)
+    return [(dia, linea.id_producto_id, signo * linea.cantidad, signo, signo * linea.subtotal) for linea in lineas]
+
+
+def acumular_ventas(ventas_con_lineas, signo=1):
+    """Añade (signo=1) o resta (signo=-1) ventas completas con sus líneas.
+
+    Lo usan los caminos de alta en bloque (bulk_create no envía señales).
+    """
+    productos, clientes = [], []
+    for venta, lineas in ventas_con_lineas:
+        productos.extend(filas_productos(venta, lineas, signo))
+        clientes.append((_dia(venta.fecha), venta.id_cliente_id, signo, signo * Decimal(str(venta.total))))
+    acumular_productos(productos)
+    acumular_clientes(clientes)
+
+
+def reconstruir():
+    """Vacía los resúmenes y los vuelve a calcular a partir del histórico de ventas (incluido el archivo)."""
+    from tpv_app import archivo
+    from tpv_app.models import (
+        DetalleVenta, ResumenClienteDia, ResumenProductoDia, Venta, recalcular_contadores_servicio
+    )
+
+    zona = timezone.get_current_timezone()
+    with transaction.atomic():
+        ResumenProductoDia.objects.all().delete()
+        ResumenClienteDia.objects.all().delete()
+
+        productos = (
+            DetalleVenta.objects
+            .annotate(dia=TruncDate('id_venta__fecha', tzinfo=zona))
+            .values('dia', 'id_producto')
+            .annotate(unidades=Sum('cantidad'), lineas=Count('id_detalle'), ingresos=Sum('subtotal'))
+            .order_by()
+        )
+        ResumenProductoDia.objects.bulk_create(
+            (ResumenProductoDia(dia=fila['dia'], id_producto_id=fila['id_producto'], unidades=fila['unidades'],
+                                lineas=fila['lineas'], ingresos=fila['ingresos'])
+             for fila in productos.iterator(chunk_size=2000)),
+            batch_size=500
+        )
+
+        clientes = (
+            Venta.objects.exclude(id_cliente=None)
+            .annotate(dia=TruncDate('fecha', tzinfo=zona))
+            .values('dia', 'id_cliente')
+            .annotate(tickets=Count('id_venta'), ingresos=Sum('total'))
+            .order_by()
+        )
+        ResumenClienteDia.objects.bulk_create(
+            (ResumenClienteDia(dia=fila['dia'], id_cliente_id=fila['id_cliente'], tickets=fila['tickets'],
+                               ingresos=fila['ingresos'])
+             for fila in clientes.iterator(chunk_size=2000)),
+            batch_size=500
+        )
+
+        # Las ventas ya archivadas no están en las tablas: se suman desde el archivo
+        archivo.sumar_a_resumenes()
+
+        recalcular_contadores_servicio()
+
+    return ResumenProductoDia.objects.count(), ResumenClienteDia.objects.count()
@@ -0,0 +1,90 @@
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tpv_app import analitica
+from tpv_app.models import Usuario, Cliente, Producto, Servicio, Venta
+from tpv_app.ventas import registrar_venta
+
+
+@unittest.skipUnless(analitica.disponible(), 'NumPy no está instalado')
+class AnaliticaTests(TestCase):
+    """Tests para el extracto columnar y las operaciones vectorizadas."""
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.cafe = Producto.objects.create(nombre='Café', precio=Decimal('1.20'))
+        self.te = Producto.objects.create(nombre='Té', precio=Decimal('1.10'))
+        self.cliente = Cliente.objects.create(nombre_empresa='Bar Pepe', nif_cif='B1234567')
+
+        ahora = timezone.now()
+        self.cerrado = Servicio.objects.create(nombre='Ayer', estado='abierto', fecha_inicio=ahora - timedelta(days=1))
+        registrar_venta(self.user, self.cerrado, self.cliente, [self.cafe.id_producto], [3])
+        registrar_venta(self.user, self.cerrado, None, [self.te.id_producto, self.cafe.id_producto], [1, 1])
+        self.cerrado.refresh_from_db()
+        self.cerrado.estado = 'cerrado'
+        self.cerrado.fecha_fin = ahora
+        self.cerrado.save()
+
+        self.abierto = Servicio.objects.create(nombre='Hoy', estado='abierto', fecha_inicio=ahora)
+        registrar_venta(self.user, self.abierto, self.cliente, [self.te.id_producto], [2])
+
+    def test_extracto_y_cache_de_servicios_cerrados(self):
+        datos = analitica.extracto()
+        self.assertEqual(len(datos), 4)
+        self.assertEqual(int(datos.importe_centimos.sum()), 360 + 110 + 120 + 220)
+        self.assertEqual(int((datos.cliente == analitica.SIN_VALOR).sum()), 2)
+
+        # El servicio cerrado se sirve desde la caché: solo se leen las líneas del abierto
+        with self.assertNumQueries(2):
+            self.assertEqual(len(analitica.extracto()), 4)
+
+        # Anular una venta de un servicio cerrado cambia sus contadores y con ellos la clave de caché
+        Venta.objects.filter(id_servicio=self.cerrado).first().delete()
+        self.assertEqual(len(analitica.extracto()), 3)
+
+    def test_extracto_incluye_tickets_diferidos_de_servicios_cerrados(self):
+        # Un ticket de un lote diferido conserva su fecha aunque se asigne a un servicio posterior
+        hace_tres_dias = timezone.now() - timedelta(days=3)
+        venta = Venta.objects.filter(id_servicio=self.cerrado).first()
+        Venta.objects.filter(pk=venta.pk).update(fecha=hace_tres_dias)
+
+        datos = analitica.extracto(hace_tres_dias - timedelta(hours=1), hace_tres_dias + timedelta(hours=1))
+        self.assertEqual(len(datos), venta.detalleventa_set.count())
+        self.assertEqual(set(datos.servicio.tolist()), {self.cerrado.id_servicio})
+
+    def test_operaciones_vectorizadas(self):
+        datos = analitica.extracto()
+        self.assertEqual(
+            analitica.top_n(datos.producto, datos.cantidad, 1),
+            [(self.cafe.id_producto, 4)]
+        )
+        claves, cuentas = analitica.agrupar(datos.servicio)
+        self.assertEqual(dict(zip(claves.tolist(), cuentas.tolist())),
+                         {self.cerrado.id_servicio: 3, self.abierto.id_servicio: 1})
+
+        claves, sumas = analitica.agrupar(datos.servicio, datos.importe_centimos)
+        self.assertEqual(sumas.tolist(), [360 + 110 + 120, 220])
+
+        self.assertEqual(analitica.media_movil([2, 4, 6, 8], 2).tolist(), [2.0, 3.0, 5.0, 7.0])
+
+    def test_ingresos_diarios(self):
+        dias, ingresos, media = analitica.ingresos_diarios(dias=7, ventana=7)
+        self.assertEqual(len(dias), 7)
+        self.assertEqual(dias[-1], timezone.localdate())
+        self.assertAlmostEqual(sum(ingresos), 8.10)
+        self.assertEqual(len(media), 7)
+
+    @override_settings(TIME_ZONE='Europe/Madrid')
+    def test_ingresos_diarios_en_cambio_de_horario(self):
+        # El 29/03/2026 dura 23 horas en Madrid: la venta de las 00:30 del 30 es de ese día, no del 29
+        venta = registrar_venta(self.user, self.abierto, None, [self.cafe.id_producto], [1])
+        fecha = timezone.make_aware(datetime(2026, 3, 30, 0, 30))
+        Venta.objects.filter(pk=venta.pk).update(fecha=fecha)
+
+        dias, ingresos, _ = analitica.ingresos_diarios(dias=2, ventana=1, hasta=date(2026, 3, 30))
+        self.assertEqual(dias, [date(2026, 3, 29), date(2026, 3, 30)])
+        self.assertEqual(ingresos, [0.0, 1.2])
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from unittest import mock
+from django.utils import timezone
+
+from tpv_app import analitica, archivo, exportacion, intervalos, resumenes
+from tpv_app.models import (
+    Usuario, Cliente, Producto, Servicio, Venta, DetalleVenta, InformeZ, VentaArchivada,
+    ResumenProductoDia, ResumenClienteDia, recalcular_contadores_servicio
+)
+from tpv_app.ventas import registrar_venta, venta_por_clave
+
+
+class ArchivoTests(TestCase):
+    """Tests para el archivo de ventas de servicios cerrados."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        ajustes = override_settings(TPV_ARCHIVO_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+        self.user = Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.cafe = Producto.objects.create(nombre='Café', precio=Decimal('1.20'))
+        self.cliente = Cliente.objects.create(nombre_empresa='Bar Pepe', nif_cif='B1234567')
+
+        self.antiguo = Servicio.objects.create(nombre='Antiguo', estado='abierto', fecha_inicio=timezone.now())
+        self.venta = registrar_venta(self.user, self.antiguo, self.cliente, [self.cafe.id_producto], [2], 'clave-1')
+        registrar_venta(self.user, self.antiguo, None, [self.cafe.id_producto], [1])
+        self.actual = Servicio.objects.create(nombre='Actual', estado='abierto', fecha_inicio=timezone.now())  # Cierra el antiguo
+        registrar_venta(self.user, self.actual, None, [self.cafe.id_producto], [3])
+
+    def _resumenes(self):
+        return (
+            ResumenProductoDia.objects.aggregate(unidades=Sum('unidades'), ingresos=Sum('ingresos')),
+            list(ResumenClienteDia.objects.values_list('id_cliente', 'tickets', 'ingresos')),
+        )
+
+    def test_archivar_conserva_resumenes_contadores_e_informe(self):
+        antes = self._resumenes()
+        resultado = archivo.archivar(timezone.now() + timedelta(seconds=1))
+
+        self.assertEqual([(servicio.pk, ventas) for servicio, ventas in resultado], [(self.antiguo.pk, 2)])
+        self.assertEqual(Venta.objects.count(), 1)
+        self.assertEqual(DetalleVenta.objects.count(), 1)
+        self.assertEqual(VentaArchivada.objects.count(), 2)
+        self.assertEqual(self._resumenes(), antes)
+
+        servicio = Servicio.objects.get(pk=self.antiguo.pk)
+        self.assertTrue(servicio.archivado)
+        self.assertEqual((servicio.cantidad_tickets, servicio.total_ingresos), (2, Decimal('3.60')))
+        self.assertEqual(InformeZ.objects.get(id_servicio=servicio).tickets, 2)
+
+        # Ni recalcular los contadores ni reconstruir los resúmenes pierden las ventas archivadas
+        recalcular_contadores_servicio()
+        self.assertEqual(Servicio.objects.get(pk=self.antiguo.pk).cantidad_tickets, 2)
+        resumenes.reconstruir()
+        self.assertEqual(self._resumenes(), antes)
+
+        # Un segundo pase no vuelve a archivar el servicio
+        self.assertEqual(archivo.archivar(timezone.now() + timedelta(seconds=1)), [])
+
+    def test_buscar_venta_archivada(self):
+        archivo.archivar(timezone.now() + timedelta(seconds=1))
+
+        registro = archivo.buscar_venta(self.venta.id_venta)
+        self.assertEqual(registro['cliente'], 'Bar Pepe')
+        self.assertEqual(registro['lineas'][0]['producto'], 'Café')
+        self.assertEqual(registro['lineas'][0]['subtotal'], '2.40')
+        self.assertIsNone(archivo.buscar_venta(999999))
+
+        # Un reintento con la clave de un ticket archivado no lo duplica
+        self.assertEqual(venta_por_clave('clave-1'), self.venta.id_venta)
+
+        # También si la clave choca al insertar y la venta original se archivó entretanto
+        with mock.patch('tpv_app.ventas._insertar_venta', side_effect=IntegrityError):
+            venta = registrar_venta(self.user, self.actual, None, [self.cafe.id_producto], [1], 'clave-1')
+        self.assertEqual(venta.id_venta, self.venta.id_venta)
+        self.assertEqual(venta.total, Decimal('2.40'))
+
+    def test_servicio_archivado_no_se_reabre(self):
+        archivo.archivar(timezone.now() + timedelta(seconds=1))
+
+        servicio = Servicio.objects.get(pk=self.antiguo.pk)
+        servicio.estado = 'abierto'
+        with self.assertRaises(ValidationError):
+            servicio.save()
+        self.assertEqual(Servicio.objects.get(pk=self.antiguo.pk).estado, 'cerrado')
+        self.assertEqual(Servicio.objects.get(pk=self.actual.pk).estado, 'abierto')
+        self.assertEqual(InformeZ.objects.get(id_servicio=self.antiguo.pk).tickets, 2)
+
+    def test_comando_archivar_servicios(self):
+        salida = StringIO()
+        call_command('archivar_servicios', '--dias', '0', '--simular', stdout=salida)
+        self.assertIn('Se archivarían 1 servicios (2 ventas)', salida.getvalue())
+        self.assertEqual(Venta.objects.count(), 3)
+
+        call_command('archivar_servicios', '--dias', '0', stdout=StringIO())
+        salida = StringIO()
+        call_command('archivar_servicios', '--buscar', str(self.venta.id_venta), stdout=salida)
+        self.assertIn('"clave_idempotencia": "clave-1"', salida.getvalue())
+
+    def test_informes_incluyen_las_ventas_archivadas(self):
+        """Exportaciones, series por intervalos y analítica dan lo mismo antes y después de archivar."""
+        hoy = timezone.localdate()
+        filtros = {'desde': hoy, 'hasta': hoy}
+
+        def informes():
+            return (
+                sorted((fila['id_venta'], fila['servicio'], fila['usuario'], fila['cliente'], str(fila['total']))
+                       for fila in exportacion.filas_ventas(filtros)),
+                sorted((fila['id_detalle'], fila['producto'], fila['cantidad'], str(fila['subtotal']))
+                       for fila in exportacion.filas_lineas(filtros)),
+                intervalos._calcular('dia', hoy, hoy, {}),
+                intervalos._calcular('hora', hoy, hoy, {'producto': self.cafe.id_producto, 'usuario': self.user.pk}),
+            )
+
+        antes = informes()
+        archivo.archivar(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(VentaArchivada.objects.count(), 2)
+        self.assertEqual(informes(), antes)
+        self.assertEqual(len(antes[0]), 3)
+
+        solo_archivado = list(exportacion.filas_ventas({'servicio': self.antiguo.pk}))
+        self.assertEqual(sorted(fila['id_venta'] for fila in solo_archivado), sorted(
+            VentaArchivada.objects.values_list('id_venta', flat=True)))
+        self.assertEqual(list(solo_archivado[0]), [columna for columna, _ in exportacion.COLUMNAS_VENTAS])
+
+        if analitica.disponible():
+            datos = analitica.extracto()
+            self.assertEqual(len(datos), 3)
+            self.assertEqual(int(datos.importe_centimos.sum()), 240 + 120 + 360)
+
+    def test_venta_nueva_durante_el_archivado_lo_cancela(self):
+        """Si el servicio recibe una venta entre la escritura del fichero y el borrado, no se archiva nada."""
+        ventas_servicio = archivo._ventas_servicio
+
+        def con_venta_concurrente(id_servicio):
+            yield from ventas_servicio(id_servicio)
+            Venta.objects.create(id_usuario=self.user, id_servicio=self.antiguo, total=Decimal('1.00'))
+
+        with mock.patch.object(archivo, '_ventas_servicio', con_venta_concurrente):
+            self.assertEqual(archivo.archivar(timezone.now() + timedelta(seconds=1)), [])
+
+        self.assertFalse(Servicio.objects.get(pk=self.antiguo.pk).archivado)
+        self.assertFalse(VentaArchivada.objects.exists())
+        self.assertEqual(Venta.objects.filter(id_servicio=self.antiguo).count(), 3)
+        self.assertEqual(os.listdir(self.directorio), [])
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from tpv_app.catalogo import obtener_catalogo
+from tpv_app.models import Categoria, Producto, VersionCatalogo
+from tpv_app.ventas import preparar_lineas
+
+
+class CatalogoTests(TestCase):
+    """Tests para la instantánea del catálogo en memoria."""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre="Bebidas")
+        self.producto = Producto.objects.create(
+            nombre="Café", precio=Decimal("1.20"), id_categoria=self.categoria, activo=True
+        )
+
+    def test_instantanea_se_reutiliza_hasta_que_cambia_el_catalogo(self):
+        catalogo = obtener_catalogo()
+        self.assertEqual(catalogo.productos[self.producto.id_producto].precio, Decimal("1.20"))
+        self.assertEqual(catalogo.productos[self.producto.id_producto].id_categoria_id, self.categoria.id_categoria)
+
+        with self.assertNumQueries(0):
+            self.assertIs(obtener_catalogo(), catalogo)
+
+        self.producto.precio = Decimal("1.50")
+        self.producto.save()
+
+        nuevo = obtener_catalogo()
+        self.assertGreater(nuevo.version, catalogo.version)
+        self.assertEqual(nuevo.productos[self.producto.id_producto].precio, Decimal("1.50"))
+
+    def test_preparar_lineas_con_la_instantanea_al_dia(self):
+        obtener_catalogo()
+        with self.assertNumQueries(1):  # Solo el contador de VersionCatalogo
+            lineas, total = preparar_lineas([self.producto.id_producto], [3])
+        self.assertEqual(total, Decimal("3.60"))
+        self.assertEqual(lineas[0].precio_unitario, Decimal("1.20"))
+
+    def test_preparar_lineas_con_la_instantanea_desfasada(self):
+        """Un cambio hecho en otro worker (sin invalidar la caché de este) no se cobra con el precio viejo."""
+        catalogo = obtener_catalogo()
+        Producto.objects.filter(pk=self.producto.pk).update(precio=Decimal("1.50"), version=VersionCatalogo.siguiente())
+        self.assertIs(obtener_catalogo(), catalogo)
+
+        with self.assertNumQueries(2):
+            lineas, total = preparar_lineas([self.producto.id_producto], [3])
+        self.assertEqual(total, Decimal("4.50"))
+
+        Producto.objects.filter(pk=self.producto.pk).update(activo=False, version=VersionCatalogo.siguiente())
+        with self.assertRaises(ValidationError):
+            preparar_lineas([self.producto.id_producto], [1])
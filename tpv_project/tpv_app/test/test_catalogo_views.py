@@ -0,0 +1,104 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from tpv_app.models import Producto, Categoria, Usuario
+
+
+class CatalogoApiTests(TestCase):
+    """Tests para la API de sincronización del catálogo."""
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.categoria = Categoria.objects.create(nombre='Bebidas')
+        self.cafe = Producto.objects.create(nombre='Café', precio=Decimal('1.20'), id_categoria=self.categoria)
+        self.te = Producto.objects.create(nombre='Té', precio=Decimal('1.10'), id_categoria=self.categoria)
+        self.client.login(username='testuser', password='testpassword')
+
+    def test_catalogo_completo_y_304(self):
+        response = self.client.get(reverse('catalogo_api'))
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertTrue(datos['completo'])
+        self.assertEqual(len(datos['productos']['filas']), 2)
+        self.assertIn([self.cafe.id_producto, 'Café', '1.20', True, self.categoria.id_categoria, self.cafe.version],
+                      datos['productos']['filas'])
+
+        response = self.client.get(reverse('catalogo_api'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cambios_desde_version(self):
+        version = self.client.get(reverse('catalogo_api')).json()['version']
+
+        self.te.activo = False
+        self.te.save()
+
+        response = self.client.get(reverse('catalogo_api'), {'since': version})
+        datos = response.json()
+        self.assertFalse(datos['completo'])
+        self.assertEqual(datos['categorias']['filas'], [])
+        self.assertEqual(len(datos['productos']['filas']), 1)
+        self.assertEqual(datos['productos']['filas'][0][0], self.te.id_producto)
+        self.assertFalse(datos['productos']['filas'][0][3])  # Desactivado
+        self.assertGreater(datos['version'], version)
+
+    def test_borrado_fisico_fuerza_catalogo_completo(self):
+        version = self.client.get(reverse('catalogo_api')).json()['version']
+        self.te.delete()
+        datos = self.client.get(reverse('catalogo_api'), {'since': version}).json()
+        self.assertTrue(datos['completo'])
+        self.assertEqual([fila[0] for fila in datos['productos']['filas']], [self.cafe.id_producto])
+
+    def test_since_invalido(self):
+        response = self.client.get(reverse('catalogo_api'), {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TarjetasProductosApiTests(TestCase):
+    """Tests para las tarjetas de producto por categoría de la pantalla de venta."""
+
+    def setUp(self):
+        Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.bebidas = Categoria.objects.create(nombre='Bebidas')
+        self.comida = Categoria.objects.create(nombre='Comida')
+        Producto.objects.bulk_create([
+            Producto(nombre=f'Bebida {i}', precio=Decimal('1.00'), id_categoria=self.bebidas) for i in range(50)
+        ])
+        self.tostada = Producto.objects.create(nombre='Tostada', precio=Decimal('2.00'), id_categoria=self.comida)
+
+    def _tarjetas(self, **parametros):
+        return self.client.get(reverse('tarjetas_productos_api'), parametros)
+
+    def test_productos_de_la_categoria_por_paginas(self):
+        primera = self._tarjetas(categoria=self.bebidas.id_categoria).json()
+        self.assertEqual(len(primera['productos']), 48)
+        self.assertEqual(primera['siguiente'], 2)
+        segunda = self._tarjetas(categoria=self.bebidas.id_categoria, pagina=2).json()
+        self.assertEqual([p['nombre'] for p in segunda['productos']], ['Bebida 48', 'Bebida 49'])
+        self.assertIsNone(segunda['siguiente'])
+
+        comida = self._tarjetas(categoria=self.comida.id_categoria).json()
+        self.assertEqual(comida['productos'], [
+            {'id_producto': self.tostada.id_producto, 'nombre': 'Tostada', 'precio': '2.00', 'id_categoria': self.comida.id_categoria}
+        ])
+
+    def test_etag_cambia_con_el_catalogo(self):
+        respuesta = self._tarjetas(categoria=self.comida.id_categoria)
+        self.assertEqual(self.client.get(reverse('tarjetas_productos_api'), {'categoria': self.comida.id_categoria},
+                                         HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+        self.tostada.precio = Decimal('2.20')
+        self.tostada.save()
+        respuesta = self.client.get(reverse('tarjetas_productos_api'), {'categoria': self.comida.id_categoria},
+                                    HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['productos'][0]['precio'], '2.20')
+
+    def test_parametros_no_validos(self):
+        self.assertEqual(self._tarjetas(categoria='x').status_code, 400)
+        self.assertEqual(self._tarjetas(pagina=0).status_code, 400)
+
+    def test_pantalla_de_venta_sin_tarjetas(self):
+        respuesta = self.client.get(reverse('crear_venta'))
+        self.assertContains(respuesta, 'Bebidas')
+        self.assertNotContains(respuesta, 'Tostada')
@@ -1,5 +1,9 @@
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
 from django.urls import reverse
+from tpv_app import busqueda
 from tpv_app.models import Cliente, Usuario
 from django.contrib.messages import get_messages
 
@@ -22,6 +26,18 @@ class ClienteViewsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Empresa de Prueba')  # Verifica que el cliente aparece
 
+    def test_listado_cacheado_hasta_modificar_un_cliente(self):
+        """Las filas del listado se sirven desde la caché mientras no cambie la versión 'clientes'."""
+        self.client.login(username='testuser', password='testpassword')
+        self.client.get(reverse('clientes'))
+
+        Cliente.objects.filter(pk=self.cliente.pk).update(nombre_empresa='Sin señales')  # No cambia la versión
+        self.assertContains(self.client.get(reverse('clientes')), 'Empresa de Prueba')
+
+        self.cliente.nombre_empresa = 'Empresa Renombrada'
+        self.cliente.save()
+        self.assertContains(self.client.get(reverse('clientes')), 'Empresa Renombrada')
+
     def test_crear_cliente(self):
         """Test para verificar que un cliente puede ser creado correctamente."""
         self.client.login(username='testuser', password='testpassword')
@@ -84,3 +100,66 @@ class ClienteViewsTestCase(TestCase):
         self.assertRedirects(response, reverse('clientes'))
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(str(messages[0]), 'Cliente actualizado exitosamente.')
+
+
+class BuscarClientesApiTests(TestCase):
+    """Tests para la búsqueda de clientes de la pantalla de venta."""
+
+    def setUp(self):
+        Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.garcia = Cliente.objects.create(nombre_empresa='Distribuciones García, S.L.', nombre_contacto='Ana Ruiz',
+                                             nif_cif='B12345678')
+        self.gascon = Cliente.objects.create(nombre_empresa='Gascón Hostelería', nif_cif='B87654321')
+
+    def _buscar(self, **parametros):
+        return self.client.get(reverse('buscar_clientes_api'), parametros)
+
+    def _ids(self, respuesta):
+        return [cliente['id_cliente'] for cliente in respuesta.json()['clientes']]
+
+    def test_prefijo_de_palabra_sin_tildes(self):
+        self.assertEqual(self._ids(self._buscar(q='garc')), [self.garcia.id_cliente])
+        self.assertEqual(self._ids(self._buscar(q='HOSTELERIA')), [self.gascon.id_cliente])
+        self.assertEqual(self._ids(self._buscar(q='ga')), [self.garcia.id_cliente, self.gascon.id_cliente])
+
+    def test_varias_palabras_y_contacto(self):
+        self.assertEqual(self._ids(self._buscar(q='ruiz dist')), [self.garcia.id_cliente])
+        self.assertEqual(self._ids(self._buscar(q='ruiz gascon')), [])
+
+    def test_prefijo_con_like_fuera_de_sqlite(self):
+        """Con otras bases de datos (collation lingüística) el prefijo se busca con LIKE, no con un rango."""
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            consulta = busqueda.buscar_clientes('ruiz')
+            self.assertIn('LIKE', str(consulta.query))
+            self.assertNotIn('ruiz{', str(consulta.query))  # Límite superior del rango binario
+            self.assertEqual([cliente.id_cliente for cliente in consulta], [self.garcia.id_cliente])
+
+    def test_subcadena_del_nif(self):
+        self.assertEqual(self._ids(self._buscar(q='654')), [self.gascon.id_cliente])
+
+    def test_indice_se_actualiza_al_editar_y_borrar(self):
+        self.gascon.nombre_empresa = 'Catering Sur'
+        self.gascon.save()
+        self.assertEqual(self._ids(self._buscar(q='gasc')), [])
+        self.assertEqual(self._ids(self._buscar(q='catering')), [self.gascon.id_cliente])
+        self.garcia.delete()
+        self.assertEqual(self._ids(self._buscar(q='garcia')), [])
+
+    def test_paginacion_por_cursor(self):
+        for i in range(25):
+            Cliente.objects.create(nombre_empresa=f'Bar Pepe {i}', nif_cif=f'C{i:08d}')
+        primera = self._buscar(q='pepe').json()
+        self.assertEqual(len(primera['clientes']), 20)
+        segunda = self._buscar(q='pepe', despues=primera['siguiente']).json()
+        self.assertEqual(len(segunda['clientes']), 5)
+        self.assertIsNone(segunda['siguiente'])
+
+    def test_busqueda_demasiado_corta(self):
+        respuesta = self._buscar(q='g')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(respuesta.json()['success'])
+
+    def test_pantalla_de_venta_no_incluye_clientes(self):
+        respuesta = self.client.get(reverse('crear_venta'))
+        self.assertNotContains(respuesta, 'Gascón')
@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import TimeoutError
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from tpv_app import cola_escritura
+from tpv_app.models import Categoria
+
+
+@override_settings(TPV_COLA_ESCRITURA=True)
+class ColaEscrituraTests(TransactionTestCase):
+    """Tests para la cola de escritura con un único hilo escritor."""
+
+    def test_escrituras_concurrentes_se_serializan_en_el_hilo_escritor(self):
+        hilos_escritores = set()
+        errores = []
+
+        def crear(nombre):
+            hilos_escritores.add(threading.current_thread().name)
+            if nombre == 'falla':
+                raise ValueError('Escritura fallida')
+            return Categoria.objects.create(nombre=nombre).pk
+
+        def peticion(nombre):
+            try:
+                cola_escritura.ejecutar(crear, nombre)
+            except ValueError as error:
+                errores.append(str(error))
+
+        hilos = [threading.Thread(target=peticion, args=(f'Categoria {i}',)) for i in range(10)]
+        hilos.append(threading.Thread(target=peticion, args=('falla',)))
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(hilos_escritores, {'tpv-cola-escritura'})
+        self.assertEqual(errores, ['Escritura fallida'])  # El fallo de una escritura no afecta al resto del grupo
+        self.assertEqual(Categoria.objects.count(), 10)
+
+    def test_un_error_del_hilo_no_bloquea_la_cola(self):
+        """Un fallo fuera de las escrituras se entrega a quien espera y el hilo sigue atendiendo."""
+        fallos = [RuntimeError('Conexión perdida')]
+
+        def close_old_connections():
+            if fallos:
+                raise fallos.pop()
+
+        with mock.patch('tpv_app.cola_escritura.close_old_connections', close_old_connections):
+            with self.assertRaisesMessage(RuntimeError, 'Conexión perdida'):
+                cola_escritura.ejecutar(Categoria.objects.create, nombre='Primera')
+            self.assertEqual(cola_escritura.ejecutar(lambda: 'ok'), 'ok')
+        self.assertFalse(Categoria.objects.exists())
+
+    @override_settings(TPV_COLA_ESCRITURA_ESPERA=0.2)
+    def test_espera_acotada_cancela_la_escritura_pendiente(self):
+        empezada, liberar = threading.Event(), threading.Event()
+
+        def escritura_lenta():
+            empezada.set()
+            liberar.wait(5)
+
+        def peticion_lenta():
+            try:
+                cola_escritura.ejecutar(escritura_lenta)
+            except TimeoutError:
+                pass  # También supera la espera: ya estaba en curso, no se cancela
+
+        ocupado = threading.Thread(target=peticion_lenta)
+        ocupado.start()
+        empezada.wait(5)
+        ejecutadas = []
+        try:
+            with self.assertRaises(TimeoutError):
+                cola_escritura.ejecutar(ejecutadas.append, 'pendiente')
+        finally:
+            liberar.set()
+            ocupado.join()
+        self.assertEqual(cola_escritura.ejecutar(lambda: 'ok'), 'ok')
+        self.assertEqual(ejecutadas, [])  # Cancelada antes de empezar: no se ejecuta después
+
+    @override_settings(TPV_COLA_ESCRITURA=False)
+    def test_desactivada_ejecuta_en_linea(self):
+        self.assertEqual(cola_escritura.ejecutar(threading.current_thread), threading.current_thread())
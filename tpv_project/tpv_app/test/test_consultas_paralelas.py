@@ -0,0 +1,46 @@
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from tpv_app import consultas_paralelas
+from tpv_app.graficos import datos_graficos
+from tpv_app.models import Producto
+
+
+class ConsultasParalelasTests(TransactionTestCase):
+    """Tests para la ejecución en paralelo de las consultas de informes."""
+
+    def setUp(self):
+        Producto.objects.create(nombre='Café', precio=Decimal('1.20'))
+        Producto.objects.create(nombre='Té', precio=Decimal('1.10'))
+
+    def _tarea(self):
+        return threading.current_thread().name, Producto.objects.count()
+
+    @override_settings(TPV_INFORMES_HILOS=4)
+    def test_ejecuta_en_hilos_del_pool(self):
+        resultado = consultas_paralelas.ejecutar({'a': self._tarea, 'b': self._tarea})
+        self.assertEqual(set(resultado), {'a', 'b'})
+        for hilo, productos in resultado.values():
+            self.assertTrue(hilo.startswith('tpv-informes'))
+            self.assertEqual(productos, 2)
+
+    @override_settings(TPV_INFORMES_HILOS=4)
+    def test_en_transaccion_usa_el_hilo_actual(self):
+        with transaction.atomic():
+            Producto.objects.create(nombre='Zumo', precio=Decimal('2.00'))
+            resultado = consultas_paralelas.ejecutar({'a': self._tarea, 'b': self._tarea})
+        self.assertEqual(resultado['a'], (threading.current_thread().name, 3))
+
+    def test_sin_hilos_se_ejecuta_en_serie(self):
+        self.assertEqual(settings.TPV_INFORMES_HILOS, 1)  # Valor por defecto con SQLite
+        resultado = consultas_paralelas.ejecutar({'a': self._tarea, 'b': self._tarea})
+        self.assertEqual(resultado['b'][0], threading.current_thread().name)
+
+    def test_datos_de_varios_graficos(self):
+        datos = datos_graficos(['productos', 'clientes', 'servicios'])
+        self.assertEqual(set(datos), {'productos', 'clientes', 'servicios'})
+        self.assertEqual(datos['servicios'], {'labels': [], 'values': []})
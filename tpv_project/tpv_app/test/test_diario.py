@@ -0,0 +1,106 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tpv_app import diario, graficos
+from tpv_app.models import DiarioVenta, MarcaDiario, Servicio, Usuario, Venta, recalcular_contadores_servicio
+
+
+@override_settings(TPV_AGREGACION_DIFERIDA=True)
+class DiarioVentasTests(TestCase):
+    """Tests para el modo de agregación diferida."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username="testuser", nombre="Test", apellido="User", password="x")
+        cls.servicio = Servicio.objects.create(nombre="Turno", fecha_inicio=timezone.now(), estado="abierto")
+
+    def test_venta_solo_escribe_el_diario(self):
+        Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=Decimal("4.00"))
+
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 0)
+        self.assertEqual(DiarioVenta.objects.count(), 1)
+        self.assertEqual(diario.retraso()['contadores_servicio']['pendientes'], 1)
+
+    def test_aplicador_es_idempotente(self):
+        venta = Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=Decimal("4.00"))
+        Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=Decimal("6.00"))
+        venta.delete()
+
+        self.assertEqual(diario.aplicar_pendientes(), 3)
+        self.assertEqual(diario.aplicar_pendientes(), 0)  # Repetir tras una caída no duplica nada
+
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 1)
+        self.assertEqual(self.servicio.total_ingresos, Decimal("6.00"))
+        self.assertEqual(diario.retraso()['contadores_servicio']['pendientes'], 0)
+        self.assertEqual(DiarioVenta.objects.count(), 3)  # El diario no se modifica
+
+    def test_registro_confirmado_tarde_no_se_pierde(self):
+        """Un id menor que se hace visible después de aplicar uno mayor se aplica en la pasada siguiente."""
+        DiarioVenta.objects.create(id=1, id_servicio=self.servicio.pk, tickets=1, ingresos=Decimal("1.00"))
+        DiarioVenta.objects.create(id=3, id_servicio=self.servicio.pk, tickets=1, ingresos=Decimal("3.00"))
+        self.assertEqual(diario.aplicar_pendientes(), 2)
+        self.assertEqual(MarcaDiario.objects.get(nombre='contadores_servicio').huecos.keys(), {'2'})
+
+        DiarioVenta.objects.create(id=2, id_servicio=self.servicio.pk, tickets=1, ingresos=Decimal("2.00"))
+        self.assertEqual(diario.retraso()['contadores_servicio']['pendientes'], 1)
+        self.assertEqual(diario.aplicar_pendientes(), 1)
+
+        self.servicio.refresh_from_db()
+        self.assertEqual((self.servicio.cantidad_tickets, self.servicio.total_ingresos), (3, Decimal("6.00")))
+        self.assertEqual(MarcaDiario.objects.get(nombre='contadores_servicio').huecos, {})
+
+    def test_recalcular_un_servicio_no_salta_los_demas(self):
+        otro = Servicio.objects.create(nombre="Anterior", fecha_inicio=timezone.now(), estado="cerrado")
+        Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=Decimal("4.00"))
+        Venta.objects.create(id_usuario=self.usuario, id_servicio=otro, total=Decimal("7.00"))
+
+        recalcular_contadores_servicio([self.servicio.pk])
+        # Solo se recalcula (y se da por aplicado) el servicio pedido: el otro sigue pendiente
+        otro.refresh_from_db()
+        self.assertEqual(otro.cantidad_tickets, 0)
+        self.assertEqual(diario.retraso()['contadores_servicio']['pendientes'], 1)
+        self.assertEqual(diario.aplicar_pendientes(), 1)
+        self.assertEqual(diario.aplicar_pendientes(), 0)
+
+        self.servicio.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual((self.servicio.cantidad_tickets, self.servicio.total_ingresos), (1, Decimal("4.00")))
+        self.assertEqual((otro.cantidad_tickets, otro.total_ingresos), (1, Decimal("7.00")))
+        marca = MarcaDiario.objects.get(nombre='contadores_servicio')
+        self.assertEqual((marca.huecos, marca.adelantados), ({}, []))
+
+    def test_recalcular_un_servicio_aplica_sus_huecos(self):
+        otro = Servicio.objects.create(nombre="Anterior", fecha_inicio=timezone.now(), estado="cerrado")
+        DiarioVenta.objects.create(id=3, id_servicio=otro.pk, tickets=1, ingresos=Decimal("3.00"))
+        diario.aplicar_pendientes()
+        # El id 2 se confirma tarde (hueco) en el servicio abierto, que luego se recalcula
+        Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=Decimal("2.00"))
+        DiarioVenta.objects.filter(id_venta__isnull=False).update(id=2)
+
+        recalcular_contadores_servicio([self.servicio.pk])
+
+        self.assertEqual(diario.retraso()['contadores_servicio']['pendientes'], 0)
+        self.assertEqual(MarcaDiario.objects.get(nombre='contadores_servicio').huecos.keys(), {'1'})  # Id no usado
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 1)
+
+    def test_aplicar_invalida_el_grafico_de_servicios(self):
+        Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=Decimal("4.00"))
+        self.assertEqual(graficos.datos_grafico('servicios')['values'], [])  # Contadores aún sin aplicar
+
+        diario.aplicar_pendientes()
+        self.assertEqual(graficos.datos_grafico('servicios')['values'], [1])
+
+    def test_comando_aplicar_diario(self):
+        Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=Decimal("2.50"))
+        salida = StringIO()
+        call_command("aplicar_diario", stdout=salida)
+        self.assertIn("Registros aplicados: 1", salida.getvalue())
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.total_ingresos, Decimal("2.50"))
@@ -0,0 +1,129 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from tpv_app import intervalos
+from tpv_app.models import Usuario, Producto, Servicio, Categoria, Venta, DetalleVenta
+from tpv_app.ventas import registrar_lote, registrar_venta
+
+
+class VentasIntervalosApiTests(TestCase):
+    """Tests para la API de ventas agrupadas por intervalos de tiempo."""
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.bebidas = Categoria.objects.create(nombre='Bebidas')
+        self.cafe = Producto.objects.create(nombre='Café', precio=Decimal('1.20'), id_categoria=self.bebidas)
+        self.bocadillo = Producto.objects.create(nombre='Bocadillo', precio=Decimal('3.50'))
+        self.servicio = Servicio.objects.create(nombre='Hoy', estado='abierto', fecha_inicio=timezone.now() - timedelta(days=3))
+
+        self.hoy = timezone.localdate()
+        registrar_venta(self.user, self.servicio, None, [self.cafe.id_producto, self.bocadillo.id_producto], [2, 1])
+        ayer = registrar_venta(self.user, self.servicio, None, [self.cafe.id_producto], [1])
+        Venta.objects.filter(pk=ayer.pk).update(fecha=ayer.fecha - timedelta(days=1))
+        self.client.login(username='testuser', password='testpassword')
+
+    def _get(self, **parametros):
+        response = self.client.get(reverse('ventas_intervalos_api'), parametros)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ventas_por_dia_y_filtros(self):
+        datos = self._get(agrupacion='dia')
+        self.assertEqual(datos['campos'], ['inicio', 'tickets', 'unidades', 'ingresos'])
+        self.assertEqual([fila[1:] for fila in datos['filas']], [[1, 1, '1.20'], [1, 3, '5.90']])
+
+        datos = self._get(agrupacion='dia', categoria=self.bebidas.id_categoria)
+        self.assertEqual([fila[1:] for fila in datos['filas']], [[1, 1, '1.20'], [1, 2, '2.40']])
+
+        datos = self._get(agrupacion='semana', desde=self.hoy.isoformat(), producto=self.bocadillo.id_producto)
+        self.assertEqual([fila[1:] for fila in datos['filas']], [[1, 1, '3.50']])
+
+    def test_mapa_de_calor(self):
+        datos = self._get(agrupacion='mapa')
+        self.assertEqual(datos['campos'], ['dia_semana', 'hora', 'tickets', 'unidades', 'ingresos'])
+        self.assertEqual(sum(fila[2] for fila in datos['filas']), 2)
+        self.assertIn(self.hoy.isoweekday(), [fila[0] for fila in datos['filas']])
+
+    def test_dias_pasados_cacheados_e_invalidados(self):
+        self._get(agrupacion='dia')
+        with self.assertNumQueries(4):  # Sesión, usuario y el día de hoy (tablas y archivo): los días pasados salen de la caché
+            self._get(agrupacion='dia')
+
+        # Un lote con un ticket de ayer invalida los resultados cacheados
+        fecha = (timezone.now() - timedelta(days=1)).isoformat()
+        registrar_lote(self.user, [{'clave_idempotencia': 'lote-1', 'fecha': fecha,
+                                    'producto_ids': [self.cafe.id_producto], 'cantidades': [5]}])
+        datos = self._get(agrupacion='dia')
+        self.assertEqual([fila[1:] for fila in datos['filas']][0], [2, 6, '7.20'])
+
+    def test_cache_por_dia_terminado(self):
+        """Una venta de un día pasado solo invalida la parte cacheada de ese día."""
+        antes = registrar_venta(self.user, self.servicio, None, [self.bocadillo.id_producto], [1])
+        Venta.objects.filter(pk=antes.pk).update(fecha=antes.fecha - timedelta(days=2))
+        self._get(agrupacion='dia')
+        with self.assertNumQueries(4):  # Un rango distinto se compone con los mismos días cacheados
+            self._get(agrupacion='dia', desde=(self.hoy - timedelta(days=2)).isoformat())
+
+        intervalos.invalidar_si_historica(timezone.now() - timedelta(days=1))
+        with self.assertNumQueries(6):  # Sesión, usuario, ayer (invalidado) y hoy, cada uno en tablas y archivo; anteayer sigue en caché
+            datos = self._get(agrupacion='dia')
+        self.assertEqual([fila[1:] for fila in datos['filas']], [[1, 1, '3.50'], [1, 1, '1.20'], [1, 3, '5.90']])
+
+    def test_cache_por_categoria_sigue_al_catalogo(self):
+        """Con filtro de categoría, mover un producto de categoría invalida los días cacheados."""
+        datos = self._get(agrupacion='dia', categoria=self.bebidas.id_categoria)
+        self.assertEqual([fila[1:] for fila in datos['filas']], [[1, 1, '1.20'], [1, 2, '2.40']])
+
+        self.cafe.id_categoria = Categoria.objects.create(nombre='Cafés')
+        self.cafe.save()
+        datos = self._get(agrupacion='dia', categoria=self.bebidas.id_categoria)
+        self.assertEqual(datos['filas'], [])
+
+    def test_parametros_invalidos(self):
+        response = self.client.get(reverse('ventas_intervalos_api'), {'agrupacion': 'mes'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+
+        response = self.client.get(reverse('ventas_intervalos_api'), {'agrupacion': 'hora', 'desde': '2020-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DatosGraficoApiTests(TestCase):
+    """Tests para los datos de los gráficos de detalle_venta."""
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.cafe = Producto.objects.create(nombre='Café', precio=Decimal('1.20'))
+        self.servicio = Servicio.objects.create(nombre='Hoy', estado='abierto', fecha_inicio=timezone.now())
+        registrar_venta(self.user, self.servicio, None, [self.cafe.id_producto], [2])
+        self.client.login(username='testuser', password='testpassword')
+
+    def test_detalle_venta_no_calcula_los_graficos(self):
+        with self.assertNumQueries(4):  # Sesión, usuario, página de detalles y su total aproximado
+            response = self.client.get(reverse('detalle_venta'))
+        self.assertContains(response, reverse('datos_graficos_api'))
+
+    def test_datos_cacheados_hasta_la_siguiente_venta(self):
+        url = reverse('datos_grafico_api', args=['productos'])
+        self.assertEqual(self.client.get(url).json(), {'labels': ['Café'], 'values': [2]})
+        with self.assertNumQueries(2):  # Sesión y usuario: los datos salen de la caché
+            self.client.get(url)
+
+        registrar_venta(self.user, self.servicio, None, [self.cafe.id_producto], [1])
+        self.assertEqual(self.client.get(url).json()['values'], [3])
+
+    def test_borrar_una_linea_invalida_los_graficos(self):
+        url = reverse('datos_grafico_api', args=['productos'])
+        otra = registrar_venta(self.user, self.servicio, None, [self.cafe.id_producto], [1])
+        self.assertEqual(self.client.get(url).json()['values'], [3])
+
+        DetalleVenta.objects.get(id_venta=otra).delete()
+        self.assertEqual(self.client.get(url).json()['values'], [2])
+
+    def test_grafico_desconocido(self):
+        response = self.client.get(reverse('datos_grafico_api', args=['proveedores']))
+        self.assertEqual(response.status_code, 404)
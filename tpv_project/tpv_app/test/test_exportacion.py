@@ -0,0 +1,77 @@
+import csv
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from tpv_app import exportacion
+from tpv_app.models import Usuario, Cliente, Producto, Servicio, Categoria
+from tpv_app.ventas import registrar_venta
+
+
+class ExportacionTests(TestCase):
+    """Tests para la exportación en streaming de ventas y líneas."""
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        categoria = Categoria.objects.create(nombre='Bebidas')
+        self.cafe = Producto.objects.create(nombre='Café', precio=Decimal('1.20'), id_categoria=categoria)
+        self.te = Producto.objects.create(nombre='Té', precio=Decimal('1.10'), id_categoria=categoria)
+        self.cliente = Cliente.objects.create(nombre_empresa='Bar Pepe', nif_cif='B1234567')
+        self.servicio = Servicio.objects.create(nombre='Mañana', estado='abierto', fecha_inicio=timezone.now())
+        self.venta = registrar_venta(self.user, self.servicio, self.cliente, [self.cafe.id_producto, self.te.id_producto], [2, 1])
+        self.client.login(username='testuser', password='testpassword')
+
+    def _contenido(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_exportar_lineas_csv(self):
+        response = self.client.get(reverse('exportar_lineas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+
+        filas = list(csv.DictReader(StringIO(self._contenido(response))))
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[0]['producto'], 'Café')
+        self.assertEqual(filas[0]['cliente'], 'Bar Pepe')
+        self.assertEqual(filas[0]['servicio'], 'Mañana')
+        self.assertEqual(filas[0]['usuario'], 'testuser')
+        self.assertEqual(filas[0]['subtotal'], '2.40')
+
+    def test_exportar_ventas_jsonl_con_filtros(self):
+        hoy = timezone.localdate().isoformat()
+        response = self.client.get(reverse('exportar_ventas'), {'formato': 'jsonl', 'desde': hoy, 'hasta': hoy})
+        filas = [json.loads(linea) for linea in self._contenido(response).splitlines()]
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['id_venta'], self.venta.id_venta)
+        self.assertEqual(filas[0]['total'], '3.50')
+
+        response = self.client.get(reverse('exportar_ventas'), {'formato': 'jsonl', 'servicio': self.servicio.id_servicio + 1})
+        self.assertEqual(self._contenido(response), '')
+
+    def test_parametros_invalidos(self):
+        response = self.client.get(reverse('exportar_ventas'), {'desde': '2024-13-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+
+        response = self.client.get(reverse('exportar_ventas'), {'formato': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_recorrido_por_lotes(self):
+        for _ in range(4):
+            registrar_venta(self.user, self.servicio, None, [self.cafe.id_producto], [1])
+        with mock.patch.object(exportacion, 'TAMANO_LOTE_EXPORTACION', 2):
+            ids = [fila['id_venta'] for fila in exportacion.filas_ventas({})]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_comando_exportar_ventas(self):
+        salida = StringIO()
+        call_command('exportar_ventas', '--lineas', '--formato', 'jsonl', stdout=salida)
+        self.assertEqual(len(salida.getvalue().splitlines()), 2)
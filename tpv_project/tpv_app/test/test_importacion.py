@@ -0,0 +1,157 @@
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from tpv_app import cola_escritura
+from tpv_app.catalogo import obtener_catalogo
+from tpv_app.importacion import ReglaPrecio, actualizar_precios, importar_productos, leer_filas
+from tpv_app.models import Categoria, Producto, Usuario, VersionCatalogo
+
+
+class ImportacionProductosTests(TestCase):
+    """Tests para la importación de productos y las reglas de precios."""
+
+    def setUp(self):
+        self.bebidas = Categoria.objects.create(nombre='Bebidas')
+        self.comida = Categoria.objects.create(nombre='Comida')
+        self.cafe = Producto.objects.create(referencia='CAF-1', nombre='Café', precio=Decimal('1.20'), id_categoria=self.bebidas)
+        self.tostada = Producto.objects.create(referencia='TOS-1', nombre='Tostada', precio=Decimal('2.00'), id_categoria=self.comida)
+
+    def _csv(self, texto):
+        return leer_filas(io.StringIO(texto), 'csv')
+
+    def test_upsert_por_referencia(self):
+        version = VersionCatalogo.objects.get(pk=1).version
+        resultado = importar_productos(self._csv(
+            "referencia;nombre;precio;categoria\n"
+            "CAF-1;;1,30;\n"  # Solo cambia el precio
+            "TOS-1;Tostada;2.00;comida\n"  # Sin cambios
+            "ZUM-1;Zumo;2.50;Bebidas\n"
+        ))
+
+        self.assertEqual((resultado.creados, resultado.modificados, resultado.sin_cambios), (1, 1, 1))
+        self.assertEqual(resultado.lotes, 1)
+        self.cafe.refresh_from_db()
+        self.assertEqual((self.cafe.nombre, self.cafe.precio), ('Café', Decimal('1.30')))
+        zumo = Producto.objects.get(referencia='ZUM-1')
+        self.assertEqual(zumo.id_categoria, self.bebidas)
+        # Una sola versión del catálogo para todo el lote
+        self.assertEqual(VersionCatalogo.objects.get(pk=1).version, version + 1)
+        self.assertEqual({self.cafe.version, zumo.version}, {version + 1})
+        self.assertEqual(obtener_catalogo().productos[zumo.id_producto].precio, Decimal('2.50'))
+
+    def _editar_antes_de_escribir(self, referencia, **campos):
+        """Simula una edición hecha por otra petición mientras el lote esperaba turno en la cola."""
+        ejecutar = cola_escritura.ejecutar
+
+        def editar_y_ejecutar(funcion, *args):
+            Producto.objects.filter(referencia=referencia).update(**campos)
+            return ejecutar(funcion, *args)
+        return mock.patch('tpv_app.importacion.cola_escritura.ejecutar', side_effect=editar_y_ejecutar)
+
+    def test_importacion_no_pisa_ediciones_concurrentes(self):
+        with self._editar_antes_de_escribir('CAF-1', precio=Decimal('1.99')):
+            importar_productos(self._csv("referencia,nombre,precio\nCAF-1,Café solo,\nTOS-1,,2.10\n"))
+
+        self.cafe.refresh_from_db()
+        # Solo se escribe el nombre del café: el precio editado mientras tanto se conserva
+        self.assertEqual((self.cafe.nombre, self.cafe.precio), ('Café solo', Decimal('1.99')))
+        self.assertEqual(Producto.objects.get(referencia='TOS-1').precio, Decimal('2.10'))
+
+    def test_regla_se_aplica_sobre_el_precio_actual(self):
+        with self._editar_antes_de_escribir('TOS-1', precio=Decimal('3.00')):
+            actualizar_precios(ReglaPrecio(Decimal('10'), categorias=(self.comida.pk,)))
+        self.assertEqual(Producto.objects.get(referencia='TOS-1').precio, Decimal('3.30'))
+
+        with self._editar_antes_de_escribir('TOS-1', activo=False):
+            actualizar_precios(ReglaPrecio(Decimal('10'), categorias=(self.comida.pk,)))
+        self.assertEqual(Producto.objects.get(referencia='TOS-1').precio, Decimal('3.30'))  # Ya no cumple el filtro
+
+    def test_simulacion_y_errores(self):
+        cambios = []
+        resultado = importar_productos(leer_filas(io.StringIO(
+            '{"referencia": "CAF-1", "precio": "1.25"}\n'
+            '{"referencia": "NUE-1", "nombre": "Sin precio"}\n'
+            '{"referencia": "NUE-2", "nombre": "Bollo", "precio": "1", "categoria": "Panadería"}\n'
+            'no es json\n'
+            '{"referencia": "CAF-1", "precio": "1.40"}\n'
+        ), 'jsonl'), simular=True, informar=cambios.append)
+
+        self.assertEqual(resultado.modificados, 1)
+        self.assertEqual(resultado.lotes, 0)
+        self.assertEqual([e.linea for e in resultado.errores], [2, 3, 4, 5])
+        self.assertEqual(cambios[0].campos, {'precio': (Decimal('1.20'), Decimal('1.25'))})
+        self.cafe.refresh_from_db()
+        self.assertEqual(self.cafe.precio, Decimal('1.20'))
+        self.assertFalse(Producto.objects.filter(referencia__startswith='NUE').exists())
+
+    def test_regla_de_precios_por_categoria(self):
+        Producto.objects.create(referencia='TE-1', nombre='Té', precio=Decimal('1.10'), id_categoria=self.bebidas)
+        version = VersionCatalogo.objects.get(pk=1).version
+
+        resultado = actualizar_precios(ReglaPrecio(Decimal('3'), Decimal('0.05'), categorias=(self.bebidas.pk,)), tamano_lote=1)
+
+        # 1.20 * 1.03 = 1.236 -> 1.25; 1.10 * 1.03 = 1.133 -> 1.15
+        self.assertEqual(dict(Producto.objects.values_list('referencia', 'precio')),
+                         {'CAF-1': Decimal('1.25'), 'TE-1': Decimal('1.15'), 'TOS-1': Decimal('2.00')})
+        self.assertEqual((resultado.modificados, resultado.lotes), (2, 2))
+        self.assertEqual(VersionCatalogo.objects.get(pk=1).version, version + 2)
+
+    def test_regla_fuera_de_rango(self):
+        for porcentaje in ('1e9', 'Infinity', 'NaN'):
+            with self.assertRaises(ValidationError):
+                ReglaPrecio(Decimal(porcentaje))
+        with self.assertRaises(ValidationError):
+            ReglaPrecio(Decimal('3'), Decimal('1e-30'))
+
+        # Un precio que no cabe en Producto.precio es un error de ese producto, no de toda la regla
+        Producto.objects.create(referencia='JAM-1', nombre='Jamón', precio=Decimal('500.00'), id_categoria=self.comida)
+        resultado = actualizar_precios(ReglaPrecio(Decimal('99999999')), tamano_lote=1)
+        self.assertEqual([error.referencia for error in resultado.errores], ['JAM-1'])
+        self.assertEqual(resultado.modificados, 2)
+        self.assertEqual(Producto.objects.get(referencia='JAM-1').precio, Decimal('500.00'))
+        self.assertEqual(Producto.objects.get(referencia='CAF-1').precio, Decimal('1200001.19'))  # 1.20 * 1000000.99
+
+    def test_comando_simular(self):
+        salida = io.StringIO()
+        call_command('actualizar_precios', '--porcentaje', '-10', '--categoria', 'comida', '--simular', stdout=salida)
+        self.assertIn('~ TOS-1: precio: 2.00 -> 1.80', salida.getvalue())
+        self.tostada.refresh_from_db()
+        self.assertEqual(self.tostada.precio, Decimal('2.00'))
+
+
+class ImportacionProductosViewsTests(TestCase):
+
+    def setUp(self):
+        Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        Producto.objects.create(referencia='CAF-1', nombre='Café', precio=Decimal('1.20'))
+
+    def test_importar_fichero(self):
+        fichero = SimpleUploadedFile('productos.csv', 'referencia,precio\nCAF-1,1.35\n'.encode('utf-8'))
+        respuesta = self.client.post(reverse('importar_productos_api'), {'fichero': fichero})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['cambios'][0]['campos'], {'precio': ['1.20', '1.35']})
+        self.assertEqual(Producto.objects.get(referencia='CAF-1').precio, Decimal('1.35'))
+
+    def test_regla_no_valida(self):
+        respuesta = self.client.post(reverse('actualizar_precios_api'), {'porcentaje': '-100'}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(respuesta.json()['success'])
+
+    def test_regla_no_finita(self):
+        respuesta = self.client.post(reverse('actualizar_precios_api'), '{"porcentaje": Infinity}', content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Producto.objects.get(referencia='CAF-1').precio, Decimal('1.20'))
+
+    def test_simular_regla(self):
+        respuesta = self.client.post(reverse('actualizar_precios_api'), {'porcentaje': 10, 'simular': True},
+                                     content_type='application/json')
+        self.assertEqual(respuesta.json()['modificados'], 1)
+        self.assertEqual(Producto.objects.get(referencia='CAF-1').precio, Decimal('1.20'))
@@ -0,0 +1,74 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tpv_app import metricas
+from tpv_app.models import Usuario
+
+
+@override_settings(TPV_METRICAS_TOKEN='secreto', TPV_METRICAS_IPS=())
+class MetricasTests(TestCase):
+    """Tests para el middleware de métricas por ruta y el endpoint /metrics."""
+
+    def setUp(self):
+        metricas.registro.limpiar()
+        Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+    def _metricas(self, **cabeceras):
+        cabeceras.setdefault('HTTP_AUTHORIZATION', 'Bearer secreto')
+        return self.client.get(reverse('metricas_prometheus'), **cabeceras)
+
+    def test_metricas_por_ruta(self):
+        self.client.get(reverse('catalogo_api'))
+        self.client.get(reverse('catalogo_api'))
+        self.client.get('/tpv/no-existe/')
+
+        respuesta = self._metricas()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = respuesta.content.decode()
+        self.assertIn('tpv_peticion_segundos_count{ruta="catalogo_api"} 2', texto)
+        self.assertIn('tpv_peticion_segundos_bucket{ruta="catalogo_api",le="+Inf"} 2', texto)
+        self.assertIn('tpv_peticiones_total{ruta="catalogo_api",codigo="2xx"} 2', texto)
+        self.assertIn('tpv_peticiones_total{ruta="sin_ruta",codigo="4xx"} 1', texto)
+        self.assertIn('tpv_sql_segundos_total{ruta="catalogo_api"}', texto)
+        self.assertIn('tpv_respuesta_bytes_total{ruta="catalogo_api"}', texto)
+        self.assertIn('# TYPE tpv_diario_pendientes gauge', texto)
+
+    def test_histograma_de_consultas(self):
+        histograma = metricas._Histograma(metricas.LIMITES_CONSULTAS)
+        for consultas in (0, 1, 3, 500):
+            histograma.observar(consultas)
+        lineas = []
+        metricas._histogramas(lineas, 'h', 'Prueba.', [('r', histograma)])
+        self.assertIn('h_bucket{ruta="r",le="1.0"} 2', lineas)
+        self.assertIn('h_bucket{ruta="r",le="5.0"} 3', lineas)
+        self.assertIn('h_bucket{ruta="r",le="200.0"} 3', lineas)
+        self.assertIn('h_bucket{ruta="r",le="+Inf"} 4', lineas)
+        self.assertIn('h_sum{ruta="r"} 504.0', lineas)
+
+    @override_settings(TPV_PRESUPUESTOS_RUTA={'catalogo_api': {'consultas': 0}})
+    def test_aviso_al_superar_el_presupuesto(self):
+        with self.assertLogs('tpv_app.metricas', level='WARNING') as avisos:
+            self.client.get(reverse('catalogo_api'))
+        self.assertIn('catalogo_api', avisos.output[0])
+        self.assertIn('consultas=', avisos.output[0])
+
+    def test_acceso_restringido(self):
+        # Sin IPs configuradas solo vale el token, también desde 127.0.0.1 (p. ej. un proxy local)
+        self.assertEqual(self._metricas(HTTP_AUTHORIZATION='').status_code, 403)
+        self.assertEqual(self._metricas(HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+        self.assertEqual(self._metricas(REMOTE_ADDR='10.0.0.5').status_code, 200)
+        with override_settings(TPV_METRICAS_IPS=('10.0.0.5',)):
+            self.assertEqual(self._metricas(REMOTE_ADDR='10.0.0.5', HTTP_AUTHORIZATION='').status_code, 200)
+            self.assertEqual(self._metricas(REMOTE_ADDR='10.0.0.6', HTTP_AUTHORIZATION='').status_code, 403)
+
+    def test_respuesta_en_streaming_se_mide_al_terminar_el_envio(self):
+        respuesta = self.client.get(reverse('exportar_ventas'))
+        self.assertNotIn('ruta="exportar_ventas"', self._metricas().content.decode())  # Cuerpo aún sin generar
+
+        cuerpo = b''.join(respuesta.streaming_content)
+        texto = self._metricas().content.decode()
+        self.assertIn('tpv_peticion_consultas_sql_count{ruta="exportar_ventas"} 1', texto)
+        self.assertNotIn('tpv_peticion_consultas_sql_sum{ruta="exportar_ventas"} 0', texto)  # Consultas del cuerpo
+        self.assertIn(f'tpv_respuesta_bytes_total{{ruta="exportar_ventas"}} {len(cuerpo)}', texto)
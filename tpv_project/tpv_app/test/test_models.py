@@ -1,3 +1,8 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.test import TestCase
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -72,6 +77,23 @@ class ServicioModelTests(TestCase):
         self.assertEqual(servicio.estado, "abierto")
         self.assertEqual(str(servicio), "Servicio Test")
 
+    def test_abrir_servicio_cierra_el_anterior(self):
+        anterior = Servicio.objects.create(nombre="Mañana", fecha_inicio=timezone.now(), estado="abierto")
+        nuevo = Servicio.objects.create(nombre="Tarde", fecha_inicio=timezone.now(), estado="abierto")
+        anterior.refresh_from_db()
+        self.assertEqual(anterior.estado, "cerrado")
+        self.assertIsNotNone(anterior.fecha_fin)
+
+        nuevo.save()  # Guardar el servicio abierto no lo cierra a sí mismo
+        self.assertEqual(Servicio.objects.filter(estado="abierto").get(), nuevo)
+
+    def test_base_de_datos_impide_dos_servicios_abiertos(self):
+        with self.assertRaises(IntegrityError):
+            Servicio.objects.bulk_create([
+                Servicio(nombre="A", fecha_inicio=timezone.now(), estado="abierto"),
+                Servicio(nombre="B", fecha_inicio=timezone.now(), estado="abierto"),
+            ])
+
 
 class VentaModelTests(TestCase):
     @classmethod
@@ -150,3 +172,81 @@ class DetalleVentaModelTests(TestCase):
                 id_producto=self.producto,
                 cantidad=1
             )
+
+
+class ServicioContadoresTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username="testuser",
+            nombre="Test",
+            apellido="User",
+            password="securepassword"
+        )
+        cls.servicio = Servicio.objects.create(
+            nombre="Servicio Abierto",
+            fecha_inicio=timezone.now(),
+            estado="abierto"
+        )
+
+    def crear_venta(self, total):
+        return Venta.objects.create(id_usuario=self.usuario, id_servicio=self.servicio, total=total)
+
+    def test_contadores_al_crear_modificar_y_eliminar(self):
+        venta = self.crear_venta(Decimal("10.00"))
+        self.crear_venta(Decimal("5.50"))
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 2)
+        self.assertEqual(self.servicio.total_ingresos, Decimal("15.50"))
+        self.assertEqual(self.servicio.estado, "abierto")
+
+        venta = Venta.objects.get(pk=venta.pk)
+        venta.total = Decimal("12.00")
+        venta.save(update_fields=['total'])
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 2)
+        self.assertEqual(self.servicio.total_ingresos, Decimal("17.50"))
+
+        venta.delete()
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 1)
+        self.assertEqual(self.servicio.total_ingresos, Decimal("5.50"))
+
+    def test_guardar_servicio_no_pisa_contadores(self):
+        servicio = Servicio.objects.get(pk=self.servicio.pk)
+        self.crear_venta(Decimal("8.00"))
+        servicio.nombre = "Renombrado"
+        servicio.save()
+        servicio.refresh_from_db()
+        self.assertEqual(servicio.cantidad_tickets, 1)
+        self.assertEqual(servicio.total_ingresos, Decimal("8.00"))
+
+    def test_comando_recalcular_servicios(self):
+        self.crear_venta(Decimal("3.00"))
+        self.crear_venta(Decimal("4.00"))
+        Servicio.objects.update(cantidad_tickets=99, total_ingresos=0)
+
+        salida = StringIO()
+        call_command("recalcular_servicios", stdout=salida)
+
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 2)
+        self.assertEqual(self.servicio.total_ingresos, Decimal("7.00"))
+        self.assertIn("1", salida.getvalue())
+
+
+class ServicioAbiertoCacheTests(TestCase):
+    def test_servicio_abierto_se_cachea_e_invalida(self):
+        from tpv_app.caches import servicio_abierto
+
+        self.assertIsNone(servicio_abierto())
+        servicio = Servicio.objects.create(nombre="Turno", fecha_inicio=timezone.now(), estado="abierto")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(servicio_abierto(), servicio)
+        with self.assertNumQueries(0):
+            self.assertEqual(servicio_abierto(), servicio)
+
+        servicio.estado = "cerrado"
+        servicio.save()
+        self.assertIsNone(servicio_abierto())
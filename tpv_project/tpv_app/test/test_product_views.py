@@ -1,5 +1,10 @@
+from unittest import mock
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
 from django.test import TestCase
 from django.urls import reverse
+from tpv_app import busqueda
 from tpv_app.models import Producto, Categoria, Usuario
 from django.contrib.messages import get_messages
 
@@ -24,6 +29,17 @@ class ProductoViewsTestCase(TestCase):
         self.assertContains(response, 'Laptop')  # Verifica que el producto aparece
         self.assertContains(response, 'Electrónica')  # Verifica que la categoría aparece
 
+    def test_listado_cacheado_por_version_del_catalogo(self):
+        """Las filas del listado se sirven desde la caché mientras no cambie la versión del catálogo."""
+        self.client.login(username='testuser', password='testpassword')
+        version = self.client.get(reverse('productos')).context['version_datos']
+        fragmento = cache.get(make_template_fragment_key('productos_filas', [version, 1, '']))
+        self.assertIn('Laptop', fragmento)
+
+        self.producto.nombre = 'Portátil'
+        self.producto.save()
+        self.assertContains(self.client.get(reverse('productos')), 'Portátil')
+
     def test_crear_producto(self):
         """Test para verificar que un producto puede ser creado correctamente."""
         self.client.login(username='testuser', password='testpassword')
@@ -84,3 +100,65 @@ class ProductoViewsTestCase(TestCase):
         self.assertRedirects(response, reverse('productos'))
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(str(messages[0]), 'Producto actualizado exitosamente.')
+
+
+class BusquedaProductosTests(TestCase):
+    """Tests para la búsqueda de productos (índice FTS5 en SQLite)."""
+
+    def setUp(self):
+        Usuario.objects.create_user(username='testuser', nombre='Test', apellido='User', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.leche = Producto.objects.create(nombre='Leche fría', precio=1.5)
+        self.cafe = Producto.objects.create(nombre='Café con leche', precio=1.4)
+        self.te = Producto.objects.create(nombre='Té verde', precio=1.2)
+
+    def _nombres(self, q):
+        respuesta = self.client.get(reverse('buscar_productos_api'), {'q': q})
+        return [producto['nombre'] for producto in respuesta.json()['productos']]
+
+    def test_subcadena_sin_tildes_y_ordenada(self):
+        self.assertEqual(self._nombres('LECHE'), ['Leche fría', 'Café con leche'])
+        self.assertEqual(self._nombres('cafe'), ['Café con leche'])
+        self.assertEqual(self._nombres('erd'), ['Té verde'])
+        self.assertEqual(self._nombres('leche caf'), ['Café con leche'])
+
+    def test_indice_sigue_las_escrituras(self):
+        self.te.nombre = 'Té rojo'
+        self.te.save()
+        self.assertEqual(self._nombres('verde'), [])
+        self.assertEqual(self._nombres('rojo'), ['Té rojo'])
+        self.leche.activo = False
+        self.leche.save()
+        self.assertEqual(self._nombres('leche'), ['Café con leche'])
+
+    def test_listar_productos_con_busqueda(self):
+        respuesta = self.client.get(reverse('productos'), {'q': 'te ve'})
+        self.assertContains(respuesta, 'Té verde')
+        self.assertNotContains(respuesta, 'Leche fría')
+
+    def test_sin_fts_busca_en_el_catalogo(self):
+        with mock.patch('tpv_app.busqueda._fts_disponible', return_value=False):
+            self.assertEqual(self._nombres('LECHE'), ['Leche fría', 'Café con leche'])
+            self.assertEqual(self._nombres('leche caf'), ['Café con leche'])
+
+    def test_nombres_normalizados_una_vez_por_instantanea(self):
+        with mock.patch('tpv_app.busqueda._fts_disponible', return_value=False), \
+                mock.patch('tpv_app.catalogo.normalizar', wraps=busqueda.normalizar) as normalizar:
+            self._nombres('leche')
+            self._nombres('verde')
+            self.assertEqual(normalizar.call_count, 3)  # Un nombre por producto activo
+            self.te.nombre = 'Té rojo'
+            self.te.save()  # Nueva versión del catálogo: nueva instantánea
+            self.assertEqual(self._nombres('rojo'), ['Té rojo'])
+            self.assertEqual(normalizar.call_count, 6)
+
+    def test_tabla_fts_se_comprueba_una_vez_por_conexion(self):
+        busqueda.olvidar_fts(connection)
+        with self.assertNumQueries(1):
+            self.assertTrue(busqueda._fts_disponible())
+        with self.assertNumQueries(0):
+            self.assertTrue(busqueda._fts_disponible())
+
+    def test_busqueda_demasiado_corta(self):
+        respuesta = self.client.get(reverse('buscar_productos_api'), {'q': 'l'})
+        self.assertEqual(respuesta.status_code, 400)
@@ -1,7 +1,11 @@
 from django.test import TestCase
 from django.urls import reverse
-from tpv_app.models import Servicio, Usuario
+from decimal import Decimal
+from django.utils import timezone
+from tpv_app.models import Servicio, Usuario, Categoria, Producto, InformeZ
+from tpv_app.ventas import registrar_venta
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 
 class ServicioViewsTestCase(TestCase):
 
@@ -63,3 +67,58 @@ class ServicioViewsTestCase(TestCase):
         self.assertRedirects(response, reverse('servicios'))  # Redirige a la lista de servicios
         # Verifica que no se hayan eliminado servicios
         self.assertEqual(Servicio.objects.count(), 1)
+
+
+class InformeZTestCase(TestCase):
+    """Tests para el informe Z generado al cerrar un servicio."""
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user(username='testuser', password='testpassword', nombre='Javier', apellido='Calderon')
+        bebidas = Categoria.objects.create(nombre='Bebidas')
+        cafe = Producto.objects.create(nombre='Café', precio=Decimal('1.20'), id_categoria=bebidas)
+        te = Producto.objects.create(nombre='Té', precio=Decimal('1.10'), id_categoria=bebidas)
+        bocadillo = Producto.objects.create(nombre='Bocadillo', precio=Decimal('3.50'))
+        self.servicio = Servicio.objects.create(nombre='Mañana', estado='abierto', fecha_inicio=timezone.now())
+        registrar_venta(self.user, self.servicio, None, [cafe.id_producto, bocadillo.id_producto], [2, 1])
+        registrar_venta(self.user, self.servicio, None, [te.id_producto], [1])
+        self.client.login(username='testuser', password='testpassword')
+
+    def test_cerrar_servicio_genera_informe_z(self):
+        servicio = Servicio.objects.get(pk=self.servicio.pk)
+        servicio.estado = 'cerrado'
+        servicio.save()
+
+        informe = InformeZ.objects.get(id_servicio=servicio)
+        self.assertEqual(informe.tickets, 2)
+        self.assertEqual(informe.unidades, 4)
+        self.assertEqual(str(informe.total), '7.00')
+        self.assertEqual(str(informe.ticket_medio), '3.50')
+        self.assertEqual(informe.desglose['productos'][0]['producto'], 'Bocadillo')
+        self.assertEqual([fila['categoria'] for fila in informe.desglose['categorias']], ['Bebidas', 'Sin categoría'])
+        self.assertEqual(informe.desglose['categorias'][0]['total'], '3.50')
+        self.assertEqual(informe.desglose['cajeros'][0]['tickets'], 2)
+        self.assertEqual(sum(fila['tickets'] for fila in informe.desglose['horas']), 2)
+
+        # Guardar de nuevo un servicio ya cerrado no genera otro informe, y el informe no se modifica
+        servicio.nombre = 'Mañana (revisado)'
+        servicio.save()
+        self.assertEqual(InformeZ.objects.count(), 1)
+        with self.assertRaises(ValidationError):
+            informe.save()
+
+    def test_abrir_otro_servicio_cierra_y_genera_informe(self):
+        Servicio.objects.create(nombre='Tarde', estado='abierto', fecha_inicio=timezone.now())
+        self.assertEqual(InformeZ.objects.get().id_servicio_id, self.servicio.pk)
+
+    def test_vista_informe_z(self):
+        response = self.client.get(reverse('informe_z', args=[self.servicio.pk]))
+        self.assertRedirects(response, reverse('servicios'))  # Servicio abierto: aún no hay informe
+
+        servicio = Servicio.objects.get(pk=self.servicio.pk)
+        servicio.estado = 'cerrado'
+        servicio.save()
+        with self.assertNumQueries(4):  # Sesión, usuario, servicio e informe: sin agregar ventas
+            response = self.client.get(reverse('informe_z', args=[self.servicio.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'informe_z.html')
+        self.assertContains(response, 'Bocadillo')
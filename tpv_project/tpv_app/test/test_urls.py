@@ -5,9 +5,17 @@ from tpv_app.views.auth_user_views import (
 )
 from tpv_app.views.home_views import home
 from tpv_app.views.category_views import listar_categorias, crear_categoria, editar_categoria, borrar_categoria
-from tpv_app.views.product_views import listar_productos, crear_producto, editar_producto, borrar_producto
-from tpv_app.views.service_views import listar_servicios, crear_servicio, editar_servicio, borrar_servicio
-from tpv_app.views.venta_views import crear_venta, detalle_venta
+from tpv_app.views.product_views import (
+    listar_productos, crear_producto, editar_producto, borrar_producto, importar_productos_api, actualizar_precios_api,
+    buscar_productos_api
+)
+from tpv_app.views.service_views import listar_servicios, crear_servicio, editar_servicio, borrar_servicio, informe_z
+from tpv_app.views.venta_views import crear_venta, crear_ventas_lote, detalle_venta
+from tpv_app.views.catalogo_views import catalogo_api, tarjetas_productos_api
+from tpv_app.views.clientes_views import buscar_clientes_api
+from tpv_app.views.metricas_views import metricas_prometheus
+from tpv_app.views.exportacion_views import exportar_ventas, exportar_lineas
+from tpv_app.views.estadisticas_views import ventas_intervalos_api, datos_grafico_api, datos_graficos_api
 
 
 # Test para la URL de la página de inicio de sesión
@@ -100,6 +108,12 @@ def test_url_borrar_servicio():
     assert resolve(path).func == borrar_servicio
 
 
+# Test para la URL que muestra el informe Z de un servicio
+def test_url_informe_z():
+    path = reverse('informe_z', kwargs={'id_servicio': 1})
+    assert resolve(path).func == informe_z
+
+
 # Test para la URL que lista todas las categorías
 def test_url_listar_categorias():
     path = reverse('categorias')
@@ -152,3 +166,78 @@ def test_url_borrar_producto():
 def test_url_detalle_venta():
     path = reverse('detalle_venta')
     assert resolve(path).func == detalle_venta
+
+
+# Test para la URL de los datos de cada gráfico de detalle_venta
+def test_url_datos_grafico_api():
+    path = reverse('datos_grafico_api', kwargs={'grafico': 'productos'})
+    assert resolve(path).func == datos_grafico_api
+
+
+# Test para la URL que devuelve los datos de varios gráficos a la vez
+def test_url_datos_graficos_api():
+    path = reverse('datos_graficos_api')
+    assert resolve(path).func == datos_graficos_api
+
+
+# Test para la URL que recibe lotes de ventas de las terminales
+def test_url_crear_ventas_lote():
+    path = reverse('crear_ventas_lote')
+    assert resolve(path).func == crear_ventas_lote
+
+
+# Test para la URL de la API de catálogo para terminales
+def test_url_catalogo_api():
+    path = reverse('catalogo_api')
+    assert resolve(path).func == catalogo_api
+
+
+# Tests para las URLs de exportación de ventas
+def test_url_exportar_ventas():
+    path = reverse('exportar_ventas')
+    assert resolve(path).func == exportar_ventas
+
+
+def test_url_exportar_lineas():
+    path = reverse('exportar_lineas')
+    assert resolve(path).func == exportar_lineas
+
+
+# Test para la URL de ventas agrupadas por intervalos de tiempo
+def test_url_ventas_intervalos_api():
+    path = reverse('ventas_intervalos_api')
+    assert resolve(path).func == ventas_intervalos_api
+
+
+# Test para la URL de búsqueda de clientes
+def test_url_buscar_clientes_api():
+    path = reverse('buscar_clientes_api')
+    assert resolve(path).func == buscar_clientes_api
+
+
+# Tests para las URLs de cambios masivos de productos
+def test_url_importar_productos_api():
+    path = reverse('importar_productos_api')
+    assert resolve(path).func == importar_productos_api
+
+
+def test_url_actualizar_precios_api():
+    path = reverse('actualizar_precios_api')
+    assert resolve(path).func == actualizar_precios_api
+
+
+def test_url_buscar_productos_api():
+    path = reverse('buscar_productos_api')
+    assert resolve(path).func == buscar_productos_api
+
+
+def test_url_tarjetas_productos_api():
+    path = reverse('tarjetas_productos_api')
+    assert resolve(path).func == tarjetas_productos_api
+
+
+# Test para la URL de métricas de Prometheus (en la raíz del proyecto)
+def test_url_metricas_prometheus():
+    path = reverse('metricas_prometheus')
+    assert path == '/metrics'
+    assert resolve(path).func == metricas_prometheus
@@ -4,6 +4,11 @@ from django.urls import reverse
 from tpv_app.models import Usuario, Cliente, Producto, Venta, DetalleVenta, Servicio, Categoria
 from django.core.exceptions import ValidationError
 from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from tpv_app.caches import servicio_abierto
+from tpv_app.models import ResumenProductoDia, ResumenClienteDia
 
 class VentaViewsTests(TestCase):
     """Tests para las vistas relacionadas con ventas."""
@@ -142,3 +147,224 @@ class VentaViewsTests(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("No hay un servicio abierto", response.json().get("error", ""))
 
+    def _cerrar_sin_avisar_a_la_cache(self, abrir_otro=False):
+        """Cierra el servicio como lo vería otro worker: sin señales, con la caché local ya cargada."""
+        self.assertEqual(servicio_abierto(), self.servicio)
+        Servicio.objects.filter(pk=self.servicio.pk).update(estado="cerrado", fecha_fin=timezone.now())
+        if abrir_otro:
+            return Servicio.objects.bulk_create([Servicio(nombre="Tarde", estado="abierto", fecha_inicio=timezone.now())])[0]
+
+    def test_crear_venta_con_servicio_cacheado_ya_cerrado(self):
+        """La venta no cae en un servicio cerrado aunque la caché local aún lo dé por abierto."""
+        self.client.login(username=self.vendedor.username, password="password123")
+        self._cerrar_sin_avisar_a_la_cache()
+        data = {"producto_ids": [self.producto1.id_producto], "cantidades": [1]}
+
+        response = self.client.post(reverse("crear_venta"), json.dumps(data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("No hay un servicio abierto", response.json()["error"])
+        self.assertFalse(Venta.objects.exists())
+        self.assertIsNone(servicio_abierto())  # La caché se invalidó
+
+    def test_crear_venta_va_al_servicio_abierto_actual(self):
+        self.client.login(username=self.vendedor.username, password="password123")
+        tarde = self._cerrar_sin_avisar_a_la_cache(abrir_otro=True)
+        data = {"producto_ids": [self.producto1.id_producto], "cantidades": [1]}
+
+        response = self.client.post(reverse("crear_venta"), json.dumps(data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Venta.objects.get().id_servicio_id, tarde.pk)
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 0)
+
+    def test_crear_ventas_lote_con_servicio_cacheado_ya_cerrado(self):
+        self.client.login(username=self.vendedor.username, password="password123")
+        tarde = self._cerrar_sin_avisar_a_la_cache(abrir_otro=True)
+        data = {"ventas": [
+            {"clave_idempotencia": f"t-{i}", "producto_ids": [self.producto2.id_producto], "cantidades": [1]}
+            for i in range(3)
+        ]}
+
+        resultados = self.client.post(reverse("crear_ventas_lote"), json.dumps(data), content_type="application/json").json()["resultados"]
+
+        self.assertEqual([r["estado"] for r in resultados], ["creada"] * 3)
+        self.assertEqual(set(Venta.objects.values_list("id_servicio", flat=True)), {tarde.pk})
+        tarde.refresh_from_db()
+        self.assertEqual(tarde.cantidad_tickets, 3)
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 0)
+
+    def test_crear_venta_producto_inactivo(self):
+        """Un producto inactivo debe rechazar la venta completa sin crear nada."""
+        self.producto2.activo = False
+        self.producto2.save()
+        self.client.login(username=self.vendedor.username, password="password123")
+
+        data = {
+            "id_cliente": None,
+            "producto_ids": [self.producto1.id_producto, self.producto2.id_producto],
+            "cantidades": [1, 1],
+        }
+
+        response = self.client.post(reverse("crear_venta"), json.dumps(data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("inactivo", response.json().get("error", ""))
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(DetalleVenta.objects.exists())
+
+    def test_crear_venta_muchas_lineas(self):
+        """Un ticket grande se valora en memoria y guarda todas sus líneas."""
+        self.client.login(username=self.vendedor.username, password="password123")
+
+        data = {
+            "id_cliente": None,
+            "producto_ids": [str(self.producto2.id_producto)] * 30,  # La terminal envía los ids como texto
+            "cantidades": ["1"] * 30,
+        }
+
+        response = self.client.post(reverse("crear_venta"), json.dumps(data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        venta = Venta.objects.get(pk=response.json()["venta_id"])
+        self.assertEqual(venta.detalleventa_set.count(), 30)
+        self.assertEqual(venta.total, Decimal("1500.00"))
+        self.assertTrue(all(d.precio_unitario == Decimal("50.00") for d in venta.detalleventa_set.all()))
+
+    def test_crear_venta_idempotente(self):
+        """Reintentar con la misma clave devuelve la venta original sin duplicarla."""
+        self.client.login(username=self.vendedor.username, password="password123")
+
+        data = {
+            "id_cliente": None,
+            "producto_ids": [self.producto1.id_producto],
+            "cantidades": [1],
+            "clave_idempotencia": "ticket-0001",
+        }
+
+        primera = self.client.post(reverse("crear_venta"), json.dumps(data), content_type="application/json")
+        segunda = self.client.post(reverse("crear_venta"), json.dumps(data), content_type="application/json")
+
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(primera.json()["venta_id"], segunda.json()["venta_id"])
+        self.assertEqual(Venta.objects.count(), 1)
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 1)
+
+    def test_crear_ventas_lote(self):
+        """Un lote registra cada ticket y devuelve un resultado por ticket."""
+        self.client.login(username=self.vendedor.username, password="password123")
+        Venta.objects.create(id_usuario=self.vendedor, id_servicio=self.servicio, total=0, clave_idempotencia="t-previa")
+
+        data = {"ventas": [
+            {"clave_idempotencia": "t-1", "fecha": "2024-01-01T11:00:00Z",
+             "id_cliente": self.cliente.id_cliente, "producto_ids": [self.producto1.id_producto], "cantidades": [1]},
+            {"clave_idempotencia": "t-2", "producto_ids": [self.producto2.id_producto], "cantidades": [3]},
+            {"clave_idempotencia": "t-1", "producto_ids": [self.producto2.id_producto], "cantidades": [1]},
+            {"clave_idempotencia": "t-previa", "producto_ids": [self.producto2.id_producto], "cantidades": [1]},
+            {"clave_idempotencia": "t-3", "producto_ids": [999999], "cantidades": [1]},
+            {"producto_ids": [self.producto2.id_producto], "cantidades": [1]},
+        ]}
+
+        response = self.client.post(reverse("crear_ventas_lote"), json.dumps(data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        estados = [r["estado"] for r in response.json()["resultados"]]
+        self.assertEqual(estados, ["creada", "creada", "duplicada", "duplicada", "error", "error"])
+
+        venta = Venta.objects.get(clave_idempotencia="t-1")
+        self.assertEqual(venta.fecha.isoformat(), "2024-01-01T11:00:00+00:00")
+        self.assertEqual(venta.id_cliente, self.cliente)
+        self.assertEqual(Venta.objects.get(clave_idempotencia="t-2").total, Decimal("150.00"))
+
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 3)
+        self.assertEqual(self.servicio.total_ingresos, Decimal("1150.00"))
+
+    def test_crear_ventas_lote_no_modifica_servicios_cerrados(self):
+        """Un ticket fechado en un servicio cerrado va al abierto y el resultado lo indica."""
+        self.client.login(username=self.vendedor.username, password="password123")
+        cerrado = Servicio.objects.create(nombre="Ayer", estado="cerrado", fecha_inicio="2023-12-31T08:00:00Z",
+                                          fecha_fin="2023-12-31T20:00:00Z")
+        data = {"ventas": [
+            {"clave_idempotencia": "t-1", "fecha": "2023-12-31T12:00:00Z",
+             "producto_ids": [self.producto2.id_producto], "cantidades": [1]},
+            {"clave_idempotencia": "t-2", "id_cliente": "abc",
+             "producto_ids": [self.producto2.id_producto], "cantidades": [1]},
+            {"clave_idempotencia": "t-3", "id_cliente": self.cliente.id_cliente,
+             "producto_ids": [self.producto2.id_producto], "cantidades": [1]},
+        ]}
+
+        resultados = self.client.post(reverse("crear_ventas_lote"), json.dumps(data), content_type="application/json").json()["resultados"]
+
+        self.assertEqual([r["estado"] for r in resultados], ["creada", "error", "creada"])
+        self.assertEqual(resultados[0]["servicio_cerrado"], cerrado.id_servicio)
+        self.assertNotIn("servicio_cerrado", resultados[2])
+        self.assertEqual(Venta.objects.get(clave_idempotencia="t-3").id_cliente, self.cliente)
+        cerrado.refresh_from_db()
+        self.assertEqual(cerrado.cantidad_tickets, 0)
+        self.servicio.refresh_from_db()
+        self.assertEqual(self.servicio.cantidad_tickets, 2)
+
+    def test_crear_ventas_lote_vacio(self):
+        """Un lote sin ventas se rechaza."""
+        self.client.login(username=self.vendedor.username, password="password123")
+        response = self.client.post(reverse("crear_ventas_lote"), json.dumps({"ventas": []}), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_resumenes_se_mantienen_con_cada_venta(self):
+        """Las ventas y anulaciones actualizan los resúmenes que lee detalle_venta."""
+        self.client.login(username=self.vendedor.username, password="password123")
+        data = {
+            "id_cliente": self.cliente.id_cliente,
+            "producto_ids": [self.producto1.id_producto, self.producto2.id_producto],
+            "cantidades": [1, 2],
+        }
+        venta_id = self.client.post(reverse("crear_venta"), json.dumps(data), content_type="application/json").json()["venta_id"]
+        Venta.objects.create(id_usuario=self.vendedor, id_cliente=self.cliente, id_servicio=self.servicio, total=Decimal("5.00"))
+
+        resumen = ResumenProductoDia.objects.get(id_producto=self.producto2)
+        self.assertEqual((resumen.unidades, resumen.lineas, resumen.ingresos), (2, 1, Decimal("100.00")))
+        cliente = ResumenClienteDia.objects.get(id_cliente=self.cliente)
+        self.assertEqual((cliente.tickets, cliente.ingresos), (2, Decimal("1105.00")))
+
+        productos = self.client.get(reverse("datos_grafico_api", args=["productos"])).json()
+        self.assertEqual(productos["labels"], ["Mouse", "Laptop"])
+        self.assertEqual(productos["values"], [2, 1])
+        self.assertEqual(self.client.get(reverse("datos_grafico_api", args=["clientes"])).json()["values"], [2])
+        self.assertEqual(self.client.get(reverse("datos_grafico_api", args=["servicios"])).json()["labels"], ["Servicio General"])
+
+        Venta.objects.get(pk=venta_id).delete()
+        resumen.refresh_from_db()
+        self.assertEqual((resumen.unidades, resumen.lineas, resumen.ingresos), (0, 0, Decimal("0.00")))
+
+        ResumenClienteDia.objects.all().delete()
+        call_command("reconstruir_resumenes", stdout=StringIO())
+        cliente = ResumenClienteDia.objects.get(id_cliente=self.cliente)
+        self.assertEqual((cliente.tickets, cliente.ingresos), (1, Decimal("5.00")))
+
+    def test_detalle_venta_paginacion_por_cursor(self):
+        """La tabla de detalles se recorre por cursor con el producto ya cargado en la misma consulta."""
+        venta = Venta.objects.create(id_usuario=self.vendedor, id_servicio=self.servicio, total=Decimal("400.00"))
+        for _ in range(8):
+            DetalleVenta.objects.create(id_venta=venta, id_producto=self.producto2, cantidad=1)
+        self.client.login(username=self.vendedor.username, password="password123")
+
+        primera = self.client.get(reverse("detalle_venta")).context["page_obj"]
+        self.assertEqual(len(primera), 6)
+        self.assertTrue(primera.has_next)
+        self.assertFalse(primera.has_previous)
+
+        response = self.client.get(reverse("detalle_venta"), {"despues": primera.cursor_siguiente})
+        segunda = response.context["page_obj"]
+        self.assertEqual(len(segunda), 2)
+        self.assertFalse(segunda.has_next)
+        self.assertTrue(segunda.has_previous)
+        self.assertEqual(segunda.total_aproximado, 8)
+        self.assertContains(response, "Mouse")
+
+        anterior = self.client.get(reverse("detalle_venta"), {"antes": segunda.cursor_anterior}).context["page_obj"]
+        self.assertEqual([d.id_detalle for d in anterior], [d.id_detalle for d in primera])
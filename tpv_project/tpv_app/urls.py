@@ -5,10 +5,16 @@ from django.urls import path
 from tpv_app.views.auth_user_views import editar_perfil,borrar_usuario, login_view, autenticar_usuario, logout_view, listar_usuarios, seleccionar_usuario, gestionar_usuarios, crear_usuario
 from tpv_app.views.home_views import home
 from tpv_app.views.category_views import listar_categorias, crear_categoria, editar_categoria, borrar_categoria
-from tpv_app.views.product_views import listar_productos, crear_producto, editar_producto, borrar_producto
-from tpv_app.views.service_views import listar_servicios, crear_servicio, editar_servicio, borrar_servicio
-from tpv_app.views.venta_views import crear_venta, detalle_venta 
-from tpv_app.views.clientes_views import listar_clientes , crear_cliente , editar_cliente , borrar_cliente
+from tpv_app.views.product_views import (
+    listar_productos, crear_producto, editar_producto, borrar_producto, importar_productos_api, actualizar_precios_api,
+    buscar_productos_api
+)
+from tpv_app.views.service_views import listar_servicios, crear_servicio, editar_servicio, borrar_servicio, informe_z
+from tpv_app.views.venta_views import crear_venta, crear_ventas_lote, detalle_venta
+from tpv_app.views.clientes_views import listar_clientes , crear_cliente , editar_cliente , borrar_cliente , buscar_clientes_api
+from tpv_app.views.catalogo_views import catalogo_api, tarjetas_productos_api
+from tpv_app.views.exportacion_views import exportar_ventas, exportar_lineas
+from tpv_app.views.estadisticas_views import ventas_intervalos_api, datos_grafico_api, datos_graficos_api
 
 from django.urls import path
 
@@ -38,6 +44,7 @@ urlpatterns = [
     path('servicios/crear/', crear_servicio, name='crear_servicio'),
     path('servicios/editar/<int:id_servicio>/', editar_servicio, name='editar_servicio'),
     path('servicios/borrar/<int:id_servicio>/', borrar_servicio, name='borrar_servicio'),
+    path('servicios/<int:id_servicio>/informe_z/', informe_z, name='informe_z'),
 
     # Categorías
     path('categorias/', listar_categorias, name='categorias'),
@@ -50,16 +57,30 @@ urlpatterns = [
     path('productos/crear/', crear_producto, name='crear_producto'),
     path('productos/editar/<int:id_producto>/', editar_producto, name='editar_producto'),
     path('productos/borrar/<int:id_producto>/', borrar_producto, name='borrar_producto'),
+    path('productos/buscar/', buscar_productos_api, name='buscar_productos_api'),
+    path('productos/importar/', importar_productos_api, name='importar_productos_api'),
+    path('productos/precios/', actualizar_precios_api, name='actualizar_precios_api'),
 
   # URLs de clientes
   path('clientes/', listar_clientes, name='clientes'),
   path('clientes/crear/', crear_cliente, name='crear_cliente'),
   path('clientes/editar/<int:id_cliente>/', editar_cliente, name='editar_cliente'),
   path('clientes/borrar/<int:id_cliente>/', borrar_cliente, name='borrar_cliente'),
+  path('clientes/buscar/', buscar_clientes_api, name='buscar_clientes_api'),
 
   # Ventas
     path('ventas/', crear_venta, name='crear_venta'),
+    path('ventas/lote/', crear_ventas_lote, name='crear_ventas_lote'),
     path('detalle_venta/', detalle_venta, name='detalle_venta'),
+    path('detalle_venta/graficos/', datos_graficos_api, name='datos_graficos_api'),
+    path('detalle_venta/graficos/<slug:grafico>/', datos_grafico_api, name='datos_grafico_api'),
+    path('ventas/exportar/', exportar_ventas, name='exportar_ventas'),
+    path('ventas/exportar/lineas/', exportar_lineas, name='exportar_lineas'),
+
+    # API para terminales
+    path('api/catalogo/', catalogo_api, name='catalogo_api'),
+    path('api/catalogo/tarjetas/', tarjetas_productos_api, name='tarjetas_productos_api'),
+    path('api/ventas/intervalos/', ventas_intervalos_api, name='ventas_intervalos_api'),
 
 
 ]
\ No newline at end of file
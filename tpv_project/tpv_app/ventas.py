@@ -0,0 +1,373 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tpv_app import caches, intervalos, resumenes
+from tpv_app.caches import servicio_abierto
+from tpv_app.catalogo import obtener_catalogo
+from tpv_app.models import (
+    Cliente, Producto, Servicio, Venta, VentaArchivada, DetalleVenta, VersionCatalogo, ajustar_contadores_servicio
+)
+
+
+# -----------------------------
+# Registro de ventas por lotes
+# -----------------------------
+
+def resolver_productos(ids):
+    """Devuelve un diccionario id_producto -> producto para los ids pedidos.
+
+    Usa la instantánea del catálogo si sigue al día con el contador VersionCatalogo de la base de
+    datos (una consulta): sin caché compartida, la instantánea de este worker puede no reflejar
+    aún un cambio de precio o una baja hecha en otro. Si no lo está, o faltan ids, los productos
+    pedidos se leen de la base de datos con una única consulta IN.
+    """
+    catalogo = obtener_catalogo()
+    version = VersionCatalogo.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+    if version != catalogo.version:
+        return Producto.objects.in_bulk(set(ids))
+
+    productos = catalogo.productos  # Instantánea en memoria
+    faltan = set(ids) - productos.keys()
+    if faltan:
+        # Productos creados tras cargar la instantánea: una única consulta IN
+        productos = dict(productos)
+        productos.update(
+            (producto.id_producto, producto)
+            for producto in Producto.objects.filter(pk__in=faltan)
+        )
+    return productos
+
+
+def preparar_lineas(producto_ids, cantidades, productos=None):
+    """Resuelve todos los productos contra el catálogo en memoria y calcula las líneas.
+
+    Devuelve una lista de DetalleVenta sin guardar (sin venta asignada) y el total.
+    Los errores se comprueban en el mismo orden que antes: producto inexistente,
+    cantidad inválida y producto inactivo, línea por línea.
+    """
+    ids = [int(producto_id) for producto_id in producto_ids]
+    if productos is None:
+        productos = resolver_productos(ids)
+
+    lineas = []
+    total = Decimal('0')
+    for producto_id, cantidad in zip(ids, cantidades):
+        producto = productos.get(producto_id)
+        if producto is None:
+            raise Http404("No Producto matches the given query.")
+        cantidad = int(cantidad)
+
+        # Validar la cantidad
+        if cantidad <= 0:
+            raise ValidationError(f'Cantidad inválida para el producto {producto.nombre}')
+        if not producto.activo:
+            raise ValidationError("El producto está inactivo y no puede usarse en la venta.")
+
+        subtotal = producto.precio * cantidad
+        total += subtotal
+        lineas.append(DetalleVenta(
+            id_producto_id=producto.id_producto,
+            cantidad=cantidad,
+            precio_unitario=producto.precio,
+            subtotal=subtotal
+        ))
+    return lineas, total
+
+
+def venta_por_clave(clave_idempotencia):
+    """Devuelve el id de la venta ya registrada con esa clave, o None (lectura sin bloqueo de escritura)."""
+    if not clave_idempotencia:
+        return None
+    return (
+        Venta.objects.filter(clave_idempotencia=clave_idempotencia).values_list('id_venta', flat=True).first()
+        or VentaArchivada.objects.filter(clave_idempotencia=clave_idempotencia).values_list('id_venta', flat=True).first()
+    )
+
+
+class ServicioCerrado(Exception):
+    """El servicio que la caché local daba por abierto ya está cerrado."""
+
+
+def _comprobar_servicio_abierto(servicio):
+    # Se llama dentro de la transacción de escritura, antes de insertar: el servicio viene de la
+    # caché local del proceso, que puede ir hasta TPV_CACHE_LOCAL_TTL segundos por detrás, y una
+    # venta no puede caer en un servicio cerrado (ya tiene su informe Z). En PostgreSQL el bloqueo
+    # de la fila espera a que termine un cierre en curso; SQLite ya serializa las escrituras.
+    if not Servicio.objects.select_for_update().filter(pk=servicio.pk, estado='abierto').exists():
+        caches.invalidar('servicio_abierto')
+        raise ServicioCerrado(servicio.pk)
+
+
+def _servicio_abierto_actual():
+    # Tras ServicioCerrado la versión 'servicio_abierto' ya cambió: esta lectura va a la base de datos
+    servicio = servicio_abierto()
+    if servicio is None:
+        raise ValidationError('No hay un servicio abierto.')
+    return servicio
+
+
+def registrar_venta(usuario, servicio, cliente, producto_ids, cantidades, clave_idempotencia=None):
+    """Crea la venta y todas sus líneas con un único INSERT por tabla.
+
+    Si otra petición con la misma clave de idempotencia se adelanta, devuelve esa venta (aunque ya
+    esté archivada). Si el servicio ya se cerró, la venta va al servicio abierto actual
+    (ValidationError si no hay).
+    """
+    lineas, total = preparar_lineas(producto_ids, cantidades)
+
+    try:
+        try:
+            venta = _insertar_venta(usuario, servicio, cliente, lineas, total, clave_idempotencia)
+        except ServicioCerrado:
+            venta = _insertar_venta(usuario, _servicio_abierto_actual(), cliente, lineas, total, clave_idempotencia)
+    except IntegrityError:
+        if not clave_idempotencia:
+            raise
+        # La venta que se adelantó puede haberse archivado ya: se busca en Venta y en VentaArchivada
+        id_venta = venta_por_clave(clave_idempotencia)
+        if id_venta is None:
+            raise
+        venta = Venta.objects.filter(pk=id_venta).first() or _venta_archivada(id_venta)
+    return venta
+
+
+def _venta_archivada(id_venta):
+    """Venta sin guardar con los datos del índice de una venta archivada (sus líneas están en el fichero)."""
+    archivada = VentaArchivada.objects.get(pk=id_venta)
+    return Venta(
+        id_venta=archivada.id_venta, id_servicio_id=archivada.id_servicio, id_cliente_id=archivada.id_cliente,
+        fecha=archivada.fecha, total=archivada.total, clave_idempotencia=archivada.clave_idempotencia
+    )
+
+
+def _insertar_venta(usuario, servicio, cliente, lineas, total, clave_idempotencia):
+    with transaction.atomic():
+        _comprobar_servicio_abierto(servicio)
+        venta = Venta.objects.create(
+            id_usuario=usuario,
+            id_servicio=servicio,
+            id_cliente=cliente,
+            total=total,
+            clave_idempotencia=clave_idempotencia or None
+        )
+
+        # Verificar si la venta se guardó correctamente
+        if not venta.id_venta:
+            raise ValueError("La venta no se guardó correctamente en la base de datos.")
+
+        for linea in lineas:
+            linea.id_venta = venta
+        DetalleVenta.objects.bulk_create(lineas)
+        # bulk_create no envía post_save: el resumen por producto se actualiza aquí (el de cliente, la señal de Venta)
+        resumenes.acumular_productos(resumenes.filas_productos(venta, lineas))
+
+    return venta
+
+
+# -----------------------------
+# Ingesta de lotes de tickets (terminales que vuelven a conectarse)
+# -----------------------------
+
+TAMANO_GRUPO_LOTE = 100  # Tickets por transacción al escribir un lote
+
+
+def _error_ticket(error):
+    if isinstance(error, ValidationError):
+        return ' '.join(error.messages)
+    return str(error)
+
+
+def _servicio_cerrado_en(servicios, fecha):
+    """Servicio cerrado en curso en `fecha` (el más reciente que la contenga), o None."""
+    for servicio in servicios:
+        if servicio.fecha_inicio <= fecha and servicio.fecha_fin is not None and fecha <= servicio.fecha_fin:
+            return servicio
+    return None
+
+
+def registrar_lote(usuario, tickets):
+    """Registra muchos tickets de una vez y devuelve un resultado por ticket, en el mismo orden.
+
+    Cada ticket es un diccionario con clave_idempotencia, fecha (ISO 8601, opcional),
+    id_cliente (opcional), producto_ids y cantidades. La validación contra el catálogo, los
+    clientes y los servicios se hace con consultas en bloque; las ventas se escriben en grupos
+    de TAMANO_GRUPO_LOTE por transacción y los contadores de cada servicio se ajustan una sola
+    vez por grupo.
+
+    Todos los tickets se asignan al servicio abierto: un servicio cerrado ya tiene su informe Z
+    y sus contadores no deben cambiar. Si la fecha del ticket cae en un servicio cerrado, el
+    resultado lo indica con `servicio_cerrado` (id de ese servicio).
+    """
+    resultados = [None] * len(tickets)
+    preparados = []  # (indice, clave, fecha, id_cliente, lineas, total)
+
+    # 1. Claves: obligatorias, sin repetir dentro del lote y sin venta previa
+    claves = [str(ticket.get('clave_idempotencia') or '') if isinstance(ticket, dict) else '' for ticket in tickets]
+    existentes = {}
+    for modelo in (VentaArchivada, Venta):  # Una terminal puede reenviar un ticket ya archivado
+        existentes.update(
+            modelo.objects.filter(clave_idempotencia__in=[clave for clave in claves if clave])
+            .values_list('clave_idempotencia', 'id_venta')
+        )
+    primera_aparicion = {}
+
+    # 2. Productos de todo el lote resueltos de una vez
+    ids_producto = set()
+    for ticket in tickets:
+        if isinstance(ticket, dict):
+            try:
+                ids_producto.update(int(producto_id) for producto_id in ticket.get('producto_ids') or [])
+            except (TypeError, ValueError):
+                pass
+    productos = resolver_productos(ids_producto)
+
+    # 3. Clientes de todo el lote en una sola consulta (un id no numérico solo invalida su ticket)
+    ids_cliente = set()
+    for ticket in tickets:
+        if isinstance(ticket, dict) and ticket.get('id_cliente'):
+            try:
+                ids_cliente.add(int(ticket['id_cliente']))
+            except (TypeError, ValueError):
+                pass
+    clientes = Cliente.objects.in_bulk(ids_cliente)
+
+    ahora = timezone.now()
+    for indice, (ticket, clave) in enumerate(zip(tickets, claves)):
+        resultado = {'indice': indice, 'clave_idempotencia': clave or None}
+        resultados[indice] = resultado
+        try:
+            if not isinstance(ticket, dict):
+                raise ValidationError('El ticket debe ser un objeto JSON.')
+            if not clave:
+                raise ValidationError('Cada ticket debe incluir su clave de idempotencia.')
+            if len(clave) > 64:
+                raise ValidationError('La clave de idempotencia es demasiado larga.')
+            if clave in existentes:
+                resultado.update(estado='duplicada', venta_id=existentes[clave])
+                continue
+            if clave in primera_aparicion:
+                resultado.update(estado='duplicada', repetida_en=primera_aparicion[clave])
+                continue
+            primera_aparicion[clave] = indice
+
+            producto_ids = ticket.get('producto_ids') or []
+            cantidades = ticket.get('cantidades') or []
+            if not producto_ids or not cantidades:
+                raise ValidationError('Debe incluir al menos un producto y su cantidad.')
+            if len(producto_ids) != len(cantidades):
+                raise ValidationError('La cantidad de productos y las cantidades no coinciden.')
+
+            fecha = ahora
+            if ticket.get('fecha'):
+                fecha = parse_datetime(str(ticket['fecha']))
+                if fecha is None:
+                    raise ValidationError('Fecha de ticket inválida.')
+                if timezone.is_naive(fecha):
+                    fecha = timezone.make_aware(fecha)
+
+            id_cliente = ticket.get('id_cliente')
+            if id_cliente:
+                try:
+                    id_cliente = int(id_cliente)
+                except (TypeError, ValueError):
+                    raise ValidationError('Cliente inválido.')
+                if id_cliente not in clientes:
+                    raise ValidationError('No Cliente matches the given query.')
+
+            lineas, total = preparar_lineas(producto_ids, cantidades, productos)
+            preparados.append((indice, clave, fecha, id_cliente or None, lineas, total))
+        except (ValidationError, Http404, TypeError, ValueError) as error:
+            resultado.update(estado='error', error=_error_ticket(error))
+
+    if not preparados:
+        return resultados
+
+    # 4. Servicio abierto y servicios cerrados que cubren las fechas del lote, en una sola consulta
+    abierto = servicio_abierto()
+    if abierto is None:
+        for preparado in preparados:
+            resultados[preparado[0]].update(estado='error', error='No hay un servicio abierto.')
+        return resultados
+    fechas = [fecha for _, _, fecha, _, _, _ in preparados]
+    cerrados = list(
+        Servicio.objects.filter(estado='cerrado', fecha_inicio__lte=max(fechas), fecha_fin__gte=min(fechas))
+        .order_by('-fecha_inicio')
+    )
+    for preparado in preparados:
+        cerrado = _servicio_cerrado_en(cerrados, preparado[2])
+        if cerrado is not None:
+            resultados[preparado[0]]['servicio_cerrado'] = cerrado.pk
+
+    # 5. Escritura agrupada
+    inicio = 0
+    while inicio < len(preparados):
+        # Tras un reintento se omiten los tickets que ya tienen resultado
+        grupo = [preparado for preparado in preparados[inicio:inicio + TAMANO_GRUPO_LOTE] if 'estado' not in resultados[preparado[0]]]
+        try:
+            if grupo:
+                _escribir_grupo_o_por_ticket(usuario, abierto, grupo, resultados)
+        except ServicioCerrado:
+            # La caché local daba por abierto un servicio ya cerrado: el resto va al servicio abierto actual
+            abierto = servicio_abierto()
+            if abierto is None:
+                for preparado in preparados[inicio:]:
+                    if 'estado' not in resultados[preparado[0]]:
+                        resultados[preparado[0]].update(estado='error', error='No hay un servicio abierto.')
+                break
+            continue
+        inicio += TAMANO_GRUPO_LOTE
+
+    return resultados
+
+
+def _escribir_grupo_o_por_ticket(usuario, servicio, grupo, resultados):
+    try:
+        _escribir_grupo(usuario, servicio, grupo, resultados)
+    except IntegrityError:
+        # Otra petición registró alguna de las claves a la vez: se reintenta ticket a ticket
+        for preparado in grupo:
+            try:
+                _escribir_grupo(usuario, servicio, [preparado], resultados)
+            except IntegrityError:
+                venta_id = venta_por_clave(preparado[1])
+                if venta_id:
+                    resultados[preparado[0]].update(estado='duplicada', venta_id=venta_id)
+                else:
+                    resultados[preparado[0]].update(estado='error', error='No se pudo registrar la venta.')
+
+
+def _escribir_grupo(usuario, servicio, grupo, resultados):
+    with transaction.atomic():
+        _comprobar_servicio_abierto(servicio)
+        ventas = Venta.objects.bulk_create([
+            Venta(
+                fecha=fecha,
+                id_usuario=usuario,
+                id_cliente_id=id_cliente,
+                id_servicio=servicio,
+                total=total,
+                clave_idempotencia=clave
+            )
+            for _, clave, fecha, id_cliente, _, total in grupo
+        ])
+
+        detalles = []
+        for venta, (_, _, _, _, lineas, _) in zip(ventas, grupo):
+            for linea in lineas:
+                linea.id_venta = venta
+                detalles.append(linea)
+        DetalleVenta.objects.bulk_create(detalles)
+        resumenes.acumular_ventas((venta, preparado[4]) for venta, preparado in zip(ventas, grupo))
+        intervalos.invalidar_si_historica(min(venta.fecha for venta in ventas))
+        caches.invalidar('ventas')  # bulk_create no envía post_save: gráficos de detalle_venta
+
+        # bulk_create no envía post_save: los contadores se ajustan una vez por grupo
+        ajustar_contadores_servicio(servicio.pk, len(ventas), sum((venta.total for venta in ventas), Decimal('0')))
+
+    for venta, preparado in zip(ventas, grupo):
+        resultados[preparado[0]].update(estado='creada', venta_id=venta.id_venta)
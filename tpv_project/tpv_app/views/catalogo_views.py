@@ -0,0 +1,99 @@
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
+from tpv_app.catalogo import obtener_catalogo
+
+# === Catálogo para terminales ===
+# Sincronización del catálogo en JSON compacto con ETag y modo incremental (?since=<version>).
+
+CAMPOS_PRODUCTO = ['id', 'nombre', 'precio', 'activo', 'id_categoria', 'version']
+CAMPOS_CATEGORIA = ['id', 'nombre', 'activo', 'version']
+
+
+def _fila_producto(producto):
+    return [producto.id_producto, producto.nombre, str(producto.precio), producto.activo,
+            producto.id_categoria_id, producto.version]
+
+
+def _fila_categoria(categoria):
+    return [categoria.id_categoria, categoria.nombre, categoria.activo, categoria.version]
+
+
+@login_required
+@require_GET
+def catalogo_api(request):
+    """Devuelve el catálogo completo (solo filas activas) o los cambios desde una versión."""
+    since = request.GET.get('since')
+    try:
+        since = int(since) if since not in (None, '') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'El parámetro since debe ser un número de versión.'}, status=400)
+
+    catalogo = obtener_catalogo()
+
+    # Un borrado físico posterior a `since` no se puede expresar como cambio: se envía el catálogo completo
+    completo = since is None or since <= 0 or since < catalogo.version_eliminacion
+    etag = f'"catalogo-{catalogo.version}-{"completo" if completo else since}"'
+    if etag in [valor.strip() for valor in request.headers.get('If-None-Match', '').split(',')]:
+        respuesta = HttpResponseNotModified()
+        respuesta['ETag'] = etag
+        return respuesta
+
+    if completo:
+        productos, categorias = catalogo.productos_activos(), catalogo.categorias_activas()
+    else:
+        productos, categorias = catalogo.cambios_desde(since)
+
+    respuesta = JsonResponse({
+        'version': catalogo.version,
+        'completo': completo,
+        'productos': {'campos': CAMPOS_PRODUCTO, 'filas': [_fila_producto(p) for p in productos]},
+        'categorias': {'campos': CAMPOS_CATEGORIA, 'filas': [_fila_categoria(c) for c in categorias]},
+    }, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'private, no-cache'  # Revalidar siempre con If-None-Match
+    return respuesta
+
+
+# === Tarjetas de producto de la pantalla de venta ===
+# La pantalla de venta pide los productos de la categoría que se abre, por páginas. Los grupos
+# por categoría se calculan una vez por instantánea del catálogo y el ETag incluye su versión:
+# mientras el catálogo no cambie, el navegador recibe un 304 sin cuerpo.
+
+TARJETAS_POR_PAGINA = 48
+
+
+@login_required
+@require_GET
+def tarjetas_productos_api(request):
+    """?categoria=<id>|sin|todas&pagina=<n>: productos activos de la categoría para la pantalla de venta."""
+    categoria = request.GET.get('categoria', 'todas')
+    pagina = request.GET.get('pagina', '1')
+    if not pagina.isdigit() or int(pagina) < 1 or not (categoria.isdigit() or categoria in ('sin', 'todas')):
+        return JsonResponse({'success': False, 'error': 'Use ?categoria=<id>|sin|todas&pagina=<n>.'}, status=400)
+    pagina = int(pagina)
+
+    catalogo = obtener_catalogo()
+    etag = f'"tarjetas-{catalogo.version}-{categoria}-{pagina}"'
+    if etag in [valor.strip() for valor in request.headers.get('If-None-Match', '').split(',')]:
+        respuesta = HttpResponseNotModified()
+        respuesta['ETag'] = etag
+        return respuesta
+
+    if categoria == 'todas':
+        productos = catalogo.productos_activos()
+    else:
+        productos = catalogo.productos_de_categoria(None if categoria == 'sin' else int(categoria))
+    inicio = (pagina - 1) * TARJETAS_POR_PAGINA
+    respuesta = JsonResponse({
+        'success': True,
+        'version': catalogo.version,
+        'productos': [
+            {'id_producto': p.id_producto, 'nombre': p.nombre, 'precio': str(p.precio), 'id_categoria': p.id_categoria_id}
+            for p in productos[inicio:inicio + TARJETAS_POR_PAGINA]
+        ],
+        'siguiente': pagina + 1 if len(productos) > inicio + TARJETAS_POR_PAGINA else None,
+    }, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'private, no-cache'  # Revalidar siempre con If-None-Match
+    return respuesta
@@ -3,6 +3,8 @@ from django.contrib.auth.decorators import login_required  # Para proteger las v
 from django.core.paginator import Paginator, EmptyPage  # Para la paginación
 from django.contrib import messages  # Para mensajes en las vistas
 from tpv_app.models import Categoria  # Modelo utilizado en las vistas
+from tpv_app.catalogo import obtener_catalogo  # Instantánea del catálogo en memoria
+from tpv_app import cola_escritura  # Escrituras serializadas en el hilo escritor
 
 # === Categorías ===
 # Gestión de categorías de productos o servicios.
@@ -10,7 +12,8 @@ from tpv_app.models import Categoria  # Modelo utilizado en las vistas
 @login_required
 def listar_categorias(request):
     """Lista todas las categorías activas con paginación."""
-    categorias = Categoria.objects.filter(activo=True)
+    catalogo = obtener_catalogo()
+    categorias = catalogo.categorias_activas()
 
     # Paginación para las categorías
     paginator = Paginator(categorias, 8)  # 8 categorías por página
@@ -22,7 +25,8 @@ def listar_categorias(request):
         page_obj = paginator.get_page(paginator.num_pages)
 
     return render(request, 'categorias.html', {
-        'page_obj': page_obj ,'usuario': request.user
+        'page_obj': page_obj ,'usuario': request.user,
+        'version_datos': catalogo.version  # Clave de los fragmentos cacheados
     })
 
 @login_required
@@ -37,7 +41,7 @@ def crear_categoria(request):
             return render(request, 'categorias.html', {'nombre': nombre})  # Pasar 'nombre' para que se vea en el formulario
             
         # Crear la nueva categoría
-        Categoria.objects.create(nombre=nombre)
+        cola_escritura.ejecutar(Categoria.objects.create, nombre=nombre)
         
         # Mensaje de éxito
         messages.success(request, 'Categoría creada exitosamente.')
@@ -50,7 +54,7 @@ def borrar_categoria(request, id_categoria):
     """Realiza un borrado lógico de una categoría."""
     categoria = get_object_or_404(Categoria, pk=id_categoria)
     categoria.activo = False
-    categoria.save()
+    cola_escritura.ejecutar(categoria.save)
 
     # Mensaje de éxito
     messages.success(request, 'Categoría eliminada exitosamente.')
@@ -70,7 +74,7 @@ def editar_categoria(request, id_categoria):
 
         # Si el nombre es válido, actualiza la categoría
         categoria.nombre = nombre
-        categoria.save()
+        cola_escritura.ejecutar(categoria.save)
 
         # Mensaje de éxito
         messages.success(request, 'Categoría actualizada correctamente.')
@@ -2,12 +2,17 @@ from django.core.paginator import Paginator, EmptyPage
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from tpv_app import caches
+from tpv_app.busqueda import LONGITUD_MINIMA, buscar_clientes
 from tpv_app.models import Cliente
+from tpv_app.paginacion import paginar_por_cursor
 
 @login_required
 def listar_clientes(request):
     """Lista todos los clientes con paginación."""
-    clientes = Cliente.objects.all()
+    clientes = Cliente.objects.order_by('id_cliente')  # Orden fijo: la página cacheada debe ser siempre la misma
 
     # Paginación para los clientes
     paginator = Paginator(clientes, 6)  # 6 clientes por página
@@ -20,7 +25,8 @@ def listar_clientes(request):
 
     return render(request, 'clientes.html', {
         'page_obj': page_obj,
-        'usuario': request.user
+        'usuario': request.user,
+        'version_datos': caches.version('clientes'),  # Clave de los fragmentos cacheados
     })
 
 @login_required
@@ -74,3 +80,36 @@ def editar_cliente(request, id_cliente):
         return redirect('clientes')
 
     return render(request, 'clientes.html', {'cliente': cliente})
+
+
+@login_required
+@require_GET
+def buscar_clientes_api(request):
+    """?q=texto&despues=<id_cliente>: clientes cuyo nombre, contacto o NIF/CIF coinciden, por páginas de 20."""
+    clientes = buscar_clientes(request.GET.get('q', ''))
+    if clientes is None:
+        return JsonResponse({
+            'success': False, 'error': f'Escriba al menos {LONGITUD_MINIMA} caracteres.'
+        }, status=400)
+
+    despues = request.GET.get('despues')
+    if despues and not despues.isdigit():
+        return JsonResponse({'success': False, 'error': 'El cursor debe ser un id de cliente.'}, status=400)
+
+    pagina = paginar_por_cursor(
+        clientes.only('id_cliente', 'nombre_empresa', 'nombre_contacto', 'nif_cif'), 'id_cliente',
+        despues=despues, por_pagina=20
+    )
+    return JsonResponse({
+        'success': True,
+        'clientes': [
+            {
+                'id_cliente': cliente.id_cliente,
+                'nombre_empresa': cliente.nombre_empresa,
+                'nombre_contacto': cliente.nombre_contacto,
+                'nif_cif': cliente.nif_cif,
+            }
+            for cliente in pagina
+        ],
+        'siguiente': pagina.cursor_siguiente if pagina.has_next else None,
+    }, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from tpv_app.exportacion import leer_filtros
+from tpv_app.graficos import GRAFICOS, datos_grafico, datos_graficos
+from tpv_app.intervalos import AGRUPACIONES, MAX_DIAS, ventas_por_intervalo
+
+# === Estadísticas de ventas ===
+# Series por hora, día o semana, mapa de calor día de la semana x hora y datos de los gráficos
+# de detalle_venta, en JSON compacto.
+
+
+def _id_opcional(request, nombre):
+    valor = request.GET.get(nombre)
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValidationError(f'El parámetro {nombre} debe ser un identificador numérico.')
+
+
+@login_required
+@require_GET
+def ventas_intervalos_api(request):
+    """?agrupacion=hora|dia|semana|mapa&desde=AAAA-MM-DD&hasta=AAAA-MM-DD&producto=&categoria=&usuario="""
+    agrupacion = request.GET.get('agrupacion', 'dia')
+    try:
+        if agrupacion not in AGRUPACIONES:
+            raise ValidationError(f'Agrupación no soportada: {agrupacion}. Use {", ".join(AGRUPACIONES)}.')
+        fechas = leer_filtros(request.GET.get('desde'), request.GET.get('hasta'))
+        filtros = {nombre: _id_opcional(request, nombre) for nombre in ('producto', 'categoria', 'usuario')}
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+
+    hasta = fechas.get('hasta') or timezone.localdate()
+    desde = fechas.get('desde') or hasta - timedelta(days=29)  # Por defecto, los últimos 30 días
+    if (hasta - desde).days + 1 > MAX_DIAS[agrupacion]:
+        return JsonResponse({
+            'success': False, 'error': f'El rango máximo para la agrupación {agrupacion} es de {MAX_DIAS[agrupacion]} días.'
+        }, status=400)
+
+    claves = ['dia_semana', 'hora'] if agrupacion == 'mapa' else ['inicio']
+    filas = [list(fila[:-1]) + [str(fila[-1])] for fila in ventas_por_intervalo(agrupacion, desde, hasta, filtros)]
+    return JsonResponse({
+        'agrupacion': agrupacion,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'campos': claves + ['tickets', 'unidades', 'ingresos'],
+        'filas': filas,
+    }, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+
+@login_required
+@require_GET
+def datos_grafico_api(request, grafico):
+    """Datos de un gráfico de detalle_venta (productos, clientes, servicios o dias)."""
+    if grafico not in GRAFICOS:
+        return JsonResponse({'success': False, 'error': f'Gráfico desconocido: {grafico}.'}, status=404)
+    respuesta = JsonResponse(datos_grafico(grafico), json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+    respuesta['Cache-Control'] = 'private, max-age=0'
+    return respuesta
+
+
+@login_required
+@require_GET
+def datos_graficos_api(request):
+    """Datos de varios gráficos en una respuesta (?graficos=productos,clientes; por defecto, todos)."""
+    nombres = [nombre for nombre in request.GET.get('graficos', '').split(',') if nombre] or list(GRAFICOS)
+    desconocidos = [nombre for nombre in nombres if nombre not in GRAFICOS]
+    if desconocidos:
+        return JsonResponse({'success': False, 'error': f'Gráfico desconocido: {", ".join(desconocidos)}.'}, status=404)
+    respuesta = JsonResponse(datos_graficos(nombres), json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+    respuesta['Cache-Control'] = 'private, max-age=0'
+    return respuesta
@@ -0,0 +1,43 @@
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from tpv_app.exportacion import exportar, leer_filtros
+
+# === Exportación de ventas ===
+# Descargas en streaming (?formato=csv|jsonl&desde=AAAA-MM-DD&hasta=AAAA-MM-DD&servicio=<id>).
+
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _respuesta_exportacion(request, tipo):
+    formato = request.GET.get('formato', 'csv')
+    try:
+        filtros = leer_filtros(request.GET.get('desde'), request.GET.get('hasta'), request.GET.get('servicio'))
+        contenido = exportar(tipo, formato, filtros)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+
+    respuesta = StreamingHttpResponse(contenido, content_type=TIPOS_CONTENIDO[formato])
+    nombre = f'{tipo}_{timezone.localdate():%Y%m%d}.{formato}'
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    respuesta['Cache-Control'] = 'no-store'
+    return respuesta
+
+
+@login_required
+@require_GET
+def exportar_ventas(request):
+    """Una fila por venta, con nombres de servicio, usuario y cliente."""
+    return _respuesta_exportacion(request, 'ventas')
+
+
+@login_required
+@require_GET
+def exportar_lineas(request):
+    """Una fila por línea de venta, con los datos de la venta y del producto."""
+    return _respuesta_exportacion(request, 'lineas')
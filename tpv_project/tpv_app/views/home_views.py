@@ -1,6 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect  # Manejo de vistas y objetos
 from django.contrib.auth.decorators import login_required  # Protección de vistas con autenticación
-from tpv_app.models import Usuario, Servicio
+from tpv_app.models import Usuario
+from tpv_app.caches import servicio_abierto
 
 @login_required
 def home(request):
@@ -10,5 +11,5 @@ def home(request):
         return redirect('login')
 
     usuario = get_object_or_404(Usuario, id=request.user.id)  # Obtiene el usuario actual
-    servicio_abierto = Servicio.objects.filter(estado='abierto').exists()  # Verifica si hay un servicio abierto
-    return render(request, 'home.html', {'usuario': usuario, 'servicio_abierto': servicio_abierto})
+    hay_servicio_abierto = servicio_abierto() is not None  # Servicio abierto cacheado por proceso
+    return render(request, 'home.html', {'usuario': usuario, 'servicio_abierto': hay_servicio_abierto})
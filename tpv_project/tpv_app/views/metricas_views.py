@@ -0,0 +1,29 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from tpv_app import metricas
+
+# === Métricas para Prometheus ===
+# Sin sesión (el recolector no inicia sesión): se permite con la cabecera
+# `Authorization: Bearer <TPV_METRICAS_TOKEN>` o, si se configuran, desde las IPs de
+# TPV_METRICAS_IPS (vacío por defecto; REMOTE_ADDR es la IP del proxy si lo hay).
+
+
+def _autorizado(request):
+    token = getattr(settings, 'TPV_METRICAS_TOKEN', '')
+    cabecera = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(cabecera, f'Bearer {token}'):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'TPV_METRICAS_IPS', ())
+
+
+@require_GET
+def metricas_prometheus(request):
+    """Métricas por ruta y retraso del diario de ventas en formato de texto de Prometheus."""
+    if not _autorizado(request):
+        return HttpResponseForbidden('No autorizado.')
+    lineas = metricas.registro.exportar() + metricas.metricas_diario()
+    return HttpResponse('\n'.join(lineas) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
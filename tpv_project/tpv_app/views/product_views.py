@@ -3,13 +3,27 @@ from django.core.paginator import Paginator, EmptyPage
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
 from tpv_app.models import Producto, Categoria
+from tpv_app.busqueda import LONGITUD_MINIMA, buscar_productos
+from tpv_app.catalogo import obtener_catalogo
+from tpv_app.importacion import ReglaPrecio, actualizar_precios, importar_productos, leer_filas
+from tpv_app import cola_escritura
+from decimal import Decimal, InvalidOperation
+import io
+import json
 
 @login_required
 def listar_productos(request):
-    """Lista todos los productos activos y sus categorías con paginación."""
-    productos = Producto.objects.filter(activo=True)
-    categorias = Categoria.objects.filter(activo=True)  # Solo categorías activas
+    """Lista los productos activos (o los que coinciden con la búsqueda ?q=) con paginación."""
+    catalogo = obtener_catalogo()
+    busqueda = request.GET.get('q', '').strip()
+    productos = buscar_productos(busqueda) if busqueda else None
+    if productos is None:  # Sin búsqueda o demasiado corta
+        productos = catalogo.productos_activos()
+    categorias = catalogo.categorias_activas()  # Solo categorías activas
 
     # Paginación para los productos
     paginator = Paginator(productos, 6)  # 6 productos por página
@@ -22,7 +36,9 @@ def listar_productos(request):
 
     return render(request, 'productos.html', {
         'page_obj': page_obj,
-        'categorias': categorias,'usuario': request.user
+        'categorias': categorias,'usuario': request.user,
+        'busqueda': busqueda,
+        'version_datos': catalogo.version  # Clave de los fragmentos cacheados
     })
 
 @login_required
@@ -41,11 +57,12 @@ def crear_producto(request):
             producto.nombre = nombre
             producto.precio = precio
             producto.id_categoria = categoria  # Asociamos la categoría
-            producto.save()
+            cola_escritura.ejecutar(producto.save)
             messages.success(request, 'Producto actualizado exitosamente.')
         else:
             # Si no hay id, estamos creando un producto nuevo
-            Producto.objects.create(
+            cola_escritura.ejecutar(
+                Producto.objects.create,
                 nombre=nombre,
                 precio=precio,
                 id_categoria=categoria  # Asociamos la categoría
@@ -55,15 +72,16 @@ def crear_producto(request):
         return redirect('productos')  # Cambiar a 'productos'
 
     # Si es GET, preparamos el formulario para crear un producto
-    categorias = Categoria.objects.filter(activo=True)  # Solo categorías activas
-    return render(request, 'productos.html', {'categorias': categorias})
+    catalogo = obtener_catalogo()
+    categorias = catalogo.categorias_activas()  # Solo categorías activas
+    return render(request, 'productos.html', {'categorias': categorias, 'version_datos': catalogo.version})
 
 @login_required
 def borrar_producto(request, id_producto):
     """Realiza un borrado lógico de un producto."""
     producto = get_object_or_404(Producto, pk=id_producto)
     producto.activo = False
-    producto.save()
+    cola_escritura.ejecutar(producto.save)
     messages.success(request, 'Producto eliminado exitosamente.')
     return redirect('productos')  # Cambiar a 'productos'
 
@@ -75,12 +93,114 @@ def editar_producto(request, id_producto):
         producto.nombre = request.POST['nombre']
         producto.precio = request.POST['precio']
         producto.id_categoria = get_object_or_404(Categoria, pk=request.POST['categoria'])
-        producto.save()
+        cola_escritura.ejecutar(producto.save)
         messages.success(request, 'Producto actualizado exitosamente.')
         return redirect('productos')  # Cambiar a 'productos'
 
-    categorias = Categoria.objects.filter(activo=True)  # Solo categorías activas
+    catalogo = obtener_catalogo()
+    categorias = catalogo.categorias_activas()  # Solo categorías activas
     return render(request, 'productos.html', {
         'producto': producto,
-        'categorias': categorias
+        'categorias': categorias,
+        'version_datos': catalogo.version
     })
+
+
+# Búsqueda de productos para la pantalla de venta
+MAX_RESULTADOS_BUSQUEDA = 50
+
+
+@login_required
+@require_GET
+def buscar_productos_api(request):
+    """?q=texto: productos activos cuyo nombre contiene el texto (sin tildes), por relevancia."""
+    productos = buscar_productos(request.GET.get('q', ''), limite=MAX_RESULTADOS_BUSQUEDA)
+    if productos is None:
+        return JsonResponse({
+            'success': False, 'error': f'Escriba al menos {LONGITUD_MINIMA} caracteres.'
+        }, status=400)
+    return JsonResponse({
+        'success': True,
+        'productos': [
+            {
+                'id_producto': producto.id_producto,
+                'nombre': producto.nombre,
+                'precio': str(producto.precio),
+                'id_categoria': producto.id_categoria_id,
+            }
+            for producto in productos
+        ],
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+# Cambios masivos del catálogo (ver tpv_app.importacion)
+MAX_CAMBIOS_RESPUESTA = 200  # Filas del diff incluidas en la respuesta
+
+
+def _recoger_cambios(cambios):
+    """Función `informar` que guarda las primeras altas y modificaciones para la respuesta."""
+    def informar(cambio):
+        if cambio.tipo != 'error' and len(cambios) < MAX_CAMBIOS_RESPUESTA:
+            cambios.append(cambio)
+    return informar
+
+
+def _respuesta_cambios(resultado, cambios, simular):
+    return JsonResponse({
+        'success': True,
+        'simulacion': simular,
+        'creados': resultado.creados,
+        'modificados': resultado.modificados,
+        'sin_cambios': resultado.sin_cambios,
+        'errores': [{'linea': e.linea, 'referencia': e.referencia, 'error': e.error} for e in resultado.errores[:MAX_CAMBIOS_RESPUESTA]],
+        'cambios': [
+            {'linea': c.linea, 'referencia': c.referencia, 'tipo': c.tipo,
+             'campos': {campo: [None if antes is None else str(antes), str(despues)] for campo, (antes, despues) in c.campos.items()}}
+            for c in cambios
+        ],
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+@require_POST
+def importar_productos_api(request):
+    """Fichero CSV o JSONL en 'fichero' (multipart); 'simular=1' devuelve el diff sin escribir."""
+    fichero = request.FILES.get('fichero')
+    if fichero is None:
+        return JsonResponse({'success': False, 'error': 'Debe adjuntar un fichero.'}, status=400)
+    formato = request.POST.get('formato') or ('jsonl' if fichero.name.endswith('.jsonl') else 'csv')
+    simular = request.POST.get('simular') in ('1', 'true')
+
+    cambios = []
+    try:
+        # El fichero subido se lee por líneas: nunca se carga entero en memoria
+        texto = io.TextIOWrapper(fichero.file, encoding='utf-8-sig', newline='')
+        resultado = importar_productos(leer_filas(texto, formato), simular=simular, informar=_recoger_cambios(cambios))
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+    except UnicodeDecodeError:
+        return JsonResponse({'success': False, 'error': 'El fichero debe estar en UTF-8.'}, status=400)
+    return _respuesta_cambios(resultado, cambios, simular)
+
+
+@login_required
+@require_POST
+def actualizar_precios_api(request):
+    """JSON {porcentaje, redondeo?, categorias?: [ids], incluir_inactivos?, simular?}."""
+    try:
+        body = json.loads(request.body)
+        regla = ReglaPrecio(
+            porcentaje=Decimal(str(body['porcentaje'])),
+            redondeo=Decimal(str(body['redondeo'])) if body.get('redondeo') else None,
+            categorias=tuple(int(id_categoria) for id_categoria in body.get('categorias') or ()),
+            solo_activos=not body.get('incluir_inactivos'),
+        )
+    except (ValueError, TypeError, KeyError, InvalidOperation):
+        return JsonResponse({'success': False, 'error': 'Regla no válida: indique al menos un porcentaje numérico.'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+
+    simular = bool(body.get('simular'))
+    cambios = []
+    resultado = actualizar_precios(regla, simular=simular, informar=_recoger_cambios(cambios))
+    return _respuesta_cambios(resultado, cambios, simular)
@@ -1,6 +1,7 @@
 #service_views.pyfrom django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator, EmptyPage
 from datetime import datetime
 from django.shortcuts import render
@@ -9,6 +10,7 @@ from django.http import HttpResponseRedirect
 
 # Modelos
 from tpv_app.models import Servicio
+from tpv_app.informe_z import informe_z_vigente
 
 @login_required
 def listar_servicios(request):
@@ -53,7 +55,11 @@ def editar_servicio(request, id_servicio):
     if request.method == "POST":
         servicio.nombre = request.POST['nombre']
         servicio.estado = request.POST['estado']
-        servicio.save()
+        try:
+            servicio.save()
+        except ValidationError as error:
+            messages.error(request, error.messages[0])
+            return redirect('servicios')
         messages.success(request, 'Servicio actualizado exitosamente.')
         return redirect('servicios')
 
@@ -72,3 +78,19 @@ def borrar_servicio(request, id_servicio):
         messages.error(request, 'El servicio que intentas borrar no existe.')
     
     return redirect('servicios')  # Redirige a la lista de servicios
+
+
+@login_required
+def informe_z(request, id_servicio):
+    """Muestra el informe Z guardado al cerrar el servicio."""
+    servicio = get_object_or_404(Servicio, pk=id_servicio)
+    informe = informe_z_vigente(servicio)
+    if informe is None:
+        messages.error(request, 'El servicio sigue abierto: el informe Z se genera al cerrarlo.')
+        return redirect('servicios')
+
+    return render(request, 'informe_z.html', {
+        'servicio': servicio,
+        'informe': informe,
+        'usuario': request.user
+    })
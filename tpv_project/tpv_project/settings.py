@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tpv_app.metricas.MetricasMiddleware',  # El primero: mide también el resto de middlewares
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,13 +57,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],  # Directorio de plantillas
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'tpv_app.context_processors.fragmentos',
+            ],
+            # Cada plantilla se compila una vez por proceso (con DEBUG se recarga al modificarla)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -71,13 +81,96 @@ WSGI_APPLICATION = 'tpv_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Perfil de SQLite (TPV_SQLITE_PERFIL):
+#   'concurrente' (por defecto): WAL para que las lecturas no bloqueen a las escrituras,
+#       synchronous=NORMAL, espera de hasta 20 s ante bloqueos y BEGIN IMMEDIATE para que
+#       las transacciones de escritura esperen turno en lugar de fallar con "database is locked".
+#   'basico': configuración por defecto de SQLite.
+TPV_SQLITE_PERFIL = os.environ.get('TPV_SQLITE_PERFIL', 'concurrente')
+
+SQLITE_OPCIONES_CONCURRENTE = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA temp_store=MEMORY;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA mmap_size=134217728;'
+    ),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPCIONES_CONCURRENTE if TPV_SQLITE_PERFIL == 'concurrente' else {},
     }
 }
 
+# Perfil de producción con PostgreSQL (TPV_BD=postgresql), necesario para tener varios workers
+# escribiendo a la vez. Requiere psycopg 3 (`pip install "psycopg[binary,pool]"`).
+#   - TPV_BD_POOL=1: pool de conexiones de psycopg por worker (Django >= 5.1); comprueba cada
+#     conexión al sacarla del pool.
+#   - Sin pool: conexiones persistentes (CONN_MAX_AGE) con comprobación de salud por petición.
+#   - TPV_BD_PGBOUNCER=1: desactiva los cursores de servidor, incompatibles con PgBouncer en
+#     modo transacción.
+if os.environ.get('TPV_BD') == 'postgresql':
+    TPV_BD_POOL = os.environ.get('TPV_BD_POOL') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('TPV_BD_NOMBRE', 'tpv'),
+            'USER': os.environ.get('TPV_BD_USUARIO', 'tpv'),
+            'PASSWORD': os.environ.get('TPV_BD_PASSWORD', ''),
+            'HOST': os.environ.get('TPV_BD_HOST', 'localhost'),
+            'PORT': os.environ.get('TPV_BD_PUERTO', '5432'),
+            # El pool y las conexiones persistentes son excluyentes en Django
+            'CONN_MAX_AGE': 0 if TPV_BD_POOL else int(os.environ.get('TPV_BD_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('TPV_BD_PGBOUNCER') == '1',
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'application_name': 'tpv',
+            },
+        }
+    }
+    if TPV_BD_POOL:
+        from psycopg_pool import ConnectionPool
+
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('TPV_BD_POOL_MIN', '2')),
+            'max_size': int(os.environ.get('TPV_BD_POOL_MAX', '10')),
+            'timeout': 10,  # Segundos de espera por una conexión libre
+            'max_idle': 300,
+            'check': ConnectionPool.check_connection,
+        }
+
+    # Con varios workers las versiones de datos (tpv_app.caches) tienen que estar en una caché
+    # compartida: con LocMemCache cada worker solo ve sus propias invalidaciones y los demás
+    # sirven el servicio abierto, el catálogo, los fragmentos y los gráficos hasta que caduca su TTL.
+    #   TPV_CACHE_URL=redis://host:6379/0 (requiere redis-py) o memcached://host:11211 (requiere pymemcache)
+    TPV_CACHE_URL = os.environ.get('TPV_CACHE_URL', '')
+    if TPV_CACHE_URL.startswith(('redis://', 'rediss://')):
+        CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': TPV_CACHE_URL}}
+    elif TPV_CACHE_URL.startswith('memcached://'):
+        CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': TPV_CACHE_URL.removeprefix('memcached://'),
+        }}
+    else:
+        raise ImproperlyConfigured(
+            "TPV_BD=postgresql necesita una caché compartida entre workers: defina TPV_CACHE_URL "
+            "(redis://host:puerto/bd o memcached://host:puerto)."
+        )
+
+# Cola de escritura en proceso: las escrituras de las vistas de venta y catálogo se ejecutan en
+# un único hilo escritor que las agrupa en una transacción (group commit).
+TPV_COLA_ESCRITURA = os.environ.get('TPV_COLA_ESCRITURA') == '1'
+TPV_COLA_ESCRITURA_GRUPO = 50  # Escrituras máximas por transacción
+TPV_COLA_ESCRITURA_ESPERA = 30  # Segundos máximos que una petición espera a su escritura
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -126,3 +219,37 @@ LOGOUT_REDIRECT_URL = '/'  # Redirige al inicio
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cachés locales de la aplicación (servicio abierto, catálogo...)
+# Las versiones de datos se guardan en la caché por defecto: la LocMemCache de Django con SQLite
+# (un solo proceso) y la caché compartida de TPV_CACHE_URL en el perfil de PostgreSQL.
+TPV_CACHE_LOCAL_TTL = 30  # Segundos máximos que un worker sirve datos cacheados sin revalidar
+TPV_ANALITICA_TTL = 86400  # Segundos que se guarda el extracto columnar de un servicio cerrado
+TPV_GRAFICOS_TTL = 60  # Segundos que se reutilizan los datos de los gráficos de detalle_venta (si no hay ventas nuevas)
+TPV_FRAGMENTOS_TTL = 300  # Segundos de los fragmentos de plantilla cacheados (la clave incluye la versión de los datos)
+# Hilos (y conexiones) para ejecutar en paralelo las consultas de un informe. Solo con PostgreSQL:
+# en SQLite el pool es más lento que la ejecución en serie (ver `manage.py benchmark_informes`)
+TPV_INFORMES_HILOS = 4 if os.environ.get('TPV_BD') == 'postgresql' else 1
+
+# Agregación diferida: las ventas anotan sus cambios en el diario y `manage.py aplicar_diario --continuo`
+# los aplica a los agregados (contadores de servicio...) en segundo plano.
+TPV_AGREGACION_DIFERIDA = os.environ.get('TPV_AGREGACION_DIFERIDA') == '1'
+TPV_DIARIO_HUECO_CADUCIDAD = 3600  # Segundos tras los que un id saltado del diario se da por perdido (rollback)
+
+# Archivo de ventas: `manage.py archivar_servicios` mueve las ventas de los servicios cerrados
+# a ficheros JSONL comprimidos en este directorio (ver tpv_app.archivo).
+TPV_ARCHIVO_DIR = BASE_DIR / 'archivo'
+
+# Métricas por ruta (tpv_app.metricas), publicadas en /metrics para Prometheus
+TPV_METRICAS = os.environ.get('TPV_METRICAS', '1') == '1'
+TPV_METRICAS_TOKEN = os.environ.get('TPV_METRICAS_TOKEN', '')  # Authorization: Bearer <token>
+# IPs que pueden leer /metrics sin token (por defecto ninguna: solo con token). Detrás de un proxy
+# inverso en la misma máquina todas las peticiones llegan desde 127.0.0.1, así que permitir esa IP
+# abre /metrics a cualquiera: úsese solo si el recolector conecta directamente con la aplicación.
+TPV_METRICAS_IPS = tuple(ip for ip in os.environ.get('TPV_METRICAS_IPS', '').split(',') if ip)
+# Límites opcionales por nombre de ruta (consultas, segundos, sql_segundos); al superarlos se registra un aviso
+TPV_PRESUPUESTOS_RUTA = {
+    'crear_venta': {'consultas': 20, 'segundos': 0.5},
+    'catalogo_api': {'consultas': 5},
+    'tarjetas_productos_api': {'consultas': 5},
+}
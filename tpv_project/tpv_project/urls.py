@@ -2,8 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
 
+from tpv_app.views.metricas_views import metricas_prometheus
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('tpv/', include('tpv_app.urls')),
+    path('metrics', metricas_prometheus, name='metricas_prometheus'),  # Recolector de Prometheus
     path('', lambda request: redirect('login')),  # Redirige a la vista de login
 ]